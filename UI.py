@@ -1,79 +1,192 @@
+import time
+import os
 import sys
+import json
 import random
+import select
+import threading
+from collections import OrderedDict, deque
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout,
                              QHBoxLayout, QLabel, QFrame, QPushButton)
-from PyQt5.QtCore import Qt, QTimer, QPoint
-from PyQt5.QtGui import QFont, QPainter, QColor, QPen, QBrush, QPolygon, QPixmap, QImage
+from PyQt5.QtCore import Qt, QTimer, QPoint, QRect, QThread, QFile, QObject, QEvent, pyqtSignal
+from PyQt5.QtGui import QFont, QPainter, QColor, QPen, QBrush, QPolygon, QPixmap, QImage, QRegion
 
 
-class RoadViewWidget(QWidget):
-    """中央道路视图控件"""
 
-    def __init__(self):
-        super().__init__()
-        self.setMinimumSize(500, 500)
-        self.vehicles = []
-        self.recommendation = "keep"  # keep, left, right
+def process_start_time():
+    """
+    进程启动时刻（perf_counter时间轴），包含解释器启动与模块导入耗时
+    Linux下由/proc/self/stat的starttime换算；无法读取时退回为本模块导入完成时
+    """
+    now = time.perf_counter()
+    try:
+        with open('/proc/self/stat') as file:
+            # 第2字段为可含空格的进程名，starttime为其后第20个字段(开机以来的时钟滴答数)
+            start_ticks = int(file.read().rsplit(')', 1)[1].split()[19])
+        if hasattr(time, 'CLOCK_BOOTTIME'):
+            uptime = time.clock_gettime(time.CLOCK_BOOTTIME)
+        else:
+            with open('/proc/uptime') as file:
+                uptime = float(file.read().split()[0])
+        elapsed = uptime - start_ticks / os.sysconf('SC_CLK_TCK')
+    except (OSError, ValueError, IndexError):
+        return now
+    return now - max(elapsed, 0.0)
+
+
+STARTUP_TIME = process_start_time()  # 启动计时起点（进程启动时）
+
+# 图片目录按模块所在位置定位，不依赖启动时的工作目录
+ASSET_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'png')
+
+# (图片类别, 名称) -> 文件名
+ASSET_FILES = {
+    ('car', 'safe'): 'green.png',
+    ('car', 'warning'): 'yello.png',
+    ('car', 'danger'): 'red.png',
+    ('car', 'target'): 'blue.png',
+    ('arrow', 'left'): 'left_arrow.png',
+    ('arrow', 'right'): 'right_arrow.png',
+}
+
+# 图片缺失时默认车辆图片的颜色
+DEFAULT_CAR_COLORS = {
+    'safe': (100, 200, 100),
+    'warning': (255, 255, 100),
+    'danger': (255, 100, 100),
+    'target': (0, 150, 255, 180),
+}
+
+
+def register_resource_bundle():
+    """
+    注册pyrcc5预编译的图片资源包（pyrcc5 resources.qrc -o resources_rc.py）
+    资源包体积较大，首次加载图片时才导入（通常在后台线程），不占用首帧时间
+    """
+    try:
+        import resources_rc  # noqa: F401
+    except ImportError:
+        return False
+    return True
 
-        # 加载车辆图片和箭头图片
-        self.load_car_images()
-        self.load_arrow_images()
 
-    def load_car_images(self):
-        """加载车辆图片"""
-        # 创建默认的车辆图片
-        self.car_images = {
-            'safe': self.create_default_car_image(QColor(100, 200, 100)),
-            'warning': self.create_default_car_image(QColor(255, 255, 100)),
-            'danger': self.create_default_car_image(QColor(255, 100, 100)),
-            'target': self.create_default_car_image(QColor(0, 150, 255, 180))
-        }
+def load_asset_image(file_name):
+    """
+    解码图片资源，优先读取资源包，其次读取图片目录，均失败时返回None
+    返回QImage（可在后台线程使用），并预先转换为绘制最快的预乘格式
+    """
+    register_resource_bundle()
+    for path in (f':/png/{file_name}', os.path.join(ASSET_DIR, file_name)):
+        if path.startswith(':') and not QFile.exists(path):
+            continue
+        image = QImage(path)
+        if not image.isNull():
+            return image.convertToFormat(QImage.Format_ARGB32_Premultiplied)
+    return None
 
-        # 尝试加载外部图片文件
-        try:
-            safe_pixmap = QPixmap("png/green.png")
-            if not safe_pixmap.isNull():
-                self.car_images['safe'] = safe_pixmap
 
-            warning_pixmap = QPixmap("png/yello.png")
-            if not warning_pixmap.isNull():
-                self.car_images['warning'] = warning_pixmap
+class AssetLoader(QThread):
+    """后台图片解码线程"""
 
-            danger_pixmap = QPixmap("png/red.png")
-            if not danger_pixmap.isNull():
-                self.car_images['danger'] = danger_pixmap
+    assets_loaded = pyqtSignal(dict)
 
-            target_pixmap = QPixmap("png/blue.png")
-            if not target_pixmap.isNull():
-                self.car_images['target'] = target_pixmap
+    def __init__(self, files, parent=None):
+        super().__init__(parent)
+        self.files = files
+        self.images = {}
 
-        except Exception as e:
-            print(f"加载车辆图片失败: {e}")
+    def run(self):
+        self.images = {key: load_asset_image(file_name) for key, file_name in self.files.items()}
+        self.assets_loaded.emit(self.images)
 
-    def load_arrow_images(self):
-        self.arrow_images = {
-            'left': None,
-            'right': None
-        }
 
-        # 尝试加载箭头图片
-        try:
-            left_arrow = QPixmap("png/left_arrow.png")
-            if not left_arrow.isNull():
-                self.arrow_images['left'] = left_arrow
+class RoadViewWidget(QWidget):
+    """中央道路视图控件"""
 
-            right_arrow = QPixmap("png/right_arrow.png")
-            if not right_arrow.isNull():
-                self.arrow_images['right'] = right_arrow
+    first_frame_painted = pyqtSignal(float)
+    assets_ready = pyqtSignal(float)  # 图片资源已应用，参数为完成时刻
 
-        except Exception as e:
-            print(f"加载箭头图片失败: {e}")
+    def __init__(self, load_assets_in_background=True):
+        super().__init__()
+        self.setMinimumSize(500, 500)
+        self.vehicles = []
+        self.recommendation = "keep"  # keep, left, right
+
+        # 缩放后图片缓存（LRU），键为(图片类别, 图片名, 量化后的宽, 高)
+        self.scaled_pixmap_cache = OrderedDict()
+        self.size_quantum = 4  # 尺寸量化步长(像素)，相近尺寸的车辆共用同一缓存
+        self.max_cached_pixmaps = self.pixmap_cache_capacity()  # 随窗口尺寸调整
+        self.pixmap_cache_hits = 0
+        self.pixmap_cache_misses = 0
+
+        # 静态道路层与当前帧动态元素，重绘时只合成变化区域
+        self.road_layer = None
+        self.frame_items = None
+        self.max_dirty_rects = 32  # 变化元素超过该数量时直接整体重绘，区域合并与逐项相交判断反而更慢
+        self.setAttribute(Qt.WA_OpaquePaintEvent)  # 道路层不透明，无需Qt预先擦除背景
+        self._first_frame_reported = False
+        self.last_paint_seconds = 0.0  # 最近一次绘制耗时，供渲染调度器估计负载
+
+        # 图片资源在后台线程解码，窗口先显示；加载完成前不绘制对应图片
+        self.car_images = {}
+        self.arrow_images = {}
+        self.assets_loaded_time = None
+        self._asset_loader = None
+        if load_assets_in_background:
+            self.start_asset_loading()
+        else:
+            self.load_car_images()
+            self.load_arrow_images()
 
-        # 如果未加载到图片，创建默认箭头
-        if self.arrow_images['left'] is None:
-            self.arrow_images['left'] = self.create_default_arrow('left')
-        if self.arrow_images['right'] is None:
-            self.arrow_images['right'] = self.create_default_arrow('right')
+    def load_car_images(self):
+        """同步加载车辆图片，缺失的图片使用默认绘制"""
+        self.apply_asset_images({key: load_asset_image(file_name)
+                                 for key, file_name in ASSET_FILES.items() if key[0] == 'car'})
+
+    def load_arrow_images(self):
+        """同步加载箭头图片，缺失的图片使用默认绘制"""
+        self.apply_asset_images({key: load_asset_image(file_name)
+                                 for key, file_name in ASSET_FILES.items() if key[0] == 'arrow'})
+
+    def start_asset_loading(self):
+        """启动后台图片解码线程"""
+        loader = AssetLoader(ASSET_FILES, self)
+        loader.assets_loaded.connect(self.on_assets_loaded)
+        self._asset_loader = loader
+        loader.start()
+
+    def wait_for_assets(self):
+        """阻塞等待后台加载完成并立即应用（用于基准测试等无事件循环的场景）"""
+        loader = self._asset_loader
+        if loader is not None:
+            loader.wait()
+            self.on_assets_loaded(loader.images)
+
+    def on_assets_loaded(self, images):
+        if self._asset_loader is None:
+            return  # 已由wait_for_assets应用
+        self._asset_loader = None
+        self.apply_asset_images(images)
+
+    def apply_asset_images(self, images):
+        """
+        应用解码后的图片（QImage只能在界面线程转换为QPixmap）
+        仅为缺失或解码失败的图片创建默认图片
+        """
+        for (kind, name), image in images.items():
+            if image is not None and not image.isNull():
+                pixmap = QPixmap.fromImage(image)
+            elif kind == 'car':
+                pixmap = self.create_default_car_image(QColor(*DEFAULT_CAR_COLORS[name]))
+            else:
+                pixmap = self.create_default_arrow(name)
+            (self.car_images if kind == 'car' else self.arrow_images)[name] = pixmap
+
+        self.assets_loaded_time = time.perf_counter()
+        self.scaled_pixmap_cache.clear()
+        self.frame_items = None
+        self.update()
+        self.assets_ready.emit(self.assets_loaded_time)
 
     def create_default_arrow(self, direction):
         """创建默认箭头图片"""
@@ -128,128 +241,589 @@ class RoadViewWidget(QWidget):
         painter.end()
         return QPixmap.fromImage(image)
 
+    def get_scaled_pixmap(self, kind, name, width, height):
+        """
+        获取缩放后的图片，命中缓存时直接返回，避免每次重绘都做平滑缩放
+        kind: 'car'或'arrow'
+        """
+        quantum = self.size_quantum
+        width = max(quantum, (width + quantum // 2) // quantum * quantum)
+        height = max(quantum, (height + quantum // 2) // quantum * quantum)
+        key = (kind, name, width, height)
+
+        pixmap = self.scaled_pixmap_cache.get(key)
+        if pixmap is not None:
+            self.scaled_pixmap_cache.move_to_end(key)
+            self.pixmap_cache_hits += 1
+            return pixmap
+
+        self.pixmap_cache_misses += 1
+        source = (self.car_images if kind == 'car' else self.arrow_images).get(name)
+        if source is None:
+            return None  # 图片尚未加载
+        pixmap = source.scaled(width, height, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+        self.scaled_pixmap_cache[key] = pixmap
+        if len(self.scaled_pixmap_cache) > self.max_cached_pixmaps:
+            self.scaled_pixmap_cache.popitem(last=False)
+        return pixmap
+
+    def pixmap_cache_capacity(self):
+        """
+        一帧可能用到的缩放图片数：车辆宽度随纵向位置在车道宽度的0.21~0.7倍之间变化，
+        每个量化宽度最多对应两个量化高度；各车辆图片均可能出现，另加箭头与本车
+        """
+        lane_width = self.width() / 3
+        sizes_per_image = 2 * (int(lane_width * 0.49) // self.size_quantum + 2)
+        car_images = sum(1 for kind, _ in ASSET_FILES if kind == 'car')
+        return car_images * sizes_per_image + (len(ASSET_FILES) - car_images) + 1
+
+    def resizeEvent(self, event):
+        # 尺寸变化后原有缩放结果与静态道路层均不再适用，整体重绘由Qt在resize后触发
+        self.scaled_pixmap_cache.clear()
+        self.max_cached_pixmaps = self.pixmap_cache_capacity()
+        self.road_layer = None
+        self.frame_items = None
+        super().resizeEvent(event)
+
     def update_vehicles(self, vehicles):
         self.vehicles = vehicles
-        self.update()
+        self.refresh_dynamic_items()
 
     def set_recommendation(self, rec):
         self.recommendation = rec
-        self.update()
+        self.refresh_dynamic_items()
+
+    def update_frame(self, rec, vehicles):
+        """同时更新建议与车辆，只计算一次重绘区域"""
+        self.recommendation = rec
+        self.vehicles = vehicles
+        self.refresh_dynamic_items()
+
+    def refresh_dynamic_items(self):
+        """重新计算动态元素，只重绘上一帧与本帧发生变化的区域"""
+        old_items = self.frame_items
+        self.frame_items = self.compute_frame_items()
+        if old_items is None:
+            self.update()
+            return
+
+        old_keys = {item['key'] for item in old_items}
+        new_keys = {item['key'] for item in self.frame_items}
+        rects = [item['rect'] for item in old_items if item['key'] not in new_keys]
+        rects += [item['rect'] for item in self.frame_items if item['key'] not in old_keys]
+        if len(rects) > self.max_dirty_rects:
+            self.update()
+        elif rects:
+            dirty = QRegion()
+            dirty.setRects(rects)
+            self.update(dirty)
+
+    def create_road_layer(self):
+        """绘制静态道路层（背景、车道与车道线）到离屏图片，仅在尺寸变化后重建"""
+        width = self.width()
+        height = self.height()
+        ratio = self.devicePixelRatioF()
+        layer = QPixmap(int(width * ratio), int(height * ratio))
+        layer.setDevicePixelRatio(ratio)
+
+        painter = QPainter(layer)
+        painter.setRenderHint(QPainter.Antialiasing)
+
+        # 绘制道路背景
+        painter.fillRect(0, 0, width, height, QColor(50, 50, 50))
+
+        # 绘制车道
+        lane_width = width / 3
+        road_color = QColor(100, 100, 100)
+
+        # 左车道
+        painter.fillRect(0, 0, int(lane_width), height, road_color)
+        # 当前车道（高亮）
+        current_lane_color = QColor(120, 120, 120)
+        painter.fillRect(int(lane_width), 0, int(lane_width), height, current_lane_color)
+        # 右车道
+        painter.fillRect(int(lane_width * 2), 0, int(lane_width), height, road_color)
+
+        # 绘制车道线
+        painter.setPen(QPen(QColor(255, 255, 255), 2, Qt.DashLine))
+        for i in range(1, 3):
+            x = int(lane_width * i)
+            painter.drawLine(x, 0, x, height)
+
+        painter.end()
+        return layer
+
+    def compute_frame_items(self):
+        """
+        计算动态元素（箭头、本车、周围车辆及风险圈）的绘制参数，按绘制顺序排列
+        每个元素的key由绘制内容与位置组成，key相同的元素帧间无需重绘
+        """
+        width = self.width()
+        height = self.height()
+        lane_width = width / 3
+        items = []
+
+        # 变道建议箭头
+        if self.recommendation != "keep":
+            arrow_name = 'left' if self.recommendation == 'left' else 'right'
+
+            # 计算箭头位置（放在靠近中央车道的位置）
+            if self.recommendation == 'left':
+                arrow_x = int(lane_width * 0.8)
+            else:  # right
+                arrow_x = int(lane_width * 2.2) - 80
+
+            arrow_y = height - 350  # 箭头垂直位置，更靠近中央
+
+            arrow_size = 400
+            scaled_arrow = self.get_scaled_pixmap('arrow', arrow_name, arrow_size, arrow_size)
+            if scaled_arrow is not None:
+                items.append(self._pixmap_item(('arrow', arrow_name), arrow_x, arrow_y, scaled_arrow))
+
+        # 本车
+        car_width = int(lane_width * 0.7)
+        car_height = int(car_width * 0.5)
+        car_x = width / 2 - car_width / 2
+        car_y = height - car_height - 20
+
+        scaled_own_car = self.get_scaled_pixmap('car', 'target', car_width, car_height)
+        if scaled_own_car is not None:
+            items.append(self._pixmap_item(('own_car',), int(car_x), int(car_y), scaled_own_car))
+
+        # 周围车辆
+        for vehicle in self.vehicles:
+            lane = vehicle['lane']
+            pos = vehicle['position']
+
+            vehicle_x = lane_width * lane + lane_width * 0.1 + (lane_width * 0.8) * pos
+            vehicle_y = height * (1 - pos)
+            size_factor = 0.3 + pos * 0.7
+            v_width = int(lane_width * 0.7 * size_factor)
+            v_height = int(v_width * 0.5)
+            vehicle_x = int(vehicle_x)
+            vehicle_y = int(vehicle_y)
+
+            # 选择车辆图片
+            if vehicle.get('target_lane', False):
+                car_name = 'target'
+            elif vehicle['risk_level'] == 0:
+                car_name = 'safe'
+            elif vehicle['risk_level'] == 1:
+                car_name = 'warning'
+            else:
+                car_name = 'danger'
+
+            scaled_pixmap = self.get_scaled_pixmap('car', car_name, v_width, v_height)
+            if scaled_pixmap is not None:
+                items.append(self._pixmap_item(
+                    ('car', car_name), vehicle_x - scaled_pixmap.width() // 2,
+                    vehicle_y - scaled_pixmap.height() // 2, scaled_pixmap))
+
+            # 风险指示圈（如果有风险且不是目标车道车辆）
+            if vehicle['risk_level'] > 0 and not vehicle.get('target_lane', False):
+                risk_radius = max(v_width, v_height) + 5
+                circle = QRect(vehicle_x - risk_radius // 2, vehicle_y - risk_radius // 2,
+                               risk_radius, risk_radius)
+                items.append({
+                    'key': ('risk', vehicle['risk_level'], circle.x(), circle.y(), risk_radius),
+                    'type': 'risk',
+                    'risk_level': vehicle['risk_level'],
+                    'circle': circle,
+                    # 外扩画笔宽度与抗锯齿边缘
+                    'rect': circle.adjusted(-2, -2, 2, 2)
+                })
+
+        return items
+
+    @staticmethod
+    def _pixmap_item(key, x, y, pixmap):
+        rect = QRect(x, y, pixmap.width(), pixmap.height())
+        return {'key': key + (x, y, pixmap.width(), pixmap.height()), 'type': 'pixmap',
+                'pixmap': pixmap, 'x': x, 'y': y, 'rect': rect}
 
     def paintEvent(self, event):
         try:
+            paint_start = time.perf_counter()
+            if self.road_layer is None:
+                self.road_layer = self.create_road_layer()
+            if self.frame_items is None:
+                self.frame_items = self.compute_frame_items()
+
             painter = QPainter(self)
-            painter.setRenderHint(QPainter.Antialiasing)
+            # 整体重绘时跳过逐项相交判断；增量重绘时按区域外接矩形粗筛，其余由裁剪处理
+            bounds = event.region().boundingRect()
+            full_repaint = bounds.contains(self.rect())
 
-            width = self.width()
-            height = self.height()
-
-            # 绘制道路背景
-            painter.fillRect(0, 0, width, height, QColor(50, 50, 50))
-
-            # 绘制车道
-            lane_width = width / 3
-            road_color = QColor(100, 100, 100)
-
-            # 左车道
-            painter.fillRect(0, 0, int(lane_width), height, road_color)
-            # 当前车道（高亮）
-            current_lane_color = QColor(120, 120, 120)
-            painter.fillRect(int(lane_width), 0, int(lane_width), height, current_lane_color)
-            # 右车道
-            painter.fillRect(int(lane_width * 2), 0, int(lane_width), height, road_color)
-
-            # 绘制车道线
-            painter.setPen(QPen(QColor(255, 255, 255), 2, Qt.DashLine))
-            for i in range(1, 3):
-                x = int(lane_width * i)
-                painter.drawLine(x, 0, x, height)
-
-            # 绘制变道建议箭头
-            if self.recommendation != "keep":
-                # 选择箭头图片
-                arrow_pixmap = self.arrow_images['left' if self.recommendation == 'left' else 'right']
-
-                # 计算箭头位置（放在靠近中央车道的位置）
-                if self.recommendation == 'left':
-
-                    arrow_x = int(lane_width * 0.8)
-                else:  # right
-
-                    arrow_x = int(lane_width * 2.2) - 80
-
-                arrow_y = height - 350  # 箭头垂直位置，更靠近中央
-
-
-                arrow_size = 400
-                scaled_arrow = arrow_pixmap.scaled(
-                    arrow_size, arrow_size,
-                    Qt.KeepAspectRatio, Qt.SmoothTransformation
-                )
-                painter.drawPixmap(arrow_x, arrow_y, scaled_arrow)
-
-            # 绘制本车
-            car_width = int(lane_width * 0.7)
-            car_height = int(car_width * 0.5)
-            car_x = width / 2 - car_width / 2
-            car_y = height - car_height - 20
-
-
-            own_car_pixmap = self.car_images['target']
-            scaled_own_car = own_car_pixmap.scaled(car_width, car_height, Qt.KeepAspectRatio, Qt.SmoothTransformation)
-            painter.drawPixmap(int(car_x), int(car_y), scaled_own_car)
-
-            # 绘制周围车辆
-            for vehicle in self.vehicles:
-                lane = vehicle['lane']
-                pos = vehicle['position']
-
-
-                vehicle_x = lane_width * lane + lane_width * 0.1 + (lane_width * 0.8) * pos
-                vehicle_y = height * (1 - pos)
-                size_factor = 0.3 + pos * 0.7
-                v_width = int(lane_width * 0.7 * size_factor)
-                v_height = int(v_width * 0.5)
-                vehicle_x = int(vehicle_x)
-                vehicle_y = int(vehicle_y)
-
-                # 选择车辆图片
-                if vehicle.get('target_lane', False):
-                    car_pixmap = self.car_images['target']
-                elif vehicle['risk_level'] == 0:
-                    car_pixmap = self.car_images['safe']
-                elif vehicle['risk_level'] == 1:
-                    car_pixmap = self.car_images['warning']
+            # 静态道路层直接贴图（绘制已被裁剪到重绘区域）
+            painter.drawPixmap(0, 0, self.road_layer)
+
+            painter.setRenderHint(QPainter.Antialiasing)
+            for item in self.frame_items:
+                if not full_repaint and not bounds.intersects(item['rect']):
+                    continue
+                if item['type'] == 'pixmap':
+                    painter.drawPixmap(item['x'], item['y'], item['pixmap'])
                 else:
-                    car_pixmap = self.car_images['danger']
-
-                # 缩放并绘制车辆图片
-                scaled_pixmap = car_pixmap.scaled(v_width, v_height, Qt.KeepAspectRatio, Qt.SmoothTransformation)
-                painter.drawPixmap(
-                    vehicle_x - scaled_pixmap.width() // 2,
-                    vehicle_y - scaled_pixmap.height() // 2,
-                    scaled_pixmap
-                )
-
-                # 绘制风险指示圈（如果有风险且不是目标车道车辆）
-                if vehicle['risk_level'] > 0 and not vehicle.get('target_lane', False):
                     painter.setPen(QPen(
-                        QColor(255, 100, 100) if vehicle['risk_level'] == 2
+                        QColor(255, 100, 100) if item['risk_level'] == 2
                         else QColor(255, 200, 100), 2, Qt.DashLine
                     ))
                     painter.setBrush(Qt.NoBrush)
-                    risk_radius = max(v_width, v_height) + 5
-                    painter.drawEllipse(
-                        vehicle_x - risk_radius // 2,
-                        vehicle_y - risk_radius // 2,
-                        risk_radius,
-                        risk_radius
-                    )
+                    painter.drawEllipse(item['circle'])
+            painter.end()
+            self.last_paint_seconds = time.perf_counter() - paint_start
+
+            if not self._first_frame_reported:
+                self._first_frame_reported = True
+                self.first_frame_painted.emit(time.perf_counter())
         except Exception as e:
             print(f"绘制错误: {e}")
 
 
+class RenderScheduler(QObject):
+    """
+    道路视图渲染调度器
+    实时数据到达时只记录目标状态，由定时器按当前帧率渲染：
+    画面变化不足像素阈值时跳过；有余量时在两次稀疏更新之间插值车辆位置；
+    绘制耗时或定时器延迟过高时自动降低帧率，窗口隐藏或最小化时暂停
+    """
+
+    statistics_updated = pyqtSignal(dict)
+
+    def __init__(self, view, max_fps=30, min_fps=5, pixel_threshold=1.0, interpolate=True,
+                 target_load=0.5):
+        """
+        view: RoadViewWidget
+        pixel_threshold: 车辆位置变化小于该像素数且车道、风险等级未变时跳过该帧
+        target_load: 每帧(绘制耗时 + 定时器延迟)占帧间隔比例的上限，超过即降帧率
+        """
+        super().__init__(view)
+        self.view = view
+        self.max_fps = max_fps
+        self.min_fps = min_fps
+        self.pixel_threshold = pixel_threshold
+        self.interpolate = interpolate
+        self.target_load = target_load
+
+        self.timer = QTimer(self)
+        self.timer.setTimerType(Qt.PreciseTimer)
+        self.timer.timeout.connect(self.tick)
+        self.paused = False
+
+        self._recommendation = view.recommendation
+        self._rendered_recommendation = None
+        self._expected_tick = None
+        self._last_tick = 0.0
+        self._watched_window = None
+        self._render_times = deque()  # 最近1秒内各帧的渲染时刻
+        self._statistics_time = time.monotonic()
+        self.reset()
+
+    def reset(self, max_fps=None):
+        """重置统计与插值状态（开始新的实时会话时调用）"""
+        self.timer.stop()
+        if max_fps is not None:
+            self.max_fps = max_fps
+        self.fps = float(self.max_fps)
+        self._start_vehicles = []  # 插值起点（收到新数据时正在显示的状态）
+        self._target_vehicles = []
+        self._target_time = 0.0
+        self._target_shown = True
+        self._update_interval = 1.0 / self.max_fps  # 数据更新间隔（指数平均）
+        self._rendered_vehicles = None
+        self._displayed_vehicles = []
+        self._load = 0.0
+        self._calm_ticks = 0
+        self.rendered_frames = 0
+        self.skipped_frames = 0  # 画面无可见变化而跳过的帧
+        self.dropped_frames = 0  # 尚未显示就被新数据覆盖的更新
+        self._render_times.clear()
+
+    def submit(self, recommendation, vehicles):
+        """提交一次数据更新（界面线程调用）"""
+        now = time.monotonic()
+        if not self._target_shown:
+            self.dropped_frames += 1
+        if self._target_time:
+            interval = now - self._target_time
+            self._update_interval += 0.2 * (interval - self._update_interval)
+
+        self._recommendation = recommendation
+        self._start_vehicles = self._displayed_vehicles
+        self._target_vehicles = vehicles
+        self._target_time = now
+        self._target_shown = False
+
+        self._watch_window()
+        if not self.paused and not self.timer.isActive():
+            # 定时器空闲时，距上次渲染不足一个帧间隔则延后到间隔结束
+            wait = self._last_tick + 1.0 / self.fps - now
+            if wait > 0:
+                self._expected_tick = now + wait
+                self.timer.start(int(wait * 1000) + 1)
+            else:
+                self._expected_tick = None
+                self.timer.start(int(1000 / self.fps))
+                self.tick()
+
+    def stop(self):
+        self.timer.stop()
+
+    def flush(self):
+        """立即显示最新数据（不插值）并停止定时器，用于实时模式结束时保证最后一帧被显示"""
+        self.timer.stop()
+        if self._target_time and (self._rendered_vehicles is not self._target_vehicles
+                                  or self._rendered_recommendation != self._recommendation):
+            self.view.update_frame(self._recommendation, self._target_vehicles)
+            self._rendered_recommendation = self._recommendation
+            self._rendered_vehicles = self._displayed_vehicles = self._target_vehicles
+            self.rendered_frames += 1
+            self._render_times.append(time.monotonic())
+        self._target_shown = True
+
+    def tick(self):
+        now = time.monotonic()
+        if self._is_hidden():
+            self._pause()
+            return
+
+        lateness = 0.0 if self._expected_tick is None else max(0.0, now - self._expected_tick)
+        self._expected_tick = now + 1.0 / self.fps
+        self._last_tick = now
+        interval_ms = int(1000 / self.fps)
+        if self.timer.isActive() and self.timer.interval() != interval_ms:
+            self.timer.setInterval(interval_ms)
+
+        # 有余量时插值，否则直接显示最新数据
+        alpha = 1.0
+        if self.interpolate and self._load < self.target_load and self._start_vehicles:
+            alpha = min(1.0, (now - self._target_time) / max(self._update_interval, 1e-3))
+        vehicles = self._blend(self._start_vehicles, self._target_vehicles, alpha)
+        self._displayed_vehicles = vehicles
+
+        if self._has_visible_change(vehicles):
+            self.view.update_frame(self._recommendation, vehicles)
+            self._rendered_recommendation = self._recommendation
+            self._rendered_vehicles = vehicles
+            self.rendered_frames += 1
+            self._render_times.append(now)
+        else:
+            self.skipped_frames += 1
+        self._target_shown = True
+
+        self._adapt_frame_rate(lateness)
+        self._report_statistics(now)
+
+        # 已到达目标且无新数据时停止定时器，下一次提交时再启动
+        if alpha >= 1.0:
+            self.timer.stop()
+
+    def _blend(self, start, target, alpha):
+        """按车辆ID（缺省为列表序号）匹配前后两帧，车道相同的车辆插值纵向位置"""
+        if alpha >= 1.0 or not start:
+            return target
+        previous = {vehicle.get('id', i): vehicle for i, vehicle in enumerate(start)}
+        vehicles = []
+        for i, vehicle in enumerate(target):
+            before = previous.get(vehicle.get('id', i))
+            if before is not None and before['lane'] == vehicle['lane']:
+                position = before['position'] + (vehicle['position'] - before['position']) * alpha
+                vehicle = dict(vehicle, position=position)
+            vehicles.append(vehicle)
+        return vehicles
+
+    def _has_visible_change(self, vehicles):
+        """与上次渲染相比是否有超过像素阈值的变化"""
+        rendered = self._rendered_vehicles
+        if rendered is None or self._recommendation != self._rendered_recommendation:
+            return True
+        if len(rendered) != len(vehicles):
+            return True
+        height = self.view.height()
+        for old, new in zip(rendered, vehicles):
+            if (old['lane'] != new['lane'] or old['risk_level'] != new['risk_level']
+                    or old.get('target_lane', False) != new.get('target_lane', False)):
+                return True
+            if abs(old['position'] - new['position']) * height >= self.pixel_threshold:
+                return True
+        return False
+
+    def _adapt_frame_rate(self, lateness):
+        """按(绘制耗时 + 定时器延迟)/帧间隔调整帧率"""
+        interval = 1.0 / self.fps
+        load = (self.view.last_paint_seconds + lateness) / interval
+        self._load += 0.3 * (load - self._load)
+
+        fps = self.fps
+        if self._load > self.target_load:
+            fps = max(self.min_fps, self.fps * 0.8)
+            self._calm_ticks = 0
+        elif self._load < self.target_load / 2:
+            self._calm_ticks += 1
+            if self._calm_ticks >= 30:
+                fps = min(float(self.max_fps), self.fps * 1.1)
+                self._calm_ticks = 0
+        self.fps = fps
+
+    def _report_statistics(self, now):
+        while self._render_times and self._render_times[0] < now - 1.0:
+            self._render_times.popleft()
+        if now - self._statistics_time >= 1.0:
+            self._statistics_time = now
+            self.statistics_updated.emit(self.statistics())
+
+    def statistics(self):
+        """实际帧率（最近1秒渲染帧数）、目标帧率、渲染/跳过/丢弃帧数"""
+        return {
+            'achieved_fps': len(self._render_times),
+            'target_fps': round(self.fps, 1),
+            'rendered_frames': self.rendered_frames,
+            'skipped_frames': self.skipped_frames,
+            'dropped_frames': self.dropped_frames,
+            'load': round(self._load, 3),
+            'paused': self.paused,
+        }
+
+    def _is_hidden(self):
+        return not self.view.isVisible() or self.view.window().isMinimized()
+
+    def _pause(self):
+        self.timer.stop()
+        self.paused = True
+
+    def _watch_window(self):
+        """监听所在窗口的显示/隐藏/最小化，隐藏时暂停、恢复显示时立即补一帧"""
+        window = self.view.window()
+        if window is not self._watched_window:
+            if self._watched_window is not None:
+                self._watched_window.removeEventFilter(self)
+            window.installEventFilter(self)
+            self._watched_window = window
+
+    def eventFilter(self, obj, event):
+        if event.type() in (QEvent.Hide, QEvent.WindowStateChange, QEvent.Show):
+            if self._is_hidden():
+                self._pause()
+            elif self.paused:
+                self.paused = False
+                self._expected_tick = None
+                self.timer.start(int(1000 / self.fps))
+        return False
+
+
+class LiveDataWorker(QThread):
+    """
+    实时数据线程：持续读取车辆与建议帧，只保留最新一帧
+    有新帧时通过排队信号通知界面线程，界面取走前不再重复发信号，突发数据不会堆积在事件循环中
+    """
+
+    frame_available = pyqtSignal()
+    source_finished = pyqtSignal()
+
+    def __init__(self, source, parent=None):
+        """
+        source: 帧的可迭代对象（阻塞读取），每帧为包含recommendation与vehicles的字典；
+                等待数据时可产出None作为心跳，线程借此检查停止请求
+        """
+        super().__init__(parent)
+        self.source = source
+        self._lock = threading.Lock()
+        self._latest = None
+        self._notified = False
+        self.received_frames = 0
+        self.dropped_frames = 0  # 被更新帧覆盖、未被界面显示的帧数
+
+    def run(self):
+        for frame in self.source:
+            if self.isInterruptionRequested():
+                break
+            if frame is None:
+                continue
+            with self._lock:
+                if self._latest is not None:
+                    self.dropped_frames += 1
+                self._latest = frame
+                self.received_frames += 1
+                notify = not self._notified
+                self._notified = True
+            if notify:
+                self.frame_available.emit()
+        self.source_finished.emit()
+
+    def take_latest(self):
+        """取走最新帧（界面线程调用），之后的新帧会再次触发通知"""
+        with self._lock:
+            frame = self._latest
+            self._latest = None
+            self._notified = False
+        return frame
+
+
+def scenario_frame_source(scenarios, rate=20.0, scenario_seconds=3.0, should_stop=None):
+    """
+    演示用帧源：按rate(Hz)输出场景模板帧，周围车辆位置随时间缓慢移动
+    should_stop: 返回True时结束输出的回调
+    """
+    interval = 1.0 / rate
+    next_time = time.monotonic()
+    frame_index = 0
+    while should_stop is None or not should_stop():
+        elapsed = frame_index * interval
+        scenario = scenarios[int(elapsed / scenario_seconds) % len(scenarios)]
+        phase = elapsed % scenario_seconds / scenario_seconds
+        vehicles = [dict(vehicle, position=min(0.95, max(0.05, vehicle['position'] + 0.1 * (phase - 0.5))))
+                    for vehicle in scenario['vehicles']]
+        yield {'name': scenario['name'], 'recommendation': scenario['recommendation'], 'vehicles': vehicles}
+
+        frame_index += 1
+        next_time += interval
+        time.sleep(max(0.0, next_time - time.monotonic()))
+
+
+def json_lines_frame_source(stream, poll_interval=0.1):
+    """
+    从JSON Lines流（如标准输入、套接字文件）逐行读取帧，格式错误的行被跳过
+    流有文件描述符时以select限时等待，poll_interval秒内无数据则产出None作为心跳，
+    读取线程不会阻塞在read上而无法停止（Windows的select只支持套接字，仍为阻塞读取）
+    """
+    try:
+        fd = stream.fileno()
+    except (AttributeError, OSError, ValueError):
+        fd = None
+    lines = stream if fd is None or sys.platform == 'win32' else _read_lines_with_timeout(fd, poll_interval)
+
+    for line in lines:
+        if line is None:
+            yield None
+            continue
+        try:
+            frame = json.loads(line)
+        except ValueError:
+            continue
+        if isinstance(frame, dict) and 'vehicles' in frame:
+            yield frame
+
+
+def _read_lines_with_timeout(fd, poll_interval):
+    """限时等待读取文件描述符，逐行产出字节串，超时产出None"""
+    pending = b''
+    while True:
+        ready, _, _ = select.select([fd], [], [], poll_interval)
+        if not ready:
+            yield None
+            continue
+        data = os.read(fd, 1 << 16)
+        if not data:
+            break
+        *lines, pending = (pending + data).split(b'\n')
+        yield from lines
+    if pending:
+        yield pending
+
+
 class RecommendationApp(QMainWindow):
+    startup_reported = pyqtSignal(dict)
+
     def __init__(self):
         super().__init__()
         self.setWindowTitle("智能网联车变道建议系统")
@@ -317,6 +891,8 @@ class RecommendationApp(QMainWindow):
         ]
 
         self.current_scenario_index = 0
+        self.first_frame_time = None
+        self.startup_report = None
 
         # 中央窗口部件
         central_widget = QWidget()
@@ -349,6 +925,18 @@ class RecommendationApp(QMainWindow):
         # 设置定时器更新UI
         self.timer = QTimer()
         self.timer.timeout.connect(self.auto_update_scenario)
+
+        # 实时模式：后台线程读取数据，界面按上限帧率取最新帧
+        self.live_worker = None
+        self.stopping_workers = []  # 已请求停止但尚未退出的数据线程
+        self.live_max_fps = 30
+        self.last_frame_time = 0.0
+        self.frame_timer = QTimer()
+        self.frame_timer.setSingleShot(True)
+        self.frame_timer.timeout.connect(self.apply_latest_frame)
+        self.render_scheduler = RenderScheduler(self.road_view, max_fps=self.live_max_fps)
+        self.render_scheduler.statistics_updated.connect(self.update_render_stats)
+
         self.update_simulation(update_data=False)
 
     def create_top_status_bar(self, layout):
@@ -395,6 +983,8 @@ class RecommendationApp(QMainWindow):
         """创建中央道路视图"""
         self.road_view = RoadViewWidget()
         self.road_view.setStyleSheet("background-color: #34495e; border-radius: 5px;")
+        self.road_view.first_frame_painted.connect(self.on_first_frame_painted)
+        self.road_view.assets_ready.connect(self.on_assets_ready)
         layout.addWidget(self.road_view, 1)
 
     def create_bottom_data_bar(self, layout):
@@ -505,10 +1095,34 @@ class RecommendationApp(QMainWindow):
         """)
         self.manual_suggest_btn.clicked.connect(self.manual_suggest)
 
+        # 实时模式按钮
+        self.live_btn = QPushButton("实时模式")
+        self.live_btn.setStyleSheet("""
+            QPushButton {
+                background-color: #9b59b6;
+                color: white;
+                border: none;
+                padding: 10px 20px;
+                border-radius: 4px;
+                font-weight: bold;
+                font-size: 14px;
+            }
+            QPushButton:hover {
+                background-color: #8e44ad;
+            }
+        """)
+        self.live_btn.clicked.connect(self.toggle_live_mode)
+
         button_layout.addWidget(self.simulate_btn)
         button_layout.addWidget(self.manual_suggest_btn)
+        button_layout.addWidget(self.live_btn)
         button_layout.addStretch(1)
 
+        # 实时模式渲染统计
+        self.render_stats_label = QLabel("")
+        self.render_stats_label.setStyleSheet("color: #7f8c8d; font-size: 12px;")
+        button_layout.addWidget(self.render_stats_label)
+
         layout.addWidget(button_frame)
 
     def toggle_simulation(self):
@@ -532,25 +1146,159 @@ class RecommendationApp(QMainWindow):
         self.current_scenario_index = (self.current_scenario_index + 1) % len(self.scenarios)
         self.update_simulation(update_data=True)
 
-    def update_simulation(self, update_data=True):
-        """更新模拟数据"""
+    def toggle_live_mode(self):
+        """切换实时模式（演示数据源）"""
+        if self.live_worker is not None:
+            self.stop_live_mode()
+        else:
+            self.start_live_mode()
+
+    def start_live_mode(self, source=None, max_fps=30):
+        """
+        启动实时模式
+        source: 帧的可迭代对象，缺省为20Hz的场景演示数据
+        max_fps: 界面刷新帧率上限
+        """
+        self.stop_live_mode()
+        if self.simulation_active:
+            self.toggle_simulation()
+
+        worker = LiveDataWorker(source, self)
+        if source is None:
+            worker.source = scenario_frame_source(self.scenarios, should_stop=worker.isInterruptionRequested)
+        worker.frame_available.connect(self.on_frame_available)  # 跨线程自动排队
+        worker.source_finished.connect(self.on_live_source_finished)
+
+        self.live_worker = worker
+        self.live_max_fps = max_fps
+        self.render_scheduler.reset(max_fps)
+        self.live_btn.setText("停止实时")
+        self.simulate_btn.setEnabled(False)
+        self.manual_suggest_btn.setEnabled(False)
+        worker.start()
+
+    def stop_live_mode(self):
+        """停止实时模式，等待数据线程退出"""
+        worker = self.live_worker
+        if worker is None:
+            return
+        self.live_worker = None
+        self.frame_timer.stop()
+        worker.frame_available.disconnect(self.on_frame_available)
+        worker.source_finished.disconnect(self.on_live_source_finished)
+        worker.requestInterruption()
+        if not worker.wait(1000):
+            # 数据源仍阻塞在读取中：保留引用，线程结束前不销毁
+            self.stopping_workers.append(worker)
+            worker.finished.connect(lambda: self.stopping_workers.remove(worker))
+        self.render_scheduler.flush()
+        self.render_stats_label.setText("")
+
+        self.live_btn.setText("实时模式")
+        self.simulate_btn.setEnabled(True)
+        self.manual_suggest_btn.setEnabled(True)
+
+    def on_live_source_finished(self):
+        # 已排队的结束通知可能来自先前停止的线程
+        if self.sender() is self.live_worker:
+            self.apply_latest_frame()
+            self.stop_live_mode()
+
+    def on_frame_available(self):
+        """新帧通知：未到最小帧间隔时用单次定时器延后到间隔结束再取帧"""
+        if self.frame_timer.isActive():
+            return
+        wait = self.last_frame_time + 1.0 / self.live_max_fps - time.monotonic()
+        if wait > 0:
+            self.frame_timer.start(int(wait * 1000) + 1)
+        else:
+            self.apply_latest_frame()
+
+    def apply_latest_frame(self):
+        if self.live_worker is None:
+            return
+        frame = self.live_worker.take_latest()
+        if frame is None:
+            return
+        self.last_frame_time = time.monotonic()
+        self.apply_frame(frame)
+
+    def apply_frame(self, frame):
+        """
+        显示一帧数据
+        frame: {'recommendation': (类型, 文本, 距离提示, 图标), 'vehicles': [...],
+                'name': 场景名称(可选), 'metrics': 环保数据(可选)}
+        """
         try:
-            # 获取当前场景
-            scenario = self.scenarios[self.current_scenario_index]
-
-            # 获取建议和车辆数据
-            rec_type, rec_text, distance, icon = scenario["recommendation"]
-            vehicles = scenario["vehicles"]
+            rec_type, rec_text, distance, icon = frame["recommendation"]
 
             # 更新顶部状态栏
             self.recommendation_icon.setText(icon)
             self.recommendation_text.setText(rec_text)
             self.distance_hint.setText(distance)
-            self.scenario_label.setText(f"场景: {scenario['name']}")
+            if 'name' in frame:
+                self.scenario_label.setText(f"场景: {frame['name']}")
+
+            # 更新道路视图：实时模式经渲染调度器（跳帧、插值、自适应帧率），演示场景直接更新
+            if self.live_worker is not None:
+                self.render_scheduler.submit(rec_type, frame["vehicles"])
+            else:
+                self.road_view.update_frame(rec_type, frame["vehicles"])
+
+            metrics = frame.get('metrics')
+            if metrics:
+                self.co2_saved = metrics.get('co2_saved', self.co2_saved)
+                self.efficiency = metrics.get('efficiency', self.efficiency)
+                self.fuel_saved = metrics.get('fuel_saved', self.fuel_saved)
+                self.safety_score = metrics.get('safety_score', self.safety_score)
+                self.update_metric_labels()
+        except Exception as e:
+            print(f"更新实时数据错误: {e}")
+
+    def update_render_stats(self, stats):
+        if self.live_worker is not None:
+            self.render_stats_label.setText(
+                f"渲染 {stats['achieved_fps']}/{stats['target_fps']:.0f} fps  "
+                f"跳过 {stats['skipped_frames']}  丢帧 {stats['dropped_frames'] + self.live_worker.dropped_frames}")
+
+    def update_metric_labels(self):
+        self.co2_label.setText(f"{self.co2_saved}g")
+        self.efficiency_label.setText(f"+{self.efficiency}%")
+        self.fuel_label.setText(f"{self.fuel_saved:.1f}L")
+        self.safety_label.setText(f"{self.safety_score}")
+
+    def on_first_frame_painted(self, painted_time):
+        """记录首帧时间；首帧与图片资源均就绪后输出启动耗时"""
+        self.first_frame_time = painted_time
+        self.report_startup()
+
+    def on_assets_ready(self, loaded_time):
+        self.report_startup()
+
+    def report_startup(self):
+        """启动耗时报告（自进程启动起计），首帧与图片资源均就绪时只报告一次"""
+        if (self.startup_report is not None or self.first_frame_time is None
+                or self.road_view.assets_loaded_time is None):
+            return
+        self.startup_report = {
+            'first_frame_ms': (self.first_frame_time - STARTUP_TIME) * 1000,
+            'assets_loaded_ms': (self.road_view.assets_loaded_time - STARTUP_TIME) * 1000,
+        }
+        self.startup_reported.emit(self.startup_report)
 
-            # 更新道路视图
-            self.road_view.set_recommendation(rec_type)
-            self.road_view.update_vehicles(vehicles)
+    def closeEvent(self, event):
+        self.stop_live_mode()
+        # 窗口销毁前等待全部数据线程退出，避免销毁仍在运行的QThread
+        for worker in list(self.stopping_workers):
+            worker.wait()
+        super().closeEvent(event)
+
+    def update_simulation(self, update_data=True):
+        """更新模拟数据"""
+        try:
+            # 获取当前场景，更新状态栏与道路视图
+            scenario = self.scenarios[self.current_scenario_index]
+            self.apply_frame(scenario)
 
             # 只有在update_data为True时才更新环保数据
             if update_data:
@@ -561,10 +1309,7 @@ class RecommendationApp(QMainWindow):
                 self.safety_score = max(85, min(100, self.safety_score + random.randint(-2, 1)))
 
             # 更新显示
-            self.co2_label.setText(f"{self.co2_saved}g")
-            self.efficiency_label.setText(f"+{self.efficiency}%")
-            self.fuel_label.setText(f"{self.fuel_saved:.1f}L")
-            self.safety_label.setText(f"{self.safety_score}")
+            self.update_metric_labels()
         except Exception as e:
             print(f"更新模拟错误: {e}")
 
@@ -576,6 +1321,8 @@ def main():
         font = QFont("Arial", 10)
         app.setFont(font)
         window = RecommendationApp()
+        window.startup_reported.connect(lambda report: print(
+            f"启动耗时: 首帧 {report['first_frame_ms']:.0f} ms，图片资源就绪 {report['assets_loaded_ms']:.0f} ms"))
         window.show()
         sys.exit(app.exec_())
     except Exception as e:
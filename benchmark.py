@@ -0,0 +1,277 @@
+"""
+code.py 各模型性能基准
+使用固定随机种子生成合成车队数据（100 ~ 1,000,000 个车辆样本），
+报告吞吐量、单次调用延迟分位数与峰值内存，结果可输出为JSON并与历史结果对比
+
+用法:
+    python benchmark.py                                   # 全部用例、默认规模
+    python benchmark.py --sizes 100,10000 --filter fuel   # 指定规模与用例
+    python benchmark.py --output after.json --compare before.json
+"""
+
+import argparse
+import json
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+from code import (AirResistanceCorrection, CarFollowingSimulator, ColumnarTrafficState,
+                  CruiseSystemDegradationModel, ElectricVehicleEmissionModel,
+                  FuelVehicleEmissionModel, HeterogeneousTrafficFlowModel, SmartVehicleLaneChangeModel,
+                  SmartVehicleMixingModel)
+
+DEFAULT_SIZES = (100, 1000, 10000, 100000, 1000000)
+PROFILE_LENGTH = 100  # 批量排放用例中每辆车的轨迹长度
+
+
+def _fleet(size, rng):
+    """合成车队样本：速度(m/s)、加速度(m/s²)、车道、位置、车型"""
+    return {
+        'speed': rng.uniform(0, 35, size),
+        'acceleration': rng.normal(0, 1.0, size).clip(-5, 3),
+        'lane': rng.integers(0, 3, size),
+        'position': rng.uniform(0, max(1000, size * 3), size),
+        'vehicle_class': rng.integers(0, len(ColumnarTrafficState.VEHICLE_CLASSES), size),
+    }
+
+
+def _columnar_state(fleet):
+    size = len(fleet['speed'])
+    return ColumnarTrafficState(fleet['vehicle_class'], np.zeros(size), fleet['lane'],
+                                fleet['position'], fleet['speed'], fleet['acceleration'])
+
+
+def _profiles(size, rng):
+    """按PROFILE_LENGTH切分为(车辆×时间)轨迹"""
+    fleet = _fleet(size, rng)
+    rows = max(1, size // PROFILE_LENGTH)
+    shape = (rows, size // rows)
+    return (fleet['speed'][:rows * shape[1]].reshape(shape),
+            fleet['acceleration'][:rows * shape[1]].reshape(shape))
+
+
+def setup_fuel_vsp(size, rng):
+    model = FuelVehicleEmissionModel()
+    fleet = _fleet(size, rng)
+    return lambda: model.calculate_vsp(fleet['speed'], fleet['acceleration'])
+
+
+def setup_fuel_emission_batch(size, rng):
+    model = FuelVehicleEmissionModel()
+    velocity, acceleration = _profiles(size, rng)
+    duration = np.full(velocity.shape, 0.1)
+    return lambda: model.calculate_co2_emission_batch(velocity, acceleration, duration)
+
+
+def setup_electric_fleet_emission(size, rng):
+    model = ElectricVehicleEmissionModel()
+    velocity, acceleration = _profiles(size, rng)
+    return lambda: model.calculate_fleet_emission(velocity, acceleration, 0.1)
+
+
+def setup_columnar_emission(size, rng):
+    model = SmartVehicleMixingModel()
+    state = _columnar_state(_fleet(size, rng))
+    return lambda: model.calculate_columnar_emission(state)
+
+
+def setup_platoon_correction(size, rng):
+    model = AirResistanceCorrection()
+    spacings = rng.uniform(5, 40, size)
+    offsets = np.r_[np.arange(0, size, 5), size]  # 每5辆车一个车队
+    return lambda: model.apply_platoon_correction_batch(spacings, offsets)
+
+
+def setup_fundamental_diagram(size, rng):
+    """逐次调用标量接口，每次计算100个密度点"""
+    model = HeterogeneousTrafficFlowModel()
+    ratios = rng.uniform(0, 1, max(1, size // 100))
+    return lambda: [model.calculate_fundamental_diagram(ratio) for ratio in ratios]
+
+
+def setup_fundamental_diagram_surface(size, rng):
+    model = HeterogeneousTrafficFlowModel()
+    surface = model.get_fundamental_diagram_surface()
+    densities = rng.uniform(0, 150, size)
+    ratios = rng.uniform(0, 1, size)
+    platoon_sizes = rng.integers(1, 11, size)
+    return lambda: surface.query_batch(densities, ratios, platoon_sizes)
+
+
+def setup_vehicle_proportions(size, rng):
+    """逐次调用标量接口"""
+    model = CruiseSystemDegradationModel()
+    ratios = rng.uniform(0, 1, size)
+    platoon_sizes = rng.integers(1, 11, size)
+    return lambda: [model.calculate_vehicle_proportions(1, ratio, platoon_size)
+                    for ratio, platoon_size in zip(ratios, platoon_sizes)]
+
+
+def setup_vehicle_proportions_batch(size, rng):
+    model = CruiseSystemDegradationModel()
+    ratios = rng.uniform(0, 1, size)
+    platoon_sizes = rng.integers(1, 11, size)
+    return lambda: model.calculate_vehicle_proportions_batch(ratios, platoon_sizes)
+
+
+def setup_car_following_step(size, rng):
+    simulator = CarFollowingSimulator()
+    fleet = _fleet(size, rng)
+    simulator.initialize(fleet['position'], fleet['speed'], fleet['lane'], rng.integers(0, 3, size))
+    return simulator.step
+
+
+def setup_lane_change_decision(size, rng):
+    model = SmartVehicleLaneChangeModel()
+    state = _columnar_state(_fleet(size, rng))
+    return lambda: model.frame_dynamic_decision(state)
+
+
+# 用例名 -> (构建函数, 最大规模)；标量接口逐次调用，限制规模以控制运行时间
+BENCHMARKS = {
+    'fuel.calculate_vsp': (setup_fuel_vsp, None),
+    'fuel.calculate_co2_emission_batch': (setup_fuel_emission_batch, None),
+    'electric.calculate_fleet_emission': (setup_electric_fleet_emission, None),
+    'mixing.calculate_columnar_emission': (setup_columnar_emission, None),
+    'platoon.apply_platoon_correction_batch': (setup_platoon_correction, None),
+    'flow.calculate_fundamental_diagram': (setup_fundamental_diagram, 100000),
+    'flow.surface_query_batch': (setup_fundamental_diagram_surface, None),
+    'degradation.calculate_vehicle_proportions': (setup_vehicle_proportions, 10000),
+    'degradation.calculate_vehicle_proportions_batch': (setup_vehicle_proportions_batch, None),
+    'car_following.step': (setup_car_following_step, None),
+    'lane_change.frame_dynamic_decision': (setup_lane_change_decision, None),
+}
+
+
+def measure(func, min_time=0.5, min_repeats=5, max_repeats=200):
+    """重复调用直至累计min_time秒（至少min_repeats次），返回各次耗时"""
+    func()  # 预热
+    timings = []
+    total = 0.0
+    while len(timings) < max_repeats and (len(timings) < min_repeats or total < min_time):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        timings.append(elapsed)
+        total += elapsed
+    return np.array(timings)
+
+
+def measure_peak_memory(func):
+    """单次调用期间的峰值内存增量(字节)"""
+    tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        baseline = tracemalloc.get_traced_memory()[0]
+        func()
+        return tracemalloc.get_traced_memory()[1] - baseline
+    finally:
+        tracemalloc.stop()
+
+
+def run_benchmarks(names, sizes, seed=0, min_time=0.5):
+    results = []
+    for name in names:
+        setup, max_size = BENCHMARKS[name]
+        for size in sizes:
+            if max_size is not None and size > max_size:
+                continue
+            func = setup(size, np.random.default_rng(seed))
+            timings = measure(func, min_time)
+            p50, p90, p99 = np.percentile(timings, [50, 90, 99])
+            result = {
+                'name': name,
+                'size': size,
+                'repeats': len(timings),
+                'mean_seconds': float(timings.mean()),
+                'p50_seconds': float(p50),
+                'p90_seconds': float(p90),
+                'p99_seconds': float(p99),
+                'throughput': size / float(p50),  # 样本/秒
+                'peak_memory_bytes': measure_peak_memory(func),
+            }
+            results.append(result)
+            print(f"{name:50s} {size:>9d}  p50 {p50 * 1e3:10.3f} ms  p99 {p99 * 1e3:10.3f} ms  "
+                  f"{result['throughput']:12.4g} 样本/s  峰值内存 {result['peak_memory_bytes'] / 2 ** 20:8.2f} MiB")
+    return results
+
+
+def environment_info(seed):
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                                check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'git_commit': commit,
+        'python': sys.version.split()[0],
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'processor': platform.processor(),
+        'seed': seed,
+    }
+
+
+def compare_results(current, baseline, threshold=0.1):
+    """
+    与基准结果对比p50耗时
+    返回变慢超过threshold（相对比例）的用例列表
+    """
+    previous = {(item['name'], item['size']): item for item in baseline['results']}
+    regressions = []
+    print(f"\n{'用例':50s} {'规模':>9s} {'基准p50(ms)':>12s} {'当前p50(ms)':>12s} {'加速比':>8s}")
+    for item in current['results']:
+        old = previous.get((item['name'], item['size']))
+        if old is None:
+            continue
+        speedup = old['p50_seconds'] / item['p50_seconds']
+        flag = ''
+        if item['p50_seconds'] > old['p50_seconds'] * (1 + threshold):
+            regressions.append(item)
+            flag = '  变慢'
+        print(f"{item['name']:50s} {item['size']:>9d} {old['p50_seconds'] * 1e3:12.3f} "
+              f"{item['p50_seconds'] * 1e3:12.3f} {speedup:8.2f}{flag}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='code.py模型性能基准')
+    parser.add_argument('--sizes', default=','.join(map(str, DEFAULT_SIZES)),
+                        help='逗号分隔的样本规模')
+    parser.add_argument('--filter', default='', help='仅运行名称包含该字符串的用例')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--min-time', type=float, default=0.5, help='每个用例的最短累计计时(秒)')
+    parser.add_argument('--output', help='结果JSON输出路径')
+    parser.add_argument('--compare', help='用于对比的历史结果JSON')
+    parser.add_argument('--threshold', type=float, default=0.1, help='判定变慢的相对阈值')
+    parser.add_argument('--list', action='store_true', help='列出全部用例')
+    args = parser.parse_args(argv)
+
+    if args.list:
+        print('\n'.join(BENCHMARKS))
+        return 0
+
+    names = [name for name in BENCHMARKS if args.filter in name]
+    sizes = [int(size) for size in args.sizes.split(',')]
+    report = {'environment': environment_info(args.seed),
+              'results': run_benchmarks(names, sizes, args.seed, args.min_time)}
+
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(report, file, indent=2, ensure_ascii=False)
+
+    if args.compare:
+        with open(args.compare) as file:
+            baseline = json.load(file)
+        if compare_results(report, baseline, args.threshold):
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
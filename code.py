@@ -17,8 +17,138 @@ class HighwayOperationScenarios:
 
 
 
+import asyncio
+import bisect
+import copy
+import functools
+import heapq
+import inspect
+import ipaddress
+import itertools
+import json
+import os
+import socket
+import struct
+import sys
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from multiprocessing import shared_memory
+
 import numpy as np
 
+
+def _stack_ragged_profiles(profiles, fill_value=0.0):
+    """将不等长的多条轨迹补齐为二维数组(车辆×时间)，已是数组时直接返回"""
+    if isinstance(profiles, np.ndarray) or not isinstance(profiles, (list, tuple)):
+        return np.asarray(profiles, dtype=float)
+    if len(profiles) == 0 or np.ndim(profiles[0]) == 0:
+        return np.asarray(profiles, dtype=float)
+
+    lengths = [len(profile) for profile in profiles]
+    stacked = np.full((len(profiles), max(lengths, default=0)), fill_value, dtype=float)
+    for i, profile in enumerate(profiles):
+        stacked[i, :lengths[i]] = profile
+    return stacked
+
+
+class EmissionLookupTable:
+    """
+    规则网格查找表
+    在均匀网格上预先计算模型输出，查询时多线性插值；网格外的点由调用方回退到精确公式
+    """
+
+    def __init__(self, axes, values, quantity, max_error=None, metadata=None):
+        """
+        axes: 各维度的均匀网格坐标
+        values: 网格上的函数值
+        quantity: 表中存放的物理量名称
+        max_error: 相对精确公式的最大插值误差（在网格单元中点处评估）
+        """
+        self.axes = [np.asarray(axis, dtype=float) for axis in axes]
+        self.values = np.asarray(values, dtype=float)
+        self.quantity = quantity
+        self.max_error = max_error
+        self.metadata = metadata or {}
+
+        for i, axis in enumerate(self.axes):
+            if axis.ndim != 1 or len(axis) < 2:
+                raise ValueError(f"第{i}维网格至少需要2个坐标")
+            steps = np.diff(axis)
+            if steps[0] <= 0 or not np.allclose(steps, steps[0], rtol=1e-6, atol=0):
+                raise ValueError(f"第{i}维网格须为递增的均匀网格")
+
+        self._origins = np.array([axis[0] for axis in self.axes])
+        self._steps = np.array([axis[1] - axis[0] for axis in self.axes])
+
+    @staticmethod
+    def grid_axis(value_range, step):
+        """按范围与步长生成均匀网格坐标（包含两端）"""
+        low, high = value_range
+        return np.linspace(low, high, int(round((high - low) / step)) + 1)
+
+    def evaluate(self, *coordinates):
+        """
+        多线性插值
+        返回插值结果与“位于网格范围内”的掩码
+        """
+        coordinates = np.broadcast_arrays(*(np.asarray(c, dtype=float) for c in coordinates))
+        in_range = np.ones(coordinates[0].shape, dtype=bool)
+        lower_index, fractions = [], []
+
+        for axis, origin, step, coordinate in zip(self.axes, self._origins, self._steps, coordinates):
+            x = (coordinate - origin) / step
+            in_range &= (x >= 0) & (x <= len(axis) - 1)
+            x = np.nan_to_num(np.clip(x, 0, len(axis) - 1))
+            index = np.minimum(x.astype(np.intp), len(axis) - 2)
+            lower_index.append(index)
+            fractions.append(x - index)
+
+        # 展平索引后逐角点累加，避免高级索引的多维开销
+        flat_values = self.values.ravel()
+        strides = np.cumprod((self.values.shape[1:] + (1,))[::-1])[::-1]
+        base = sum(index * stride for index, stride in zip(lower_index, strides))
+        result = np.zeros(in_range.shape)
+        for corner in itertools.product((0, 1), repeat=len(self.axes)):
+            weight = np.prod([fraction if offset else 1 - fraction
+                              for offset, fraction in zip(corner, fractions)], axis=0)
+            result += weight * flat_values.take(base + int(np.dot(corner, strides)))
+
+        return result, in_range
+
+    def cell_midpoints(self):
+        """各网格单元中点（多线性插值误差通常在此处最大）"""
+        midpoints = [(axis[:-1] + axis[1:]) / 2 for axis in self.axes]
+        return np.meshgrid(*midpoints, indexing='ij')
+
+    @staticmethod
+    def _npz_path(path):
+        """np.savez会自动补全.npz后缀，保存与加载统一使用补全后的路径"""
+        path = os.fspath(path)
+        return path if path.endswith('.npz') else path + '.npz'
+
+    def save(self, path):
+        """保存为npz文件（自动补全.npz后缀）"""
+        path = self._npz_path(path)
+        arrays = {f'axis_{i}': axis for i, axis in enumerate(self.axes)}
+        np.savez(path, values=self.values, quantity=self.quantity,
+                 max_error=np.nan if self.max_error is None else self.max_error,
+                 metadata=json.dumps(self.metadata), **arrays)
+
+    @classmethod
+    def load(cls, path):
+        """从npz文件加载（自动补全.npz后缀）"""
+        with np.load(cls._npz_path(path), allow_pickle=False) as data:
+            num_axes = sum(1 for key in data.files if key.startswith('axis_'))
+            axes = [data[f'axis_{i}'] for i in range(num_axes)]
+            max_error = float(data['max_error'])
+            return cls(axes, data['values'], str(data['quantity']),
+                       None if np.isnan(max_error) else max_error,
+                       json.loads(str(data['metadata'])))
+
+
 class FuelVehicleEmissionModel:
     """燃油车碳排放测算模型"""
 
@@ -32,11 +162,21 @@ class FuelVehicleEmissionModel:
         self.frontal_area = 2.0  # 挡风玻璃面积
         self.friction_coefficient = 0.01  # 内部摩擦系数Ci
 
-    def calculate_vsp(self, velocity, acceleration, road_angle=0, wind_speed=0):
+        # VSP区间上边界（有序），用于批量分箱查找
+        self.vsp_bin_edges = np.array([-2, 0, 1, 4, 7, 10, 13, 16, 19, 23, 28, 33], dtype=float)
+        # 排放速率表只构建一次，批量计算时直接索引
+        self.emission_rate_array = np.asarray(self._get_emission_rate_table(), dtype=float)
+        self.lookup_table = None  # 可选的VSP查找表
+
+    def calculate_vsp(self, velocity, acceleration, road_angle=0, wind_speed=0, drag_coefficient=None):
         """
         计算机动车比功率(VSP)
         公式3.1和3.2
+        drag_coefficient: 修正后的风阻系数（可为逐车数组），缺省使用模型参数
         """
+        if drag_coefficient is None:
+            drag_coefficient = self.drag_coefficient
+
         # 动能变化项
         kinetic_term = velocity * acceleration
 
@@ -47,7 +187,7 @@ class FuelVehicleEmissionModel:
         rolling_term = velocity * self.rolling_resistance * self.gravity * np.cos(road_angle)
 
         # 空气阻力项
-        air_resistance = 0.5 * self.air_density * self.drag_coefficient * self.frontal_area * (
+        air_resistance = 0.5 * self.air_density * drag_coefficient * self.frontal_area * (
                     velocity + wind_speed) ** 2
         air_term = velocity * air_resistance / (self.mass_factor * 1000)  # 转换为kW/t
 
@@ -87,6 +227,95 @@ class FuelVehicleEmissionModel:
 
         return total_emission
 
+    def vsp_bin_classification_batch(self, vsp_values):
+        """
+        批量VSP区间分类
+        与vsp_bin_classification一致，采用有序边界二分查找
+        """
+        return np.searchsorted(self.vsp_bin_edges, vsp_values, side='right')
+
+    def calculate_emission_rate_batch(self, velocity, acceleration, road_angle=0, drag_coefficient=None):
+        """批量计算逐秒CO2排放速率"""
+        velocity = np.asarray(velocity, dtype=float)
+        acceleration = np.asarray(acceleration, dtype=float)
+        if self.lookup_table is not None and drag_coefficient is None:
+            vsp = self._lookup_vsp(velocity, acceleration, road_angle)
+        else:
+            vsp = self.calculate_vsp(velocity, acceleration, road_angle, drag_coefficient=drag_coefficient)
+        return self.emission_rate_array[self.vsp_bin_classification_batch(vsp)]
+
+    def build_lookup_table(self, speed_range=(0, 40), acceleration_range=(-6, 4), speed_step=0.1,
+                           acceleration_step=0.05, road_angles=None):
+        """
+        构建(速度, 加速度[, 道路坡角])的VSP查找表
+        表中存放VSP（连续量）而非排放速率，插值后再分箱，仅在区间边界附近可能落入相邻区间
+        road_angles: 坡角网格(弧度)，须为至少2个点的均匀网格，缺省为平直道路的二维表
+        """
+        axes = [EmissionLookupTable.grid_axis(speed_range, speed_step),
+                EmissionLookupTable.grid_axis(acceleration_range, acceleration_step)]
+        if road_angles is not None:
+            axes.append(np.asarray(road_angles, dtype=float))
+
+        grid = np.meshgrid(*axes, indexing='ij')
+        angle = grid[2] if road_angles is not None else 0
+        values = self.calculate_vsp(grid[0], grid[1], angle)
+
+        table = EmissionLookupTable(axes, values, 'vsp', metadata={
+            'model': type(self).__name__, 'parameters': self._lookup_parameters()})
+
+        # 在网格单元中点评估最大插值误差
+        midpoints = table.cell_midpoints()
+        midpoint_angle = midpoints[2] if road_angles is not None else 0
+        exact = self.calculate_vsp(midpoints[0], midpoints[1], midpoint_angle)
+        interpolated, _ = table.evaluate(*midpoints)
+        table.max_error = float(np.abs(interpolated - exact).max())
+
+        exact_rate = self.emission_rate_array[self.vsp_bin_classification_batch(exact)]
+        interpolated_rate = self.emission_rate_array[self.vsp_bin_classification_batch(interpolated)]
+        table.metadata['max_rate_error'] = float(np.abs(interpolated_rate - exact_rate).max())
+        table.metadata['bin_mismatch_ratio'] = float(np.mean(interpolated_rate != exact_rate))
+        return table
+
+    def use_lookup_table(self, table):
+        """启用查找表模式（table为None时关闭），表须由参数相同的模型构建"""
+        if table is not None and table.metadata.get('parameters') != self._lookup_parameters():
+            raise ValueError("查找表与当前模型参数不一致")
+        self.lookup_table = table
+
+    def _lookup_parameters(self):
+        """影响VSP计算的模型参数"""
+        return {'mass_factor': self.mass_factor, 'gravity': self.gravity,
+                'rolling_resistance': self.rolling_resistance, 'air_density': self.air_density,
+                'drag_coefficient': self.drag_coefficient, 'frontal_area': self.frontal_area}
+
+    def _lookup_vsp(self, velocity, acceleration, road_angle):
+        """查表计算VSP，超出网格范围的样本回退到精确公式"""
+        table = self.lookup_table
+        if len(table.axes) == 3:
+            vsp, in_range = table.evaluate(velocity, acceleration, road_angle)
+        elif np.all(np.asarray(road_angle) == 0):
+            vsp, in_range = table.evaluate(velocity, acceleration)
+        else:
+            return self.calculate_vsp(velocity, acceleration, road_angle)
+
+        if not np.all(in_range):
+            velocity, acceleration, road_angle = np.broadcast_arrays(velocity, acceleration, road_angle)
+            outside = ~in_range
+            vsp[outside] = self.calculate_vsp(velocity[outside], acceleration[outside], road_angle[outside])
+        return vsp
+
+    def calculate_co2_emission_batch(self, velocity, acceleration, duration, road_angle=0):
+        """
+        批量计算CO2排放总量
+        velocity/acceleration: 一维(时间)或二维(车辆×时间)数组
+        duration: 各时间步时长，可与速度数组广播（标量、一维或二维）
+        不等长轨迹可用duration=0补齐
+        返回每辆车的排放总量（一维输入时返回标量）
+        """
+        rates = self.calculate_emission_rate_batch(velocity, acceleration, road_angle)
+        duration = np.broadcast_to(np.asarray(duration, dtype=float), rates.shape)
+        return (rates * duration).sum(axis=-1)
+
     def _get_emission_rate_table(self):
         """获取VSP区间对应的排放速率表"""
         # 这里应该根据实际标定数据填充
@@ -108,6 +337,7 @@ class ElectricVehicleEmissionModel:
         self.rotational_mass_factor = 1.05  # 旋转质量换算系数δ
         self.power_plant_emission = 293.4  # 电厂每度电碳排放(克/千瓦时)
         self.grid_loss_rate = 0.07  # 电网传输损耗率
+        self.lookup_table = None  # 可选的功率查找表
 
     def calculate_instant_power_consumption(self, velocity, acceleration):
         """
@@ -161,22 +391,1026 @@ class ElectricVehicleEmissionModel:
                                                        sum(time_intervals) / 3600)
         return total_emission
 
+    def calculate_instant_power_consumption_batch(self, velocity, acceleration, drag_coefficient=None):
+        """批量计算电动车瞬时电耗（负功率截断为0）"""
+        velocity = np.asarray(velocity, dtype=float)
+        acceleration = np.asarray(acceleration, dtype=float)
+        if self.lookup_table is not None and drag_coefficient is None:
+            return np.maximum(self._lookup_power(velocity, acceleration), 0)
+        return np.maximum(self._calculate_raw_power(velocity, acceleration, drag_coefficient), 0)
+
+    def _calculate_raw_power(self, velocity, acceleration, drag_coefficient=None):
+        """未截断的瞬时功率（公式3.4）"""
+        if drag_coefficient is None:
+            drag_coefficient = self.drag_coefficient
+
+        rolling_power = self.rolling_resistance_coef * velocity
+        air_power = 0.5 * drag_coefficient * self.frontal_area * velocity ** 3
+        acceleration_power = self.rotational_mass_factor * velocity * acceleration
+
+        return (rolling_power + air_power + acceleration_power) / self.transmission_efficiency
+
+    def build_lookup_table(self, speed_range=(0, 40), acceleration_range=(-6, 4), speed_step=0.1,
+                           acceleration_step=0.05):
+        """
+        构建(速度, 加速度)的瞬时功率查找表
+        表中存放截断前的功率，插值后再截断为非负，避免截断拐点处的插值误差
+        """
+        axes = [EmissionLookupTable.grid_axis(speed_range, speed_step),
+                EmissionLookupTable.grid_axis(acceleration_range, acceleration_step)]
+        grid = np.meshgrid(*axes, indexing='ij')
+        table = EmissionLookupTable(axes, self._calculate_raw_power(*grid), 'power', metadata={
+            'model': type(self).__name__, 'parameters': self._lookup_parameters()})
+
+        midpoints = table.cell_midpoints()
+        interpolated, _ = table.evaluate(*midpoints)
+        table.max_error = float(np.abs(np.maximum(interpolated, 0) -
+                                       np.maximum(self._calculate_raw_power(*midpoints), 0)).max())
+        return table
+
+    def use_lookup_table(self, table):
+        """启用查找表模式（table为None时关闭），表须由参数相同的模型构建"""
+        if table is not None and table.metadata.get('parameters') != self._lookup_parameters():
+            raise ValueError("查找表与当前模型参数不一致")
+        self.lookup_table = table
+
+    def _lookup_parameters(self):
+        """影响功率计算的模型参数"""
+        return {'transmission_efficiency': self.transmission_efficiency,
+                'rolling_resistance_coef': self.rolling_resistance_coef,
+                'drag_coefficient': self.drag_coefficient, 'frontal_area': self.frontal_area,
+                'rotational_mass_factor': self.rotational_mass_factor}
+
+    def _lookup_power(self, velocity, acceleration):
+        """查表计算功率，超出网格范围的样本回退到精确公式"""
+        power, in_range = self.lookup_table.evaluate(velocity, acceleration)
+        if not np.all(in_range):
+            velocity, acceleration = np.broadcast_arrays(velocity, acceleration)
+            outside = ~in_range
+            power[outside] = self._calculate_raw_power(velocity[outside], acceleration[outside])
+        return power
+
+    def calculate_fleet_emission(self, velocity_profiles, acceleration_profiles, time_intervals):
+        """
+        车队批量碳排放计算
+        velocity_profiles/acceleration_profiles: 二维数组(车辆×时间)，或不等长轨迹列表
+        time_intervals: 时间间隔，可为标量、一维(共享时间轴)、二维或不等长列表
+        不等长轨迹按0补齐，补齐部分时间间隔为0，不计入电耗
+        返回每辆车的电耗(千瓦时)与CO2当量
+        """
+        velocity = _stack_ragged_profiles(velocity_profiles)
+        acceleration = _stack_ragged_profiles(acceleration_profiles)
+        intervals = np.broadcast_to(_stack_ragged_profiles(time_intervals), velocity.shape)
+
+        instant_power = self.calculate_instant_power_consumption_batch(velocity, acceleration)
+        # 转换为千瓦时
+        power_kwh = (instant_power * intervals).sum(axis=-1) / 3600 / 1000
+        co2_emission = self.calculate_co2_equivalent(power_kwh, intervals.sum(axis=-1) / 3600)
+
+        return {
+            'power_consumption_kwh': power_kwh,
+            'co2_emission': co2_emission
+        }
+
+
+def _calculate_sample_emission(fuel_model, electric_model, is_electric, velocity, acceleration, dt,
+                               drag_coefficient=None):
+    """按车型（燃油/电动）分组计算逐样本排放量"""
+    emission = np.empty(np.shape(is_electric))
+    fuel = ~is_electric
+    fuel_drag = electric_drag = drag_coefficient
+    if np.ndim(drag_coefficient) > 0:
+        fuel_drag = drag_coefficient[fuel]
+        electric_drag = drag_coefficient[is_electric]
+
+    emission[fuel] = fuel_model.calculate_emission_rate_batch(
+        velocity[fuel], acceleration[fuel], drag_coefficient=fuel_drag) * dt[fuel]
+
+    # 转换为千瓦时后计算CO2当量
+    power_kwh = electric_model.calculate_instant_power_consumption_batch(
+        velocity[is_electric], acceleration[is_electric],
+        drag_coefficient=electric_drag) * dt[is_electric] / 3600 / 1000
+    emission[is_electric] = electric_model.calculate_co2_equivalent(power_kwh, dt[is_electric] / 3600)
+
+    return emission
+
+
+
+"__________________________________________________________________________"
+
+
+class StreamingEmissionAccumulator:
+    """车辆碳排放流式累加器（实时数字孪生）"""
+
+    def __init__(self, window_seconds=60, bucket_seconds=1.0, initial_capacity=1024):
+        self.fuel_model = FuelVehicleEmissionModel()
+        self.electric_model = ElectricVehicleEmissionModel()
+
+        # 滑动窗口按时间桶划分，窗口总量增量维护
+        self.window_seconds = window_seconds
+        self.bucket_seconds = bucket_seconds
+        self.num_buckets = max(1, int(np.ceil(window_seconds / bucket_seconds)))
+
+        self.clock = 0.0  # 当前时刻(秒)
+        self._current_bucket = 0  # 当前时间桶的绝对序号
+
+        self.slot_of = {}  # 车辆ID -> 槽位
+        self._free_slots = []
+        self._next_slot = 0
+        self._allocate(initial_capacity)
+
+    def _allocate(self, capacity):
+        """按容量分配（或扩容）各状态数组"""
+        old_capacity = self._next_slot
+        vehicle_ids = np.empty(capacity, dtype=object)
+        is_electric = np.zeros(capacity, dtype=bool)
+        total_emission = np.zeros(capacity)
+        window_emission = np.zeros(capacity)
+        window_buckets = np.zeros((capacity, self.num_buckets))
+        last_seen = np.full(capacity, -np.inf)
+
+        if old_capacity:
+            vehicle_ids[:old_capacity] = self.vehicle_ids[:old_capacity]
+            is_electric[:old_capacity] = self.is_electric[:old_capacity]
+            total_emission[:old_capacity] = self.total_emission[:old_capacity]
+            window_emission[:old_capacity] = self.window_emission[:old_capacity]
+            window_buckets[:old_capacity] = self.window_buckets[:old_capacity]
+            last_seen[:old_capacity] = self.last_seen[:old_capacity]
+
+        self.vehicle_ids = vehicle_ids
+        self.is_electric = is_electric
+        self.total_emission = total_emission
+        self.window_emission = window_emission
+        self.window_buckets = window_buckets
+        self.last_seen = last_seen
+
+    def register_vehicles(self, vehicle_ids, vehicle_types='fuel'):
+        """
+        注册车辆
+        vehicle_types: 单个类型或与vehicle_ids等长的类型列表，含'electric'的类型按电动车计算
+        返回各车辆的槽位
+        """
+        if isinstance(vehicle_types, str):
+            vehicle_types = [vehicle_types] * len(vehicle_ids)
+
+        slots = np.empty(len(vehicle_ids), dtype=np.intp)
+        for i, (vehicle_id, vehicle_type) in enumerate(zip(vehicle_ids, vehicle_types)):
+            slot = self.slot_of.get(vehicle_id)
+            if slot is None:
+                if self._free_slots:
+                    slot = self._free_slots.pop()
+                else:
+                    if self._next_slot == len(self.total_emission):
+                        self._allocate(2 * len(self.total_emission))
+                    slot = self._next_slot
+                    self._next_slot += 1
+                self.slot_of[vehicle_id] = slot
+                self.vehicle_ids[slot] = vehicle_id
+                self.last_seen[slot] = self.clock
+
+            self.is_electric[slot] = 'electric' in vehicle_type
+            slots[i] = slot
+
+        return slots
+
+    def get_slots(self, vehicle_ids):
+        """查询车辆槽位，未注册车辆抛出KeyError"""
+        return np.fromiter((self.slot_of[vehicle_id] for vehicle_id in vehicle_ids),
+                           dtype=np.intp, count=len(vehicle_ids))
+
+    def push(self, vehicle_ids, velocity, acceleration, dt, timestamp=None):
+        """
+        推入一帧多车样本(v, a, dt)
+        timestamp: 帧时刻(秒)，缺省时按本帧最大dt推进时钟
+        """
+        return self.push_slots(self.get_slots(vehicle_ids), velocity, acceleration, dt, timestamp)
+
+    def push_slots(self, slots, velocity, acceleration, dt, timestamp=None):
+        """按槽位推入一帧样本，返回各样本的排放量"""
+        slots = np.asarray(slots, dtype=np.intp)
+        velocity = np.asarray(velocity, dtype=float)
+        acceleration = np.asarray(acceleration, dtype=float)
+        dt = np.broadcast_to(np.asarray(dt, dtype=float), slots.shape)
+
+        if timestamp is None:
+            timestamp = self.clock + (dt.max() if dt.size else 0.0)
+        self._advance_clock(timestamp)
+
+        emission = _calculate_sample_emission(self.fuel_model, self.electric_model,
+                                              self.is_electric[slots], velocity, acceleration, dt)
+
+        np.add.at(self.total_emission, slots, emission)
+        np.add.at(self.window_emission, slots, emission)
+        column = self._current_bucket % self.num_buckets
+        np.add.at(self.window_buckets[:, column], slots, emission)
+        self.last_seen[slots] = self.clock
+
+        return emission
+
+    def _advance_clock(self, timestamp):
+        """推进时钟，淘汰滑出窗口的时间桶"""
+        new_bucket = int(timestamp // self.bucket_seconds)
+        if new_bucket > self._current_bucket:
+            expired = range(self._current_bucket + 1,
+                            min(new_bucket, self._current_bucket + self.num_buckets) + 1)
+            for bucket in expired:
+                column = bucket % self.num_buckets
+                self.window_emission -= self.window_buckets[:, column]
+                self.window_buckets[:, column] = 0
+            self._current_bucket = new_bucket
+
+        self.clock = max(self.clock, timestamp)
+
+    def get_total_emission(self, vehicle_ids):
+        """读取车辆累计排放量"""
+        return self.total_emission[self.get_slots(vehicle_ids)]
+
+    def get_window_emission(self, vehicle_ids):
+        """读取车辆在滑动窗口（最近window_seconds秒）内的排放量"""
+        return self.window_emission[self.get_slots(vehicle_ids)]
+
+    def evict(self, vehicle_ids):
+        """
+        移除驶离匝道影响区的车辆
+        返回被移除车辆的累计排放量
+        """
+        final_totals = {}
+        for vehicle_id in vehicle_ids:
+            slot = self.slot_of.pop(vehicle_id, None)
+            if slot is None:
+                continue
+            final_totals[vehicle_id] = self.total_emission[slot]
+
+            self.vehicle_ids[slot] = None
+            self.is_electric[slot] = False
+            self.total_emission[slot] = 0
+            self.window_emission[slot] = 0
+            self.window_buckets[slot] = 0
+            self.last_seen[slot] = -np.inf
+            self._free_slots.append(slot)
+
+        return final_totals
+
+    def evict_idle(self, max_idle_seconds):
+        """移除超过max_idle_seconds未收到样本的车辆"""
+        slots = np.flatnonzero(self.last_seen[:self._next_slot] < self.clock - max_idle_seconds)
+        return self.evict([self.vehicle_ids[slot] for slot in slots if self.vehicle_ids[slot] is not None])
+
 
 
 "__________________________________________________________________________"
 
 
+class ColumnarTrafficState:
+    """列式交通状态（结构数组），每行对应一辆车在当前帧的状态"""
+
+    VEHICLE_CLASSES = ('fuel', 'electric', 'smart_fuel', 'smart_electric',
+                       'platoon_fuel', 'platoon_electric')
+    ELECTRIC_CLASSES = ('electric', 'smart_electric', 'platoon_electric')
+
+    def __init__(self, vehicle_class, automation_level, lane, position, speed, acceleration,
+                 spacing=None, frame_interval=1.0):
+        """
+        vehicle_class: 车型编码（VEHICLE_CLASSES中的序号）或车型名称
+        automation_level: 自动化等级(0-5，对应L0-L5)
+        spacing: 与前车间距，无前车为NaN
+        frame_interval: 帧时长(秒)
+        """
+        if len(vehicle_class) and isinstance(vehicle_class[0], str):
+            vehicle_class = [self.VEHICLE_CLASSES.index(name) for name in vehicle_class]
+
+        self.vehicle_class = np.asarray(vehicle_class, dtype=np.int8)
+        self.automation_level = np.asarray(automation_level, dtype=np.int8)
+        self.lane = np.asarray(lane, dtype=np.int8)
+        self.position = np.asarray(position, dtype=float)
+        self.speed = np.asarray(speed, dtype=float)
+        self.acceleration = np.asarray(acceleration, dtype=float)
+        if spacing is None:
+            spacing = np.full(len(self.vehicle_class), np.nan)
+        self.spacing = np.asarray(spacing, dtype=float)
+        self.frame_interval = frame_interval
+
+    def __len__(self):
+        return len(self.vehicle_class)
+
+    @classmethod
+    def class_code(cls, class_name):
+        """车型名称 -> 编码"""
+        return cls.VEHICLE_CLASSES.index(class_name)
+
+    @property
+    def is_electric(self):
+        """电动车掩码"""
+        codes = [self.class_code(name) for name in self.ELECTRIC_CLASSES]
+        return np.isin(self.vehicle_class, codes)
+
+    def select(self, mask):
+        """按掩码或索引选取子集"""
+        return ColumnarTrafficState(
+            self.vehicle_class[mask], self.automation_level[mask], self.lane[mask],
+            self.position[mask], self.speed[mask], self.acceleration[mask],
+            self.spacing[mask], self.frame_interval)
+
+    @classmethod
+    def from_traffic_data(cls, traffic_data, frame_interval=1.0):
+        """由按车型分组的车辆字典列表构建列式状态"""
+        groups = [('fuel_vehicles', 'fuel', 0),
+                  ('smart_electric_vehicles', 'smart_electric', 2),
+                  ('smart_fuel_vehicles', 'smart_fuel', 2)]
+
+        columns = {key: [] for key in ('vehicle_class', 'automation_level', 'lane',
+                                       'position', 'speed', 'acceleration', 'spacing')}
+        for group_key, class_name, default_level in groups:
+            for vehicle in traffic_data.get(group_key, []):
+                columns['vehicle_class'].append(cls.class_code(class_name))
+                columns['automation_level'].append(vehicle.get('automation_level', default_level))
+                columns['lane'].append(vehicle.get('lane', 0))
+                columns['position'].append(vehicle.get('position', 0.0))
+                columns['speed'].append(vehicle.get('speed', vehicle.get('velocity', 0.0)))
+                columns['acceleration'].append(vehicle.get('acceleration', 0.0))
+                columns['spacing'].append(vehicle.get('spacing_to_leader', np.nan))
+
+        return cls(frame_interval=frame_interval, **columns)
+
+
+class TrajectoryStoreWriter:
+    """
+    列式轨迹存储写入器
+    每列一个定长二进制文件，按车辆连续存放；关闭时写入逐车偏移索引与元数据
+    """
+
+    COLUMNS = (('vehicle_id', np.int64), ('timestamp', np.float64), ('lane', np.int8),
+               ('position', np.float64), ('speed', np.float64), ('acceleration', np.float64),
+               ('vehicle_class', np.int8))
+
+    def __init__(self, path):
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self._files = {name: open(os.path.join(path, f'{name}.bin'), 'wb')
+                       for name, _ in self.COLUMNS}
+        self._vehicle_ids = []
+        self._offsets = [0]
+        self._seen = set()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def append(self, vehicle_id, timestamp, lane, position, speed, acceleration, vehicle_class):
+        """追加一辆车的完整轨迹（各列等长，按时间排序）"""
+        columns = {'timestamp': timestamp, 'lane': lane, 'position': position, 'speed': speed,
+                   'acceleration': acceleration, 'vehicle_class': vehicle_class}
+        length = len(np.atleast_1d(timestamp))
+        self.append_block(np.full(length, vehicle_id), **columns)
+
+    def append_block(self, vehicle_id, timestamp, lane, position, speed, acceleration, vehicle_class):
+        """
+        追加一批样本，块内按(车辆, 时间)稳定排序后写入
+        同一车辆的全部样本必须在同一批内写入，保证存储中逐车连续
+        vehicle_class可为车型编码或车型名称
+        """
+        vehicle_id = np.asarray(vehicle_id, dtype=np.int64)
+        if len(vehicle_id) == 0:
+            return
+        if isinstance(vehicle_class, str) or (len(vehicle_class) and isinstance(vehicle_class[0], str)):
+            names = np.broadcast_to(np.asarray(vehicle_class), vehicle_id.shape)
+            vehicle_class = [ColumnarTrafficState.class_code(name) for name in names]
+
+        columns = {'vehicle_id': vehicle_id, 'timestamp': timestamp, 'lane': lane,
+                   'position': position, 'speed': speed, 'acceleration': acceleration,
+                   'vehicle_class': vehicle_class}
+        columns = {name: np.broadcast_to(np.asarray(columns[name], dtype=dtype), vehicle_id.shape)
+                   for name, dtype in self.COLUMNS}
+
+        order = np.lexsort((columns['timestamp'], vehicle_id))
+        sorted_ids = vehicle_id[order]
+        starts = np.flatnonzero(np.r_[True, sorted_ids[1:] != sorted_ids[:-1]])
+        block_ids = sorted_ids[starts].tolist()
+        if self._seen.intersection(block_ids):
+            raise ValueError("车辆轨迹已写入，同一车辆的样本须在一批内写入")
+
+        for name, _ in self.COLUMNS:
+            self._files[name].write(np.ascontiguousarray(columns[name][order]).tobytes())
+
+        self._seen.update(block_ids)
+        self._vehicle_ids.extend(block_ids)
+        lengths = np.diff(np.r_[starts, len(order)])
+        self._offsets.extend((self._offsets[-1] + np.cumsum(lengths)).tolist())
+
+    def close(self):
+        """关闭列文件并写入偏移索引"""
+        if self._files is None:
+            return
+        for file in self._files.values():
+            file.close()
+        self._files = None
+
+        np.save(os.path.join(self.path, 'index_vehicle_id.npy'),
+                np.asarray(self._vehicle_ids, dtype=np.int64))
+        np.save(os.path.join(self.path, 'index_offsets.npy'),
+                np.asarray(self._offsets, dtype=np.int64))
+        with open(os.path.join(self.path, 'meta.json'), 'w') as file:
+            json.dump({'num_rows': self._offsets[-1], 'num_vehicles': len(self._vehicle_ids),
+                       'columns': {name: np.dtype(dtype).str for name, dtype in self.COLUMNS},
+                       'vehicle_classes': list(ColumnarTrafficState.VEHICLE_CLASSES)}, file)
+
+
+class TrajectoryStore:
+    """
+    列式轨迹存储读取器
+    各列通过np.memmap只读映射，按需分页加载；切片均为零拷贝视图
+    """
+
+    def __init__(self, path):
+        with open(os.path.join(path, 'meta.json')) as file:
+            meta = json.load(file)
+        self.path = path
+        self.num_rows = meta['num_rows']
+        self.vehicle_ids = np.load(os.path.join(path, 'index_vehicle_id.npy'), mmap_mode='r')
+        self.offsets = np.load(os.path.join(path, 'index_offsets.npy'), mmap_mode='r')
+        # 车辆ID -> 索引序号
+        self._positions = {vehicle_id: i for i, vehicle_id in enumerate(self.vehicle_ids.tolist())}
+
+        self.columns = {}
+        for name, dtype in meta['columns'].items():
+            if self.num_rows == 0:
+                self.columns[name] = np.empty(0, dtype=dtype)
+            else:
+                self.columns[name] = np.memmap(os.path.join(path, f'{name}.bin'), dtype=dtype,
+                                               mode='r', shape=(self.num_rows,))
+
+    def __len__(self):
+        return len(self.vehicle_ids)
+
+    def __getitem__(self, name):
+        return self.columns[name]
+
+    def trajectory(self, vehicle_id):
+        """单车轨迹（各列零拷贝视图）"""
+        i = self._positions[vehicle_id]
+        return self.rows(self.offsets[i], self.offsets[i + 1])
+
+    def rows(self, start, stop):
+        """按行区间取各列零拷贝视图"""
+        return {name: column[start:stop] for name, column in self.columns.items()}
+
+    def vehicle_range(self, first, last):
+        """第first到last辆车（不含last）的连续行区间"""
+        return int(self.offsets[first]), int(self.offsets[last])
+
+    def iter_chunks(self, max_rows=1 << 20):
+        """
+        按车辆边界切分的行块迭代器，每块不超过max_rows行（单车超长时独占一块）
+        返回(各列视图, 块内逐车偏移)
+        """
+        offsets = np.asarray(self.offsets)
+        first = 0
+        while first < len(self):
+            last = int(np.searchsorted(offsets, offsets[first] + max_rows, side='right')) - 1
+            last = min(max(last, first + 1), len(self))
+            start, stop = self.vehicle_range(first, last)
+            yield self.rows(start, stop), offsets[first:last + 1] - start
+            first = last
+
+    @staticmethod
+    def sample_intervals(timestamps, local_offsets, default_interval=1.0):
+        """
+        由时间戳计算逐样本时长：取到同车下一样本的时间差，
+        每车最后一个样本沿用前一时长（单样本车辆取default_interval）
+        """
+        timestamps = np.asarray(timestamps, dtype=float)
+        intervals = np.empty(len(timestamps))
+        if len(timestamps) == 0:
+            return intervals
+        intervals[:-1] = np.diff(timestamps)
+        last = local_offsets[1:] - 1
+        first = local_offsets[:-1]
+        has_previous = last > first
+        intervals[last[has_previous]] = intervals[last[has_previous] - 1]
+        intervals[last[~has_previous]] = default_interval
+        return intervals
+
+
+class TrajectoryCsvReader:
+    """
+    轨迹CSV分块读取器（NGSIM/highD格式：id, frame, lane, x, v, a）
+    按固定行数分块解析为NumPy列，跨块缓存未结束车辆的样本，只输出已完整的车辆轨迹，
+    内存占用由块大小与在途车辆数决定而与文件大小无关
+    """
+
+    # 列名别名（小写匹配）：本项目命名、NGSIM、highD
+    COLUMN_ALIASES = {
+        'vehicle_id': ('id', 'vehicle_id', 'trackid'),
+        'frame': ('frame', 'frame_id'),
+        'lane': ('lane', 'lane_id', 'laneid'),
+        'position': ('x', 'local_y', 'position'),
+        'speed': ('v', 'v_vel', 'xvelocity', 'speed'),
+        'acceleration': ('a', 'v_acc', 'xacceleration', 'acceleration'),
+        'vehicle_class': ('class', 'vehicle_class'),
+    }
+
+    def __init__(self, path, chunk_rows=1 << 18, frame_interval=0.1, sorted_by='vehicle',
+                 idle_frames=None, default_class='fuel', column_map=None, delimiter=',', class_map=None):
+        """
+        chunk_rows: 每块解析的行数
+        frame_interval: 帧时长(秒)，时间戳 = frame × frame_interval
+        sorted_by: 'vehicle'（按车辆排序，如NGSIM/highD tracks）或'frame'（按帧排序的实时导出）
+        idle_frames: 按帧排序时必填，车辆超过该帧数未出现即视为轨迹结束；须不小于任一车辆轨迹中
+                     最长的连续缺帧数，已输出的车辆再次出现时抛出ValueError
+        default_class: 文件无车型列时使用的车型
+        column_map: 自定义列名映射 {标准列名: 文件列名}
+        class_map: 车型标签映射 {文件中的标签: 车型名称}，如{'Car': 'fuel'}；
+                   未映射的标签须为车型名称（不区分大小写）或车型编码
+        """
+        if sorted_by not in ('vehicle', 'frame'):
+            raise ValueError("sorted_by须为'vehicle'或'frame'")
+        if sorted_by == 'frame' and idle_frames is None:
+            raise ValueError("按帧排序时须指定idle_frames（不小于轨迹中最长的连续缺帧数）")
+        self.path = path
+        self.chunk_rows = chunk_rows
+        self.frame_interval = frame_interval
+        self.sorted_by = sorted_by
+        self.idle_frames = idle_frames
+        self.default_class = ColumnarTrafficState.class_code(default_class)
+        self.column_map = column_map or {}
+        self.delimiter = delimiter
+        self.class_map = class_map or {}
+
+    def _resolve_columns(self, header):
+        """由表头确定各标准列的列号，车型列可缺省"""
+        names = [name.strip().lower() for name in header.split(self.delimiter)]
+        indices = {}
+        for column, aliases in self.COLUMN_ALIASES.items():
+            if column in self.column_map:
+                aliases = (self.column_map[column].lower(),)
+            found = [names.index(alias) for alias in aliases if alias in names]
+            if found:
+                indices[column] = found[0]
+            elif column != 'vehicle_class':
+                raise ValueError(f"CSV缺少列: {column}")
+        return indices
+
+    def iter_blocks(self):
+        """逐块解析原始行，返回各标准列数组"""
+        with open(self.path) as file:
+            indices = self._resolve_columns(file.readline())
+            names = [name for name in indices if name != 'vehicle_class']
+            numeric_columns = [indices[name] for name in names]
+            while True:
+                lines = list(itertools.islice(file, self.chunk_rows))
+                if not lines:
+                    return
+                values = np.loadtxt(lines, delimiter=self.delimiter, usecols=numeric_columns, ndmin=2)
+                block = {name: values[:, i] for i, name in enumerate(names)}
+                if 'vehicle_class' in indices:
+                    # 车型列按字符串读取，各标签只转换一次
+                    labels = np.loadtxt(lines, dtype=str, delimiter=self.delimiter,
+                                        usecols=indices['vehicle_class'], ndmin=1)
+                    unique_labels, inverse = np.unique(labels, return_inverse=True)
+                    codes = np.array([self._class_code(label) for label in unique_labels], dtype=np.int8)
+                    block['vehicle_class'] = codes[inverse]
+                else:
+                    block['vehicle_class'] = np.full(len(values), self.default_class)
+                yield block
+
+    def _class_code(self, label):
+        """车型标签 -> 车型编码"""
+        label = label.strip().strip('"')
+        name = self.class_map.get(label, label)
+        if isinstance(name, (int, np.integer)) or name.isdigit():
+            code = int(name)
+            if code >= len(ColumnarTrafficState.VEHICLE_CLASSES):
+                raise ValueError(f"未知的车型编码: {label}")
+            return code
+        if name.lower() not in ColumnarTrafficState.VEHICLE_CLASSES:
+            raise ValueError(f"未知的车型标签: {label}，可通过class_map指定对应车型")
+        return ColumnarTrafficState.class_code(name.lower())
+
+    def iter_trajectories(self):
+        """
+        逐块输出已完整的车辆轨迹
+        返回(各列数组, 块内逐车偏移)，与TrajectoryStore.iter_chunks格式一致
+        """
+        pending = None
+        finished = np.empty(0, dtype=np.int64)  # 已输出的车辆ID（有序）
+        for block in self.iter_blocks():
+            reappeared = np.isin(block['vehicle_id'], finished)
+            if reappeared.any():
+                raise ValueError(self._reappeared_message(int(block['vehicle_id'][reappeared][0])))
+            rows = block if pending is None else {
+                name: np.concatenate((pending[name], block[name])) for name in block}
+
+            if self.sorted_by == 'vehicle':
+                # 块末尾车辆可能延续到下一块
+                complete = rows['vehicle_id'] != block['vehicle_id'][-1]
+            else:
+                vehicle_ids, inverse = np.unique(rows['vehicle_id'], return_inverse=True)
+                last_frame = np.full(len(vehicle_ids), -np.inf)
+                np.maximum.at(last_frame, inverse, rows['frame'])
+                complete = (last_frame < block['frame'].max() - self.idle_frames)[inverse]
+
+            if complete.any():
+                finished = np.union1d(finished, rows['vehicle_id'][complete].astype(np.int64))
+                yield self._group_by_vehicle({name: column[complete] for name, column in rows.items()})
+            pending = {name: column[~complete] for name, column in rows.items()}
+
+        if pending is not None and len(pending['vehicle_id']):
+            yield self._group_by_vehicle(pending)
+
+    def _reappeared_message(self, vehicle_id):
+        """已输出车辆再次出现时的错误信息"""
+        if self.sorted_by == 'frame':
+            return (f"车辆{vehicle_id}在缺帧超过idle_frames={self.idle_frames}后再次出现，"
+                    f"其轨迹已作为完整轨迹输出；请增大idle_frames")
+        return f"车辆{vehicle_id}的样本不连续，文件未按车辆排序，请使用sorted_by='frame'"
+
+    def _group_by_vehicle(self, rows):
+        """按(车辆, 帧)排序并转换为标准列与逐车偏移"""
+        order = np.lexsort((rows['frame'], rows['vehicle_id']))
+        vehicle_id = rows['vehicle_id'][order].astype(np.int64)
+        columns = {
+            'vehicle_id': vehicle_id,
+            'timestamp': rows['frame'][order] * self.frame_interval,
+            'lane': rows['lane'][order].astype(np.int8),
+            'position': rows['position'][order],
+            'speed': rows['speed'][order],
+            'acceleration': rows['acceleration'][order],
+            'vehicle_class': rows['vehicle_class'][order].astype(np.int8),
+        }
+        starts = np.flatnonzero(np.r_[True, vehicle_id[1:] != vehicle_id[:-1]])
+        return columns, np.r_[starts, len(vehicle_id)]
+
+    def write_store(self, path):
+        """转换为列式轨迹存储（TrajectoryStore）"""
+        with TrajectoryStoreWriter(path) as writer:
+            for columns, _ in self.iter_trajectories():
+                writer.append_block(**columns)
+        return TrajectoryStore(path)
+
+
+# V2X/雷达车辆状态报文：报文头(魔数, 传感器ID, 记录数) + 定长记录
+V2X_MAGIC = b'V2XS'
+V2X_HEADER = struct.Struct('<4sHH')
+V2X_RECORD_DTYPE = np.dtype([('vehicle_id', '<u4'), ('timestamp', '<f8'), ('position', '<f4'),
+                             ('speed', '<f4'), ('acceleration', '<f4'), ('lane', 'i1'),
+                             ('vehicle_class', 'i1'), ('automation_level', 'i1'), ('sensor_id', 'u1')])
+V2X_MAX_RECORDS = (65507 - V2X_HEADER.size) // V2X_RECORD_DTYPE.itemsize  # 单个UDP报文可容纳的记录数
+
+
+def encode_v2x_message(records, sensor_id=0):
+    """将车辆状态记录（V2X_RECORD_DTYPE结构数组）编码为一条报文"""
+    records = np.asarray(records, dtype=V2X_RECORD_DTYPE)
+    return V2X_HEADER.pack(V2X_MAGIC, sensor_id, len(records)) + records.tobytes()
+
+
+def decode_v2x_messages(payloads):
+    """批量解码多条报文，返回合并后的记录数组与被跳过的格式错误报文数"""
+    bodies = []
+    for payload in payloads:
+        if len(payload) < V2X_HEADER.size:
+            continue
+        magic, _, count = V2X_HEADER.unpack_from(payload)
+        if magic != V2X_MAGIC or len(payload) != V2X_HEADER.size + count * V2X_RECORD_DTYPE.itemsize:
+            continue
+        bodies.append(payload[V2X_HEADER.size:])
+    return np.frombuffer(b''.join(bodies), dtype=V2X_RECORD_DTYPE), len(payloads) - len(bodies)
+
+
+class _V2XDatagramProtocol(asyncio.DatagramProtocol):
+    """UDP接收：每个数据报为一条报文"""
+
+    def __init__(self, service):
+        self.service = service
+
+    def datagram_received(self, data, addr):
+        self.service.feed(data)
+
+
+class _V2XStreamProtocol(asyncio.Protocol):
+    """TCP接收：按报文头中的记录数切分字节流"""
+
+    def __init__(self, service):
+        self.service = service
+        self.buffer = bytearray()
+        self.transport = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+        self.service._stream_protocols.add(self)
+        if self.service._reading_paused:
+            transport.pause_reading()
+
+    def connection_lost(self, exc):
+        self.service._stream_protocols.discard(self)
+
+    def data_received(self, data):
+        self.buffer += data
+        self.parse_buffer()
+
+    def parse_buffer(self):
+        """切分缓冲区中的完整报文；服务暂停读取时保留剩余字节，恢复后继续"""
+        while len(self.buffer) >= V2X_HEADER.size and not self.service._reading_paused:
+            magic, _, count = V2X_HEADER.unpack_from(self.buffer)
+            if magic != V2X_MAGIC:
+                # 流已失步，断开连接
+                self.service.statistics['malformed_messages'] += 1
+                self.transport.close()
+                return
+            size = V2X_HEADER.size + count * V2X_RECORD_DTYPE.itemsize
+            if len(self.buffer) < size:
+                return
+            self.service.feed(bytes(self.buffer[:size]), droppable=self.service.overflow == 'drop_oldest')
+            del self.buffer[:size]
+
+
+class V2XIngestionService:
+    """
+    V2X/毫米波雷达车辆状态接入服务（asyncio）
+    接收端只缓存原始报文，发布周期内批量解码并合并为各车最新状态，
+    按固定频率向模型循环发布ColumnarTrafficState快照
+    """
+
+    def __init__(self, publish_rate=20.0, max_pending_messages=4096, overflow='drop_oldest',
+                 stale_seconds=1.0):
+        """
+        publish_rate: 快照发布频率(Hz)
+        max_pending_messages: 待解码报文缓存上限
+        overflow: 缓存满时的策略，'drop_oldest'丢弃最旧报文；
+                  'backpressure'暂停TCP读取直至下一发布周期清空缓存（UDP无法反压，仍丢弃最旧报文）
+        stale_seconds: 车辆超过该时长无更新即从快照中移除（按报文时间戳与本地接收时刻分别判断，
+                       数据源静默时每个发布周期仍会移除）
+        """
+        if overflow not in ('drop_oldest', 'backpressure'):
+            raise ValueError("overflow须为'drop_oldest'或'backpressure'")
+        self.publish_interval = 1.0 / publish_rate
+        self.max_pending_messages = max_pending_messages
+        self.overflow = overflow
+        self.stale_seconds = stale_seconds
+
+        self._pending = deque()
+        self._latest = np.empty(0, dtype=V2X_RECORD_DTYPE)  # 各车最新状态，按车辆ID排序
+        self._received_at = np.empty(0)  # 与_latest对应的本地接收时刻(time.monotonic)
+        self._subscribers = []
+        self._servers = []
+        self._stream_protocols = set()
+        self._reading_paused = False
+        self._publish_task = None
+        self.statistics = {'received_messages': 0, 'dropped_messages': 0, 'malformed_messages': 0,
+                           'decoded_records': 0, 'published_snapshots': 0, 'dropped_snapshots': 0,
+                           'backpressure_pauses': 0}
+
+    async def start_udp(self, host='127.0.0.1', port=9000, receive_buffer_bytes=8 << 20,
+                        allow_external=False):
+        """
+        开始监听UDP端口
+        receive_buffer_bytes: 套接字接收缓冲区大小，数百个传感器同帧突发时避免内核丢包
+        allow_external: 报文未经认证，默认只允许绑定本机回环地址；接收路侧设备数据时须显式设为True
+        """
+        self._check_bind_host(host, allow_external)
+        loop = asyncio.get_running_loop()
+        transport, _ = await loop.create_datagram_endpoint(lambda: _V2XDatagramProtocol(self),
+                                                           local_addr=(host, port))
+        transport.get_extra_info('socket').setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF,
+                                                      receive_buffer_bytes)
+        self._servers.append(transport)
+        self._ensure_publishing()
+        return transport.get_extra_info('sockname')
+
+    async def start_tcp(self, host='127.0.0.1', port=9001, allow_external=False):
+        """开始监听TCP端口，allow_external同start_udp"""
+        self._check_bind_host(host, allow_external)
+        loop = asyncio.get_running_loop()
+        server = await loop.create_server(lambda: _V2XStreamProtocol(self), host, port)
+        self._servers.append(server)
+        self._ensure_publishing()
+        return server.sockets[0].getsockname()
+
+    @staticmethod
+    def _check_bind_host(host, allow_external):
+        """非回环地址（含'0.0.0.0'等全部网卡）须显式允许"""
+        if allow_external or host == 'localhost':
+            return
+        try:
+            loopback = ipaddress.ip_address(host).is_loopback
+        except ValueError:
+            loopback = False
+        if not loopback:
+            raise ValueError(f"监听地址{host!r}不是本机回环地址，对外监听须设置allow_external=True")
+
+    async def stop(self):
+        """停止接收与发布"""
+        if self._publish_task is not None:
+            self._publish_task.cancel()
+            try:
+                await self._publish_task
+            except asyncio.CancelledError:
+                pass
+            self._publish_task = None
+        for server in self._servers:
+            server.close()
+        for protocol in list(self._stream_protocols):
+            protocol.transport.close()
+        self._servers.clear()
+
+    def subscribe(self, maxsize=1):
+        """
+        订阅快照，返回asyncio.Queue
+        队列满时丢弃最旧快照，模型循环落后时总是拿到最新状态
+        """
+        queue = asyncio.Queue(maxsize)
+        self._subscribers.append(queue)
+        return queue
+
+    def feed(self, payload, droppable=True):
+        """
+        缓存一条原始报文（由接收协议调用，也可直接注入）
+        droppable为False（反压模式下的TCP报文）时不丢弃，缓存满则暂停TCP读取
+        """
+        self.statistics['received_messages'] += 1
+        if droppable and len(self._pending) >= self.max_pending_messages:
+            self._pending.popleft()
+            self.statistics['dropped_messages'] += 1
+        self._pending.append(payload)
+
+        if (self.overflow == 'backpressure' and not self._reading_paused
+                and len(self._pending) >= self.max_pending_messages):
+            self._reading_paused = True
+            self.statistics['backpressure_pauses'] += 1
+            for protocol in self._stream_protocols:
+                protocol.transport.pause_reading()
+
+    def _ensure_publishing(self):
+        if self._publish_task is None:
+            self._publish_task = asyncio.get_running_loop().create_task(self._publish_loop())
+
+    async def _publish_loop(self):
+        """固定频率批量解码并发布快照"""
+        loop = asyncio.get_running_loop()
+        next_time = loop.time()
+        while True:
+            self._publish(self.process_pending())
+            next_time += self.publish_interval
+            delay = next_time - loop.time()
+            if delay < 0:
+                # 落后超过一个周期时不补发，直接对齐到当前时刻
+                next_time = loop.time()
+                delay = 0
+            await asyncio.sleep(delay)
+
+    def process_pending(self):
+        """解码全部待处理报文，更新各车最新状态并返回当前快照"""
+        payloads = list(self._pending)
+        self._pending.clear()
+        if self._reading_paused:
+            # 缓存已清空，先处理各连接已缓冲的字节，再恢复TCP读取
+            self._reading_paused = False
+            for protocol in list(self._stream_protocols):
+                protocol.parse_buffer()
+                if not self._reading_paused:
+                    protocol.transport.resume_reading()
+            payloads.extend(self._pending)
+            self._pending.clear()
+
+        records, malformed = decode_v2x_messages(payloads)
+        self.statistics['malformed_messages'] += malformed
+        self.statistics['decoded_records'] += len(records)
+
+        now = time.monotonic()
+        if len(records):
+            merged = np.concatenate((self._latest, records))
+            received_at = np.concatenate((self._received_at, np.full(len(records), now)))
+            order = np.lexsort((merged['timestamp'], merged['vehicle_id']))
+            merged, received_at = merged[order], received_at[order]
+            # 每辆车保留时间戳最新的一条
+            is_last = np.r_[merged['vehicle_id'][1:] != merged['vehicle_id'][:-1], True]
+            latest, received_at = merged[is_last], received_at[is_last]
+            fresh = latest['timestamp'] >= latest['timestamp'].max() - self.stale_seconds
+            self._latest, self._received_at = latest[fresh], received_at[fresh]
+
+        # 数据源静默时报文时间戳不再前进，按本地接收时刻移除过期车辆
+        fresh = self._received_at >= now - self.stale_seconds
+        if not fresh.all():
+            self._latest, self._received_at = self._latest[fresh], self._received_at[fresh]
+
+        return self.snapshot()
+
+    def snapshot(self):
+        """当前各车最新状态快照"""
+        latest = self._latest
+        state = ColumnarTrafficState(latest['vehicle_class'], latest['automation_level'], latest['lane'],
+                                     latest['position'], latest['speed'], latest['acceleration'],
+                                     frame_interval=self.publish_interval)
+        return {
+            'timestamp': float(latest['timestamp'].max()) if len(latest) else None,
+            'vehicle_ids': latest['vehicle_id'].astype(np.int64),
+            'state': state
+        }
+
+    def _publish(self, snapshot):
+        for queue in self._subscribers:
+            if queue.full():
+                queue.get_nowait()
+                self.statistics['dropped_snapshots'] += 1
+            queue.put_nowait(snapshot)
+        self.statistics['published_snapshots'] += 1
+
+
+class V2XReplaySimulator:
+    """
+    本地回放模拟器：将记录的轨迹按时间戳编码为报文发送，替代真实路侧设备
+    rate: 回放倍速；num_sensors: 模拟的传感器数量（按车辆ID分配）
+    """
+
+    def __init__(self, trajectories, rate=1.0, num_sensors=1):
+        """
+        trajectories: 轨迹列字典（vehicle_id, timestamp, lane, position, speed, acceleration,
+                      vehicle_class，可含automation_level），或TrajectoryStore
+        """
+        if isinstance(trajectories, TrajectoryStore):
+            trajectories = trajectories.columns
+        timestamps = np.asarray(trajectories['timestamp'], dtype=float)
+        order = np.argsort(timestamps, kind='stable')
+
+        records = np.zeros(len(order), dtype=V2X_RECORD_DTYPE)
+        for name in ('vehicle_id', 'timestamp', 'position', 'speed', 'acceleration', 'lane',
+                     'vehicle_class', 'automation_level'):
+            if name in trajectories:
+                records[name] = np.asarray(trajectories[name])[order]
+        records['sensor_id'] = records['vehicle_id'] % num_sensors
+
+        self.records = records
+        self.rate = rate
+        self.num_sensors = num_sensors
+        # 各帧在记录数组中的起止位置
+        self.frame_starts = np.flatnonzero(np.r_[True, np.diff(records['timestamp']) > 0, True])
+
+    def iter_frames(self):
+        """逐帧返回(帧时间戳, 各传感器报文列表)"""
+        for start, stop in zip(self.frame_starts[:-1], self.frame_starts[1:]):
+            frame = self.records[start:stop]
+            frame = frame[np.argsort(frame['sensor_id'], kind='stable')]
+            bounds = np.flatnonzero(np.r_[True, np.diff(frame['sensor_id']) > 0, True])
+            messages = []
+            for sensor_start, sensor_stop in zip(bounds[:-1], bounds[1:]):
+                sensor_id = int(frame['sensor_id'][sensor_start])
+                for chunk_start in range(sensor_start, sensor_stop, V2X_MAX_RECORDS):
+                    chunk = frame[chunk_start:min(chunk_start + V2X_MAX_RECORDS, sensor_stop)]
+                    messages.append(encode_v2x_message(chunk, sensor_id))
+            yield float(frame['timestamp'][0]), messages
+
+    async def run(self, host='127.0.0.1', port=9000, protocol='udp'):
+        """按记录时间戳（除以倍速）发送全部帧，返回发送的报文数"""
+        loop = asyncio.get_running_loop()
+        if protocol == 'udp':
+            transport, _ = await loop.create_datagram_endpoint(asyncio.DatagramProtocol,
+                                                               remote_addr=(host, port))
+            send, writer = transport.sendto, None
+        else:
+            _, writer = await asyncio.open_connection(host, port)
+            send = writer.write
+
+        sent = 0
+        start_time, first_timestamp = loop.time(), None
+        try:
+            for timestamp, messages in self.iter_frames():
+                if first_timestamp is None:
+                    first_timestamp = timestamp
+                delay = start_time + (timestamp - first_timestamp) / self.rate - loop.time()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                for message in messages:
+                    send(message)
+                sent += len(messages)
+                if writer is not None:
+                    await writer.drain()  # 服务端暂停读取时在此等待（反压）
+        finally:
+            if writer is not None:
+                writer.close()
+                await writer.wait_closed()
+            else:
+                transport.close()
+        return sent
+
+
 class SmartVehicleMixingModel:
     """智能车混入情景碳排放模型"""
 
     def __init__(self):
         self.air_resistance_correction = AirResistanceCorrection()
+        self.fuel_model = FuelVehicleEmissionModel()
+        self.electric_model = ElectricVehicleEmissionModel()
 
     def calculate_mixed_traffic_emission(self, scenario_params, traffic_data):
         """
         计算智能车混入后的交通流总碳排放
         公式3.8
+        traffic_data可为按车型分组的字典，或ColumnarTrafficState
         """
+        if isinstance(traffic_data, ColumnarTrafficState):
+            return float(self.calculate_columnar_emission(traffic_data).sum())
+
         total_emission = 0
 
         # 人工驾驶燃油车排放
@@ -196,6 +1430,25 @@ class SmartVehicleMixingModel:
 
         return total_emission
 
+    def calculate_columnar_emission(self, traffic_state, drag_coefficients=None):
+        """
+        列式交通状态的逐车排放量（一帧内）
+        燃油类与电动类车辆各自一次向量化计算
+        drag_coefficients: 逐车修正后的风阻系数，缺省不修正
+        """
+        dt = np.broadcast_to(np.asarray(traffic_state.frame_interval, dtype=float),
+                             traffic_state.speed.shape)
+        return _calculate_sample_emission(self.fuel_model, self.electric_model,
+                                          traffic_state.is_electric, traffic_state.speed,
+                                          traffic_state.acceleration, dt, drag_coefficients)
+
+    def calculate_emission_by_class(self, traffic_state):
+        """按车型汇总列式交通状态的排放量"""
+        emission = self.calculate_columnar_emission(traffic_state)
+        totals = np.bincount(traffic_state.vehicle_class, weights=emission,
+                             minlength=len(ColumnarTrafficState.VEHICLE_CLASSES))
+        return dict(zip(ColumnarTrafficState.VEHICLE_CLASSES, totals))
+
     def calculate_lane_specific_emission(self, lane_type, mixing_ratio, traffic_flow):
         """
         分车道碳排放测算
@@ -212,11 +1465,16 @@ class SmartVehicleMixingModel:
 
         return lane_emissions
 
-    def calculate_smart_lane_emission(self, platoon_data, dedicated_lane=True):
+    def calculate_smart_lane_emission(self, platoon_data, dedicated_lane=True, platoon_offsets=None):
         """
         基于智能车专用道的碳排放测算
         公式3.14-3.15
+        platoon_data可为ColumnarTrafficState（按队列顺序排列），
+        此时platoon_offsets为各队列起始行号，缺省视为单一队列
         """
+        if isinstance(platoon_data, ColumnarTrafficState):
+            return self._calculate_columnar_smart_lane_emission(platoon_data, dedicated_lane, platoon_offsets)
+
         if dedicated_lane:
             # 应用空气阻力修正
             corrected_data = self.air_resistance_correction.apply_platoon_correction(platoon_data)
@@ -236,6 +1494,30 @@ class SmartVehicleMixingModel:
 
         return total_emission
 
+    def _calculate_columnar_smart_lane_emission(self, lane_state, dedicated_lane, platoon_offsets):
+        """专用道全部队列一次性修正并计算排放"""
+        drag_coefficients = None
+        if dedicated_lane:
+            if platoon_offsets is None:
+                platoon_offsets = [0, len(lane_state)]
+            # 列式状态的间距为与前车间距；头车改用其跟随车（队列第二辆）的与前车间距
+            platoon_offsets = np.asarray(platoon_offsets, dtype=np.intp)
+            starts = platoon_offsets[:-1][platoon_offsets[:-1] < platoon_offsets[1:]]
+            ends = platoon_offsets[1:][platoon_offsets[:-1] < platoon_offsets[1:]]
+            single = starts[ends - starts < 2]
+            followed = starts[ends - starts >= 2]
+            spacings = lane_state.spacing.copy()
+            spacings[followed] = lane_state.spacing[followed + 1]
+            spacings[single] = 0.0  # 占位，下面恢复为未修正的风阻系数
+            correction = self.air_resistance_correction.apply_platoon_correction_batch(
+                spacings, platoon_offsets, self.fuel_model.drag_coefficient)
+            drag_coefficients = correction['corrected_drag_coefficient']
+            # 单车队列没有跟随车，不做风阻修正
+            drag_coefficients[single] = self.fuel_model.drag_coefficient
+
+        emission = self.calculate_columnar_emission(lane_state, drag_coefficients)
+        return float(emission.sum())
+
 
 class AirResistanceCorrection:
     """空气阻力修正系数计算"""
@@ -259,6 +1541,8 @@ class AirResistanceCorrection:
     def apply_platoon_correction(self, platoon_data):
         """应用队列空气阻力修正"""
         corrected_data = platoon_data.copy()
+        # 逐车复制，避免修改调用方的车辆字典
+        corrected_data['vehicles'] = [dict(vehicle) for vehicle in platoon_data['vehicles']]
 
         for i, vehicle in enumerate(corrected_data['vehicles']):
             if i == 0:  # 头车
@@ -274,6 +1558,33 @@ class AirResistanceCorrection:
 
         return corrected_data
 
+    def apply_platoon_correction_batch(self, spacings, platoon_offsets, original_drag_coefficient=0.3):
+        """
+        批量队列空气阻力修正
+        spacings: 各队列车辆依次拼接的间距数组，头车为与跟随车间距，跟随车为与前车间距
+        platoon_offsets: 各队列在spacings中的起始下标，长度为队列数+1
+        返回新数组，不修改输入
+        """
+        spacings = np.asarray(spacings, dtype=float)
+        platoon_offsets = np.asarray(platoon_offsets, dtype=np.intp)
+        if np.isnan(spacings).any():
+            raise ValueError(f"间距存在缺失值(NaN)，位置: {np.flatnonzero(np.isnan(spacings)).tolist()}")
+
+        # 每个非空队列的首车为头车
+        starts = platoon_offsets[:-1][platoon_offsets[:-1] < platoon_offsets[1:]]
+        is_head = np.zeros(spacings.shape, dtype=bool)
+        is_head[starts] = True
+
+        correction_factor = np.empty(spacings.shape)
+        correction_factor[is_head] = self.calculate_head_vehicle_correction(spacings[is_head])
+        correction_factor[~is_head] = self.calculate_following_vehicle_correction(spacings[~is_head])
+
+        return {
+            'is_head': is_head,
+            'air_resistance_correction': correction_factor,
+            'corrected_drag_coefficient': np.asarray(original_drag_coefficient) * correction_factor
+        }
+
 
 
 
@@ -347,13 +1658,21 @@ class ACCModel:
     def __init__(self):
         self.k1 = 0.23  # 调节系数k1
         self.k2 = 0.07  # 调节系数k2
+        self.speed = 0.0  # 本车当前速度
+
+    def calculate_spacing_error(self, spacing, speed, desired_time_headway):
+        """期望间距误差"""
+        return spacing - (desired_time_headway * speed + 1 + 5)  # 1为车长，5为拥堵间距
 
-    def calculate_acceleration(self, spacing, speed_difference, desired_time_headway):
+    def calculate_acceleration(self, spacing, speed_difference, desired_time_headway, speed=None):
         """
         ACC模型加速度计算
         公式参考第四章
+        speed: 本车速度，缺省使用self.speed；均可为数组
         """
-        spacing_error = spacing - (desired_time_headway * self.speed + 1 + 5)  # 1为车长，5为拥堵间距
+        if speed is None:
+            speed = self.speed
+        spacing_error = self.calculate_spacing_error(spacing, speed, desired_time_headway)
         acceleration = self.k1 * spacing_error + self.k2 * speed_difference
         return acceleration
 
@@ -376,12 +1695,620 @@ class CACCModel:
         new_speed = current_speed + speed_adjustment
         return max(new_speed, 0)
 
+    def calculate_speed_batch(self, current_speed, spacing_error, spacing_error_derivative,
+                              desired_time_headway):
+        """CACC模型批量速度计算"""
+        speed_adjustment = (self.kp * np.asarray(spacing_error) +
+                            self.kd * np.asarray(spacing_error_derivative))
+        return np.maximum(np.asarray(current_speed) + speed_adjustment, 0)
+
+
+class CarFollowingSimulator:
+    """
+    ACC/CACC跟驰时间步进仿真引擎
+    全部车辆以数组同步推进，轨迹可直接输入排放模型的批量接口
+    """
+
+    HUMAN = 0
+    ACC = 1
+    CACC = 2
+
+    def __init__(self, dt=0.1, desired_speed=33.3, road_length=None, boundary='open',
+                 max_acceleration=3.0, max_deceleration=6.0):
+        """
+        dt: 仿真步长(秒)
+        road_length: 路段长度(米)，None为无限长路段
+        boundary: 'open'驶出路段的车辆停止仿真，'periodic'驶出后从路段起点重新进入
+        """
+        self.acc_model = ACCModel()
+        self.cacc_model = CACCModel()
+
+        self.dt = dt
+        self.desired_speed = desired_speed
+        self.road_length = road_length
+        self.boundary = boundary
+        self.max_acceleration = max_acceleration
+        self.max_deceleration = max_deceleration
+        self.free_flow_gain = 0.5  # 无前车时趋向期望速度的增益
+        self.vehicle_length = 5.0  # 车辆长度，用于防止追尾的安全速度约束
+
+        # 期望车头时距，与HeterogeneousTrafficFlowModel参数一致
+        self.time_headways = np.array([2.0, 1.5, 1.0])
+
+    def initialize(self, position, speed, lane, control_mode, acceleration=None):
+        """
+        初始化车辆状态
+        control_mode: 0人工驾驶, 1 ACC, 2 CACC
+        """
+        self.position = np.array(position, dtype=float)
+        self.speed = np.array(speed, dtype=float)
+        self.lane = np.asarray(lane, dtype=np.int8)
+        self.control_mode = np.asarray(control_mode, dtype=np.int8)
+        if acceleration is None:
+            acceleration = np.zeros_like(self.position)
+        self.acceleration = np.array(acceleration, dtype=float)
+
+        num_vehicles = len(self.position)
+        self.active = np.ones(num_vehicles, dtype=bool)
+        self.leader = np.full(num_vehicles, -1, dtype=np.intp)
+        self.spacing = np.full(num_vehicles, np.inf)
+        self.spacing_error = np.zeros(num_vehicles)
+        self._order = np.arange(num_vehicles)
+        self.time = 0.0
+
+    def _update_leaders(self):
+        """按车道和位置排序，确定每辆车的前车及间距"""
+        previous_leader = self.leader
+        self.leader = np.full(len(self.position), -1, dtype=np.intp)
+        self.spacing = np.full(len(self.position), np.inf)
+
+        # 相邻步间顺序变化很小，在上一步顺序基础上做稳定排序（近似线性时间）
+        order = self._order[self.active[self._order]]
+        self._order = order
+        if len(order) == 0:
+            return previous_leader
+
+        lane_offset = 2 * (np.abs(self.position[order]).max() + 1)
+        order = order[np.argsort(self.lane[order] * lane_offset + self.position[order], kind='stable')]
+        self._order = order
+
+        followers, leaders = order[:-1], order[1:]
+        same_lane = self.lane[followers] == self.lane[leaders]
+        self.leader[followers[same_lane]] = leaders[same_lane]
+        self.spacing[followers[same_lane]] = (self.position[leaders[same_lane]]
+                                              - self.position[followers[same_lane]])
+
+        if self.boundary == 'periodic' and self.road_length is not None:
+            # 各车道最前车的前车为该车道最后一辆车
+            lane_end = np.append(~same_lane, True)
+            lane_start = np.insert(~same_lane, 0, True)
+            last, first = order[lane_end], order[lane_start]
+            ring = last != first
+            self.leader[last[ring]] = first[ring]
+            self.spacing[last[ring]] = (self.position[first[ring]] + self.road_length
+                                        - self.position[last[ring]])
+
+        return previous_leader
+
+    def step(self):
+        """推进一个仿真步长"""
+        previous_leader = self._update_leaders()
+        has_leader = self.leader >= 0
+        leader = np.where(has_leader, self.leader, 0)
+
+        speed_difference = np.where(has_leader, self.speed[leader] - self.speed, 0.0)
+
+        # CACC前方为人工驾驶车辆或无前车时退化为ACC
+        mode = self.control_mode.copy()
+        degraded = (mode == self.CACC) & (~has_leader | (self.control_mode[leader] == self.HUMAN))
+        mode[degraded] = self.ACC
+        time_headway = self.time_headways[mode]
+
+        spacing = np.where(has_leader, self.spacing, 0.0)
+        spacing_error = self.acc_model.calculate_spacing_error(spacing, self.speed, time_headway)
+        # 前车变化时误差导数置零
+        keep_leader = has_leader & (self.leader == previous_leader)
+        spacing_error_derivative = np.where(keep_leader,
+                                            (spacing_error - self.spacing_error) / self.dt, 0.0)
+
+        acceleration = self.acc_model.calculate_acceleration(
+            spacing, speed_difference, time_headway, speed=self.speed)
+        cacc = mode == self.CACC
+        new_speed = self.cacc_model.calculate_speed_batch(
+            self.speed[cacc], spacing_error[cacc], spacing_error_derivative[cacc], time_headway[cacc])
+        acceleration[cacc] = (new_speed - self.speed[cacc]) / self.dt
+
+        # 趋向期望速度，无前车时仅受此约束
+        free_flow_acceleration = self.free_flow_gain * (self.desired_speed - self.speed)
+        acceleration = np.where(has_leader, np.minimum(acceleration, free_flow_acceleration),
+                                free_flow_acceleration)
+        acceleration = np.clip(acceleration, -self.max_deceleration, self.max_acceleration)
+
+        new_speed = np.maximum(self.speed + acceleration * self.dt, 0)
+        # 安全速度约束：下一步不与前车重叠
+        safe_speed = np.maximum(speed_difference + self.speed
+                                + (spacing - self.vehicle_length) / self.dt, 0)
+        new_speed = np.where(has_leader, np.minimum(new_speed, safe_speed), new_speed)
+        acceleration = (new_speed - self.speed) / self.dt
+        acceleration[~self.active] = 0
+        new_speed[~self.active] = self.speed[~self.active]
+
+        self.position = np.where(self.active, self.position + new_speed * self.dt, self.position)
+        self.speed = new_speed
+        self.acceleration = acceleration
+        self.spacing_error = spacing_error
+        self.time += self.dt
+
+        if self.road_length is not None:
+            if self.boundary == 'periodic':
+                self.position %= self.road_length
+            else:
+                self.active &= self.position <= self.road_length
+
+    def run(self, horizon, record_interval=1):
+        """
+        运行仿真
+        horizon: 仿真时长(秒)
+        record_interval: 每隔多少步记录一次轨迹
+        返回轨迹数组(车辆×记录时刻)，duration可直接作为排放模型的时长输入
+        """
+        num_steps = int(round(horizon / self.dt))
+        num_records = num_steps // record_interval
+        shape = (len(self.position), num_records)
+
+        trajectories = {
+            'time': np.empty(num_records),
+            'position': np.empty(shape, dtype=np.float32),
+            'speed': np.empty(shape, dtype=np.float32),
+            'acceleration': np.empty(shape, dtype=np.float32),
+            'duration': np.empty(shape, dtype=np.float32),
+            'lane': self.lane.copy(),
+            'control_mode': self.control_mode.copy()
+        }
+
+        for step in range(num_steps):
+            active = self.active.copy()
+            self.step()
+            if (step + 1) % record_interval == 0:
+                record = (step + 1) // record_interval - 1
+                trajectories['time'][record] = self.time
+                trajectories['position'][:, record] = self.position
+                trajectories['speed'][:, record] = self.speed
+                trajectories['acceleration'][:, record] = self.acceleration
+                trajectories['duration'][:, record] = np.where(active, self.dt * record_interval, 0)
+
+        return trajectories
+
+
+
+class LaneNeighborIndex:
+    """
+    分车道邻车索引
+    各车道车辆按纵向位置有序存放，随帧增量插入/删除/移动，
+    前车、后车、相邻车道前后间隙及k近邻查询均基于二分查找
+    """
+
+    def __init__(self, vehicle_length=5.0):
+        self.vehicle_length = vehicle_length  # 间隙 = 车头位置差 - 车辆长度
+        self._positions = {}  # 车道 -> 有序位置列表
+        self._vehicle_ids = {}  # 车道 -> 与位置列表对应的车辆ID
+        self._state = {}  # 车辆ID -> (车道, 位置)
+
+    def __len__(self):
+        return len(self._state)
+
+    def __contains__(self, vehicle_id):
+        return vehicle_id in self._state
+
+    def insert(self, vehicle_id, lane, position):
+        """插入车辆"""
+        if vehicle_id in self._state:
+            self.remove(vehicle_id)
+
+        positions = self._positions.setdefault(lane, [])
+        vehicle_ids = self._vehicle_ids.setdefault(lane, [])
+        index = bisect.bisect_right(positions, position)
+        positions.insert(index, position)
+        vehicle_ids.insert(index, vehicle_id)
+        self._state[vehicle_id] = (lane, position)
+
+    def remove(self, vehicle_id):
+        """移除车辆"""
+        lane, _ = self._state[vehicle_id]
+        index = self._locate(vehicle_id)
+        del self._positions[lane][index]
+        del self._vehicle_ids[lane][index]
+        del self._state[vehicle_id]
+
+    def move(self, vehicle_id, lane, position):
+        """更新车辆车道与位置，同车道且前后顺序不变时原地更新"""
+        old_lane, _ = self._state[vehicle_id]
+        if lane == old_lane:
+            index = self._locate(vehicle_id)
+            positions = self._positions[lane]
+            if ((index == 0 or positions[index - 1] <= position) and
+                    (index == len(positions) - 1 or position <= positions[index + 1])):
+                positions[index] = position
+                self._state[vehicle_id] = (lane, position)
+                return
+
+        self.remove(vehicle_id)
+        self.insert(vehicle_id, lane, position)
+
+    def update_frame(self, vehicle_ids, lanes, positions, remove_missing=True):
+        """
+        按帧批量更新
+        remove_missing: 移除本帧未出现的车辆（已驶离匝道影响区）
+        """
+        for vehicle_id, lane, position in zip(vehicle_ids, lanes, positions):
+            if vehicle_id in self._state:
+                self.move(vehicle_id, lane, position)
+            else:
+                self.insert(vehicle_id, lane, position)
+
+        if remove_missing:
+            present = set(vehicle_ids)
+            for vehicle_id in [vid for vid in self._state if vid not in present]:
+                self.remove(vehicle_id)
+
+    def _locate(self, vehicle_id):
+        """车辆在其车道有序列表中的下标"""
+        lane, position = self._state[vehicle_id]
+        positions = self._positions[lane]
+        vehicle_ids = self._vehicle_ids[lane]
+        index = bisect.bisect_left(positions, position)
+        while vehicle_ids[index] != vehicle_id:
+            index += 1
+        return index
+
+    def _front_rear_in_lane(self, lane, position):
+        """其他车道上位于position前方（含并排）与后方最近的下标"""
+        index = bisect.bisect_left(self._positions.get(lane, []), position)
+        return index, index - 1
+
+    def _neighbor(self, lane, index, position, ahead):
+        """返回(车辆ID, 间隙)，不存在时为(None, inf)"""
+        positions = self._positions.get(lane, [])
+        if not 0 <= index < len(positions):
+            return None, np.inf
+        distance = positions[index] - position if ahead else position - positions[index]
+        return self._vehicle_ids[lane][index], distance - self.vehicle_length
+
+    def leader(self, vehicle_id):
+        """同车道前车及间隙"""
+        lane, position = self._state[vehicle_id]
+        return self._neighbor(lane, self._locate(vehicle_id) + 1, position, ahead=True)
+
+    def follower(self, vehicle_id):
+        """同车道后车及间隙"""
+        lane, position = self._state[vehicle_id]
+        return self._neighbor(lane, self._locate(vehicle_id) - 1, position, ahead=False)
+
+    def adjacent_gaps(self, vehicle_id, target_lane):
+        """目标车道前后车及间隙"""
+        lane, position = self._state[vehicle_id]
+        if target_lane == lane:
+            front_vehicle, front_gap = self.leader(vehicle_id)
+            rear_vehicle, rear_gap = self.follower(vehicle_id)
+        else:
+            front, rear = self._front_rear_in_lane(target_lane, position)
+            front_vehicle, front_gap = self._neighbor(target_lane, front, position, ahead=True)
+            rear_vehicle, rear_gap = self._neighbor(target_lane, rear, position, ahead=False)
+
+        return {
+            'target_front_vehicle': front_vehicle,
+            'target_front_gap': front_gap,
+            'target_rear_vehicle': rear_vehicle,
+            'target_rear_gap': rear_gap
+        }
+
+    def k_nearest(self, vehicle_id, k, lane=None):
+        """
+        按纵向距离的k近邻
+        lane: 查询车道，缺省为本车所在车道（不含自身）
+        返回[(车辆ID, 纵向距离), ...]
+        """
+        own_lane, position = self._state[vehicle_id]
+        if lane is None:
+            lane = own_lane
+        positions = self._positions.get(lane, [])
+        vehicle_ids = self._vehicle_ids.get(lane, [])
+
+        if lane == own_lane:
+            own_index = self._locate(vehicle_id)
+            front, rear = own_index + 1, own_index - 1
+        else:
+            front, rear = self._front_rear_in_lane(lane, position)
+
+        # 自当前位置向前后两侧归并
+        nearest = []
+        while len(nearest) < k and (rear >= 0 or front < len(positions)):
+            front_distance = positions[front] - position if front < len(positions) else np.inf
+            rear_distance = position - positions[rear] if rear >= 0 else np.inf
+            if front_distance <= rear_distance:
+                nearest.append((vehicle_ids[front], front_distance))
+                front += 1
+            else:
+                nearest.append((vehicle_ids[rear], rear_distance))
+                rear -= 1
+        return nearest
+
+    def surroundings(self, vehicle_id, target_lane):
+        """组装换道决策与空气阻力修正所需的邻车信息"""
+        surroundings = self.adjacent_gaps(vehicle_id, target_lane)
+        _, surroundings['spacing_to_leader'] = self.leader(vehicle_id)
+        _, surroundings['spacing_to_follower'] = self.follower(vehicle_id)
+        return surroundings
+
+
+class CooperativeLaneChangePlanner:
+    """
+    多车协同换道联合轨迹规划器（限时任意时间搜索）
+    在候选汇入顺序与目标车道间隙分配上搜索，每个候选方案的轨迹做向量化扫掠区间碰撞检测；
+    到达截止时间时返回目前为止代价最小的安全方案
+    """
+
+    def __init__(self, merge_time=6.0, lane_change_duration=2.0, horizon=10.0, dt=0.2,
+                 max_acceleration=3.0, max_deceleration=5.0, vehicle_length=5.0, min_gap=2.0):
+        self.merge_time = merge_time  # 调速阶段时长，结束时开始横向换道(秒)
+        self.lane_change_duration = lane_change_duration  # 横向换道时长，期间同时占用两条车道
+        self.horizon = max(horizon, merge_time + lane_change_duration)  # 至少覆盖换道完成时刻
+        self.dt = dt
+        self.max_acceleration = max_acceleration
+        self.max_deceleration = max_deceleration
+        self.vehicle_length = vehicle_length
+        self.min_gap = min_gap  # 扫掠区间之间的最小净间距
+        self.slot_time_headway = 1.0  # 间隙只有一侧有车时，汇入位置与该车的时距(秒)
+        self.order_change_penalty = 0.5  # 每对车辆相对顺序改变的代价
+
+    def plan(self, merging_positions, merging_speeds, target_positions, target_speeds, deadline=0.2):
+        """
+        merging_*: 需换入目标车道的车辆（位置、速度）
+        target_*: 目标车道上的车辆，按匀速预测
+        deadline: 规划时间上限(秒)
+        返回最优安全方案字典，无安全方案时返回None
+        """
+        deadline_at = time.perf_counter() + deadline
+        merging_positions = np.asarray(merging_positions, dtype=float)
+        merging_speeds = np.asarray(merging_speeds, dtype=float)
+        target_order = np.argsort(target_positions)
+        target_positions = np.asarray(target_positions, dtype=float)[target_order]
+        target_speeds = np.asarray(target_speeds, dtype=float)[target_order]
+
+        self._time = np.arange(0, self.horizon + self.dt / 2, self.dt)
+        target_trajectories = target_positions[:, None] + target_speeds[:, None] * self._time
+        # 调速阶段结束时目标车道车辆位置，即各间隙边界
+        boundaries = target_positions + target_speeds * self.merge_time
+        reachable = self._reachable_gaps(merging_positions, merging_speeds, boundaries)
+
+        natural_order = tuple(int(vehicle) for vehicle in np.argsort(merging_positions))
+        best, evaluated, complete = None, 0, True
+
+        # 先按当前顺序贪心分配最近的安全间隙，保证截止前至少有一个可行方案
+        gaps = self._greedy_gap_assignment(natural_order, reachable, merging_positions, merging_speeds,
+                                           boundaries, target_speeds, target_trajectories, deadline_at)
+        if gaps is not None:
+            evaluated += 1
+            best = self._evaluate(natural_order, gaps, natural_order, merging_positions, merging_speeds,
+                                  boundaries, target_speeds, target_trajectories)
+
+        for order in self._candidate_orders(natural_order):
+            for gaps in self._candidate_gap_assignments(order, reachable, merging_positions,
+                                                        merging_speeds, boundaries, deadline_at):
+                evaluated += 1
+                candidate = self._evaluate(order, gaps, natural_order, merging_positions, merging_speeds,
+                                           boundaries, target_speeds, target_trajectories)
+                if candidate is not None and (best is None or candidate['cost'] < best['cost']):
+                    best = candidate
+                if time.perf_counter() > deadline_at:
+                    break
+            if time.perf_counter() > deadline_at:
+                complete = False
+                break
+
+        if best is not None:
+            best.update(candidates_evaluated=evaluated, search_complete=complete)
+        return best
+
+    def _candidate_orders(self, natural_order):
+        """候选汇入顺序（由后至前），保持当前纵向顺序者优先"""
+        yield natural_order
+        for order in itertools.permutations(natural_order):
+            if order != natural_order:
+                yield order
+
+    def _reachable_gaps(self, positions, speeds, boundaries):
+        """各车辆在调速阶段结束时可到达的间隙编号集合"""
+        t = self.merge_time
+        earliest = positions + self._travel(speeds, -self.max_deceleration, t)
+        latest = positions + self._travel(speeds, self.max_acceleration, t)
+        lower = np.concatenate(([-np.inf], boundaries))
+        upper = np.concatenate((boundaries, [np.inf]))
+        return [set(np.flatnonzero((upper > earliest[i]) & (lower < latest[i])))
+                for i in range(len(positions))]
+
+    def _greedy_gap_assignment(self, order, reachable, positions, speeds, boundaries, target_speeds,
+                               target_trajectories, deadline_at=None):
+        """
+        贪心间隙分配：沿汇入顺序逐车选取与匀速预测所在间隙最接近、且与已分配车辆一起仍安全的可达间隙
+        每辆车最多尝试其全部可达间隙，不回溯；找不到或超过deadline_at时返回None
+        """
+        natural_gap = np.searchsorted(boundaries, positions + speeds * self.merge_time)
+        gaps = ()
+        for k, vehicle in enumerate(order):
+            members = list(order[:k + 1])
+            partial_order = tuple(range(k + 1))
+            last = gaps[-1] if gaps else 0
+            candidates = sorted((int(gap) for gap in reachable[vehicle] if gap >= last),
+                                key=lambda gap: (abs(gap - int(natural_gap[vehicle])), gap))
+            for gap in candidates:
+                if deadline_at is not None and time.perf_counter() > deadline_at:
+                    return None
+                if self._evaluate(partial_order, gaps + (gap,), partial_order, positions[members],
+                                  speeds[members], boundaries, target_speeds, target_trajectories) is not None:
+                    gaps += (gap,)
+                    break
+            else:
+                return None
+        return gaps
+
+    def _candidate_gap_assignments(self, order, reachable, positions, speeds, boundaries, deadline_at=None):
+        """
+        候选间隙分配：沿汇入顺序间隙编号不减，且每辆车只分配到可达间隙
+        按与车辆匀速预测所在间隙的偏离程度由小到大逐个生成（最佳优先搜索），
+        不预先枚举全部组合；超过deadline_at时停止生成
+        """
+        natural_gap = np.searchsorted(boundaries, positions + speeds * self.merge_time)
+        deviations = [{int(gap): abs(int(gap) - int(natural_gap[vehicle])) for gap in reachable[vehicle]}
+                      for vehicle in order]
+        if not all(deviations):
+            return
+        # 其余车辆各自取最小偏离之和，作为剩余代价的下界
+        remaining = np.r_[np.cumsum([min(d.values()) for d in deviations][::-1])[::-1], 0]
+
+        heap = [(int(remaining[0]), (), 0)]  # (代价下界, 已分配间隙, 已分配部分代价)
+        while heap:
+            if deadline_at is not None and time.perf_counter() > deadline_at:
+                return
+            _, gaps, cost = heapq.heappop(heap)
+            k = len(gaps)
+            if k == len(order):
+                yield gaps
+                continue
+            last = gaps[-1] if gaps else 0
+            for gap, deviation in deviations[k].items():
+                if gap >= last:
+                    heapq.heappush(heap, (cost + deviation + int(remaining[k + 1]), gaps + (gap,),
+                                          cost + deviation))
+
+    def _evaluate(self, order, gaps, natural_order, positions, speeds, boundaries,
+                  target_speeds, target_trajectories):
+        """计算候选方案的轨迹与代价，超出加减速能力或不安全时返回None"""
+        slots, slot_speeds = self._slot_states(order, gaps, positions, speeds, boundaries, target_speeds)
+
+        trajectories, accelerations = self._merging_trajectories(positions, speeds, slots, slot_speeds)
+        if (np.any(accelerations > self.max_acceleration + 1e-9) or
+                np.any(accelerations < -self.max_deceleration - 1e-9) or
+                np.any(np.diff(trajectories, axis=1) < 0)):  # 不允许倒车
+            return None
+        if not self._is_safe(trajectories, target_trajectories):
+            return None
+
+        rank = {vehicle: k for k, vehicle in enumerate(order)}
+        natural_rank = {vehicle: k for k, vehicle in enumerate(natural_order)}
+        order_changes = sum(1 for a, b in itertools.combinations(order, 2)
+                            if (rank[a] < rank[b]) != (natural_rank[a] < natural_rank[b]))
+        cost = float(np.sum(accelerations ** 2) * self.dt) + self.order_change_penalty * order_changes
+
+        return {
+            'order': order,
+            'gaps': gaps,
+            'slot_positions': slots,
+            'slot_speeds': slot_speeds,
+            'accelerations': accelerations,
+            'time': self._time,
+            'trajectories': trajectories,
+            'cost': cost,
+            'safe': True
+        }
+
+    def _slot_states(self, order, gaps, positions, speeds, boundaries, target_speeds):
+        """
+        调速阶段结束时各车辆在所分配间隙内的目标位置与目标速度
+        同一间隙内的车辆沿间隙均匀分布，目标速度取间隙前后车速度的均值
+        """
+        slots = positions + speeds * self.merge_time
+        slot_speeds = speeds.copy()
+        for gap in set(gaps):
+            members = [order[k] for k, g in enumerate(gaps) if g == gap]
+            count = len(members)
+            rear = gap - 1 if gap > 0 else None
+            front = gap if gap < len(boundaries) else None
+
+            for r, vehicle in enumerate(members):
+                headway_spacing = (self.vehicle_length + self.min_gap
+                                   + self.slot_time_headway * speeds[vehicle])
+                if rear is not None and front is not None:
+                    slots[vehicle] = (boundaries[rear] +
+                                      (boundaries[front] - boundaries[rear]) * (r + 1) / (count + 1))
+                    slot_speeds[vehicle] = (target_speeds[rear] + target_speeds[front]) / 2
+                elif front is not None:
+                    slots[vehicle] = boundaries[front] - headway_spacing * (count - r)
+                    slot_speeds[vehicle] = target_speeds[front]
+                elif rear is not None:
+                    slots[vehicle] = boundaries[rear] + headway_spacing * (r + 1)
+                    slot_speeds[vehicle] = target_speeds[rear]
+        return slots, slot_speeds
+
+    def _merging_trajectories(self, positions, speeds, slots, slot_speeds):
+        """
+        换道车辆轨迹：调速阶段分前后两半各取恒定加速度，使车辆同时到达目标位置与目标速度，之后匀速
+        返回位置与加速度数组(车辆×时刻)
+        """
+        half = self.merge_time / 2
+        displacement = (slots - positions - speeds * self.merge_time)[:, None]
+        speed_change = (slot_speeds - speeds)[:, None]
+        first_acceleration = displacement / half ** 2 - 0.5 * speed_change / half
+        second_acceleration = speed_change / half - first_acceleration
+
+        t = self._time
+        t1 = np.minimum(t, half)
+        t2 = np.clip(t - half, 0, half)
+        t3 = np.maximum(t - self.merge_time, 0)
+        trajectories = (positions[:, None] + speeds[:, None] * t1 + 0.5 * first_acceleration * t1 ** 2 +
+                        (speeds[:, None] + first_acceleration * half) * t2 +
+                        0.5 * second_acceleration * t2 ** 2 + slot_speeds[:, None] * t3)
+        accelerations = np.where(t < half, first_acceleration,
+                                 np.where(t < self.merge_time, second_acceleration, 0.0))
+        return trajectories, accelerations
+
+    def _travel(self, speed, acceleration, t):
+        """匀加速行驶距离，减速至停止后不再后退"""
+        with np.errstate(divide='ignore', invalid='ignore'):
+            stop_time = np.where(acceleration < 0, speed / -np.asarray(acceleration, dtype=float), np.inf)
+        t = np.minimum(t, stop_time)
+        return speed * t + 0.5 * acceleration * t ** 2
+
+    def _is_safe(self, merging_trajectories, target_trajectories):
+        """
+        扫掠区间碰撞检测
+        相邻时刻间每辆车占据[min(x_k, x_k+1), max(x_k, x_k+1) + 车长]；
+        换道车辆之间全程检查，开始换道后再与目标车道车辆检查（目标车道车辆之间不检查）
+        """
+        merging_low, merging_high = self._swept_intervals(merging_trajectories)
+        target_low, target_high = self._swept_intervals(target_trajectories)
+
+        among_merging = self._overlaps(merging_low, merging_high, merging_low, merging_high)
+        pairs = np.triu(np.ones((len(merging_low), len(merging_low)), dtype=bool), k=1)
+        if np.any(among_merging & pairs[:, :, None]):
+            return False
+
+        entering = self._time[:-1] >= self.merge_time
+        with_target = self._overlaps(merging_low, merging_high, target_low, target_high)
+        return not np.any(with_target & entering)
+
+    def _swept_intervals(self, trajectories):
+        """各时间段的扫掠区间上下界"""
+        low = np.minimum(trajectories[:, :-1], trajectories[:, 1:])
+        high = np.maximum(trajectories[:, :-1], trajectories[:, 1:]) + self.vehicle_length
+        return low, high
+
+    def _overlaps(self, low_a, high_a, low_b, high_b):
+        """两组区间逐时间段两两重叠判断（保留最小净间距），形状为(a, b, 时间段)"""
+        return ((low_a[:, None] < high_b[None] + self.min_gap) &
+                (low_b[None] < high_a[:, None] + self.min_gap))
+
 
 class SmartVehicleLaneChangeModel:
     """智能车换道决策模型"""
 
     def __init__(self):
         self.lane_utility = LaneUtilityModel()
+        self.cooperative_planner = CooperativeLaneChangePlanner()
+        self.motivation_threshold = 0.7  # 高换道动机阈值
+        self.min_gap = 2.0  # 最小可接受间隙(米)
+        self.front_gap_headway = 1.0  # 期望前方间隙对应的时距(秒)
+        self.rear_gap_headway = 1.5  # 期望后方间隙对应的时距(秒)
 
     def single_vehicle_dynamic_decision(self, vehicle_state, surrounding_vehicles):
         """
@@ -391,7 +2318,7 @@ class SmartVehicleLaneChangeModel:
         # 换道动机判断
         motivation = self._assess_lane_change_motivation(vehicle_state, surrounding_vehicles)
 
-        if motivation > 0.7:  # 高换道动机
+        if motivation > self.motivation_threshold:  # 高换道动机
             # 目标间隙接受判断
             gap_acceptance = self._assess_gap_acceptance(vehicle_state, surrounding_vehicles)
 
@@ -400,16 +2327,21 @@ class SmartVehicleLaneChangeModel:
 
         return False
 
-    def multi_vehicle_cooperative_decision(self, vehicle_group, communication_data):
+    def multi_vehicle_cooperative_decision(self, vehicle_group, communication_data, deadline=0.2):
         """
         多车协同换道决策
         基于图4-4流程图
+        vehicle_group: 需换入目标车道的车辆列表，每项含'id'、'position'、'speed'
+        communication_data: V2X数据，含'timestamp'（同步时刻）、
+            'vehicle_states'（{车辆ID: 含position/speed/timestamp的最新状态}）、
+            'target_lane_vehicles'（目标车道车辆列表）
+        deadline: 规划时间上限(秒)，超时返回目前最优的安全方案
         """
         # 车辆状态同步
         synchronized_states = self._synchronize_vehicle_states(vehicle_group, communication_data)
 
         # 联合轨迹规划
-        joint_trajectory = self._plan_joint_trajectory(synchronized_states)
+        joint_trajectory = self._plan_joint_trajectory(synchronized_states, deadline)
 
         # 安全性验证
         if self._validate_safety(joint_trajectory):
@@ -417,6 +2349,70 @@ class SmartVehicleLaneChangeModel:
 
         return False
 
+    def _synchronize_vehicle_states(self, vehicle_group, communication_data):
+        """以V2X最新状态更新车辆，并按匀速外推到同步时刻"""
+        sync_time = communication_data.get('timestamp', 0.0)
+        vehicle_states = communication_data.get('vehicle_states', {})
+
+        def extrapolate(vehicles):
+            positions, speeds = [], []
+            for vehicle in vehicles:
+                state = dict(vehicle)
+                latest = vehicle_states.get(vehicle.get('id'))
+                if latest is not None and latest.get('timestamp', -np.inf) >= state.get('timestamp', -np.inf):
+                    state.update(latest)
+                elapsed = sync_time - state.get('timestamp', sync_time)
+                positions.append(state['position'] + state['speed'] * elapsed)
+                speeds.append(state['speed'])
+            return np.array(positions, dtype=float), np.array(speeds, dtype=float)
+
+        merging_positions, merging_speeds = extrapolate(vehicle_group)
+        target_positions, target_speeds = extrapolate(communication_data.get('target_lane_vehicles', []))
+
+        return {
+            'timestamp': sync_time,
+            'vehicle_ids': [vehicle.get('id') for vehicle in vehicle_group],
+            'merging_positions': merging_positions,
+            'merging_speeds': merging_speeds,
+            'target_positions': target_positions,
+            'target_speeds': target_speeds
+        }
+
+    def _plan_joint_trajectory(self, synchronized_states, deadline=0.2):
+        """联合轨迹规划"""
+        plan = self.cooperative_planner.plan(
+            synchronized_states['merging_positions'], synchronized_states['merging_speeds'],
+            synchronized_states['target_positions'], synchronized_states['target_speeds'],
+            deadline)
+        if plan is not None:
+            plan['vehicle_ids'] = synchronized_states['vehicle_ids']
+            plan['timestamp'] = synchronized_states['timestamp']
+        return plan
+
+    def _validate_safety(self, joint_trajectory):
+        """安全性验证：规划器仅返回通过碰撞检测的方案"""
+        return joint_trajectory is not None and joint_trajectory['safe']
+
+    def _execute_cooperative_lane_change(self, joint_trajectory):
+        """生成各车辆的协同换道指令"""
+        vehicle_ids = joint_trajectory['vehicle_ids']
+        merge_rank = {vehicle: k for k, vehicle in enumerate(joint_trajectory['order'])}
+
+        return {
+            vehicle_id: {
+                'acceleration': float(joint_trajectory['accelerations'][i, 0]),  # 当前加速度指令
+                'acceleration_profile': joint_trajectory['accelerations'][i],
+                'target_position': float(joint_trajectory['slot_positions'][i]),
+                'target_speed': float(joint_trajectory['slot_speeds'][i]),
+                'merge_time': joint_trajectory['timestamp'] + self.cooperative_planner.merge_time,
+                'complete_time': (joint_trajectory['timestamp'] + self.cooperative_planner.merge_time
+                                  + self.cooperative_planner.lane_change_duration),
+                'merge_rank': merge_rank[i],
+                'target_gap': joint_trajectory['gaps'][merge_rank[i]]
+            }
+            for i, vehicle_id in enumerate(vehicle_ids)
+        }
+
     def _assess_lane_change_motivation(self, vehicle, surroundings):
         """评估换道动机"""
         current_lane_utility = self.lane_utility.calculate_lane_utility(
@@ -441,10 +2437,128 @@ class SmartVehicleLaneChangeModel:
 
         return front_acceptance and rear_acceptance
 
+    def _calculate_desired_front_gap(self, vehicle):
+        """期望前方间隙"""
+        return self.min_gap + self.front_gap_headway * vehicle['speed']
+
+    def _calculate_desired_rear_gap(self, vehicle):
+        """期望后方间隙"""
+        return self.min_gap + self.rear_gap_headway * vehicle['speed']
+
+    def frame_dynamic_decision(self, traffic_state, desired_speed=None, target_lane=None,
+                               vehicle_length=5.0):
+        """
+        单帧全体车辆换道决策（向量化）
+        traffic_state: ColumnarTrafficState，车道编号0为外侧车道
+        desired_speed: 期望速度(km/h)，缺省取当前速度
+        target_lane: 目标车道（如下匝道车辆的外侧车道），缺省在左右相邻车道中取效用较高者
+        返回各车辆的换道动机、目标间隙、间隙接受与决策数组
+        """
+        lane = traffic_state.lane.astype(np.intp)
+        position = traffic_state.position
+        speed = traffic_state.speed
+        if desired_speed is None:
+            desired_speed = speed * 3.6
+        desired_speed = np.broadcast_to(np.asarray(desired_speed, dtype=float), speed.shape)
+
+        num_lanes = self.lane_utility.num_lanes
+        front_gaps, rear_gaps = self._calculate_lane_gap_matrix(lane, position, num_lanes, vehicle_length)
+        utility = self.lane_utility.calculate_lane_utility_matrix(desired_speed, front_gaps, rear_gaps)['total']
+
+        rows = np.arange(len(lane))
+        current_utility = utility[rows, lane]
+
+        if target_lane is None:
+            # 左右相邻车道中效用较高者
+            left, right = lane - 1, lane + 1
+            left_utility = np.where(left >= 0, utility[rows, np.maximum(left, 0)], -np.inf)
+            right_utility = np.where(right < num_lanes, utility[rows, np.minimum(right, num_lanes - 1)], -np.inf)
+            target_lane = np.where(right_utility > left_utility, right, left)
+            target_lane = np.where(np.isinf(np.maximum(left_utility, right_utility)), lane, target_lane)
+        else:
+            target_lane = np.broadcast_to(np.asarray(target_lane, dtype=np.intp), lane.shape)
+
+        target_utility = utility[rows, target_lane]
+        target_front_gap = front_gaps[rows, target_lane]
+        target_rear_gap = rear_gaps[rows, target_lane]
+
+        changes_lane = target_lane != lane
+        motivation = np.where(changes_lane, np.maximum(0, target_utility - current_utility), 0.0)
+
+        gap_acceptance = ((target_front_gap >= self.min_gap + self.front_gap_headway * speed) &
+                          (target_rear_gap >= self.min_gap + self.rear_gap_headway * speed))
+        decision = changes_lane & (motivation > self.motivation_threshold) & gap_acceptance
+
+        return {
+            'target_lane': target_lane,
+            'motivation': motivation,
+            'target_front_gap': target_front_gap,
+            'target_rear_gap': target_rear_gap,
+            'gap_acceptance': gap_acceptance,
+            'decision': decision
+        }
+
+    def _calculate_lane_gap_matrix(self, lane, position, num_lanes, vehicle_length):
+        """各车辆在每条车道上的前后间隙(车辆×车道)"""
+        front_gaps = np.empty((len(lane), num_lanes))
+        rear_gaps = np.empty((len(lane), num_lanes))
+        for query_lane in range(num_lanes):
+            front_gaps[:, query_lane], rear_gaps[:, query_lane] = self._calculate_lane_gaps(
+                lane, position, np.full(len(lane), query_lane), vehicle_length)
+        return front_gaps, rear_gaps
+
+    def _calculate_lane_gaps(self, lane, position, query_lane, vehicle_length):
+        """
+        查询各车辆在query_lane车道上的前后间隙（不含自身）
+        车道内按位置排序后二分查找，无前/后车时为inf
+        本车道内同位置车辆视为自身而排除；目标车道内与本车并排的车辆计为前车（间隙为负）
+        """
+        front_gap = np.full(position.shape, np.inf)
+        rear_gap = np.full(position.shape, np.inf)
+
+        for lane_id in np.unique(query_lane):
+            lane_positions = np.sort(position[lane == lane_id])
+            querying = np.flatnonzero(query_lane == lane_id)
+            query_position = position[querying]
+
+            front_index = np.searchsorted(lane_positions, query_position, side='left')
+            own_lane = lane[querying] == lane_id
+            front_index[own_lane] = np.searchsorted(lane_positions, query_position[own_lane], side='right')
+            rear_index = np.searchsorted(lane_positions, query_position, side='left') - 1
+
+            has_front = front_index < len(lane_positions)
+            front_gap[querying[has_front]] = (lane_positions[front_index[has_front]]
+                                              - query_position[has_front] - vehicle_length)
+            has_rear = rear_index >= 0
+            rear_gap[querying[has_rear]] = (query_position[has_rear]
+                                            - lane_positions[rear_index[has_rear]] - vehicle_length)
+
+        return front_gap, rear_gap
+
 
 class LaneUtilityModel:
     """车道效用计算模型"""
 
+    LANE_TYPES = ('outer', 'middle', 'inner')  # 三车道时按车道编号0-2
+
+    def __init__(self, num_lanes=3, weights=None):
+        """
+        num_lanes: 车道数，编号0为外侧车道、num_lanes-1为内侧车道
+        weights: 速度、自由度、安全效用权重，可只给出部分项，其余取默认值
+        """
+        self.num_lanes = num_lanes
+        default_weights = {'speed': 0.5, 'freedom': 0.3, 'safety': 0.2}
+        unknown = set(weights or {}) - set(default_weights)
+        if unknown:
+            raise ValueError(f"未知的效用权重: {sorted(unknown)}")
+        self.weights = {**default_weights, **(weights or {})}
+        self.speed_divisor_by_type = {'outer': 80.0, 'middle': 100.0, 'inner': 120.0}
+        # 各车道速度效用分母，由外侧向内侧线性过渡
+        self.lane_speed_divisors = np.linspace(self.speed_divisor_by_type['outer'],
+                                               self.speed_divisor_by_type['inner'], num_lanes)
+        self.free_gap_distance = 100.0  # 前方间隙达到该值时自由度效用为1(米)
+        self.safe_gap_distance = 30.0  # 前后间隙均达到该值时安全效用为1(米)
+
     def calculate_lane_utility(self, lane_type, vehicle, surroundings):
         """
         计算车道效用值
@@ -454,20 +2568,67 @@ class LaneUtilityModel:
         freedom_utility = self._calculate_freedom_utility(lane_type, surroundings)
         safety_utility = self._calculate_safety_utility(lane_type, surroundings)
 
-        total_utility = (0.5 * speed_utility +
-                         0.3 * freedom_utility +
-                         0.2 * safety_utility)
+        total_utility = (self.weights['speed'] * speed_utility +
+                         self.weights['freedom'] * freedom_utility +
+                         self.weights['safety'] * safety_utility)
 
         return total_utility
 
     def _calculate_speed_utility(self, lane_type, vehicle):
-        """速度效用计算"""
-        if lane_type == 'inner':
-            return vehicle['desired_speed'] / 120  # 内侧车道速度效用高
-        elif lane_type == 'middle':
-            return vehicle['desired_speed'] / 100
-        else:  # outer
-            return vehicle['desired_speed'] / 80
+        """速度效用计算，未知车道类型按外侧车道处理"""
+        divisor = self.speed_divisor_by_type.get(lane_type, self.speed_divisor_by_type['outer'])
+        return vehicle['desired_speed'] / divisor
+
+    def _calculate_freedom_utility(self, lane_type, surroundings):
+        """自由度效用计算，surroundings['lane_gaps'][lane_type]为(前方间隙, 后方间隙)"""
+        front_gap, _ = surroundings.get('lane_gaps', {}).get(lane_type, (np.inf, np.inf))
+        return float(self._freedom_utility(front_gap))
+
+    def _calculate_safety_utility(self, lane_type, surroundings):
+        """安全效用计算"""
+        front_gap, rear_gap = surroundings.get('lane_gaps', {}).get(lane_type, (np.inf, np.inf))
+        return float(self._safety_utility(front_gap, rear_gap))
+
+    def _freedom_utility(self, front_gap):
+        """前方间隙越大自由度越高"""
+        return np.clip(np.asarray(front_gap) / self.free_gap_distance, 0, 1)
+
+    def _safety_utility(self, front_gap, rear_gap):
+        """前后间隙中较小者决定安全效用"""
+        return np.clip(np.minimum(front_gap, rear_gap) / self.safe_gap_distance, 0, 1)
+
+    def calculate_lane_utility_batch(self, lanes, desired_speed, front_gaps, rear_gaps):
+        """
+        批量计算车道效用
+        lanes: 各车辆评估的车道编号（0为外侧车道）
+        """
+        speed_utility = np.asarray(desired_speed) / self.lane_speed_divisors[lanes]
+        freedom_utility = self._freedom_utility(front_gaps)
+        safety_utility = self._safety_utility(front_gaps, rear_gaps)
+
+        return (self.weights['speed'] * speed_utility +
+                self.weights['freedom'] * freedom_utility +
+                self.weights['safety'] * safety_utility)
+
+    def calculate_lane_utility_matrix(self, desired_speed, front_gaps, rear_gaps):
+        """
+        车辆×车道效用矩阵
+        desired_speed: 各车辆期望速度(km/h)
+        front_gaps/rear_gaps: 各车辆在每条车道上的前后间隙(车辆×车道)
+        返回各效用分量及加权总效用
+        """
+        speed_utility = np.asarray(desired_speed, dtype=float)[:, None] / self.lane_speed_divisors
+        freedom_utility = self._freedom_utility(front_gaps)
+        safety_utility = self._safety_utility(front_gaps, rear_gaps)
+
+        return {
+            'speed': speed_utility,
+            'freedom': freedom_utility,
+            'safety': safety_utility,
+            'total': (self.weights['speed'] * speed_utility +
+                      self.weights['freedom'] * freedom_utility +
+                      self.weights['safety'] * safety_utility)
+        }
 
 
 
@@ -488,6 +2649,8 @@ class HeterogeneousTrafficFlowModel:
             'vehicle_length': 5.0,  # 车辆长度
             'min_spacing': 2.0  # 最小间距
         }
+        self.max_cached_surfaces = 4  # 查找曲面缓存上限
+        self._surface_cache = OrderedDict()
 
     def calculate_fundamental_diagram(self, smart_vehicle_ratio, max_platoon_size=3):
         """
@@ -495,25 +2658,56 @@ class HeterogeneousTrafficFlowModel:
         公式参考4.3.1节
         """
         densities = np.linspace(0, 150, 100)  # 密度范围
-        flows = []
-        speeds = []
-
-        for density in densities:
-            if density == 0:
-                flows.append(0)
-                speeds.append(120)  # 自由流速度
-                continue
 
-            # 计算平衡态速度
-            equilibrium_speed = self._calculate_equilibrium_speed(
-                density, smart_vehicle_ratio, max_platoon_size)
+        # 向量化计算平衡态速度与流量
+        speeds, flows = self.calculate_fundamental_diagram_grid(
+            densities, [smart_vehicle_ratio], [max_platoon_size])
 
-            # 计算流量
-            flow = density * equilibrium_speed / 3.6  # 转换为veh/h
-            flows.append(flow)
-            speeds.append(equilibrium_speed)
+        return densities, flows[:, 0, 0].tolist(), speeds[:, 0, 0].tolist()
 
-        return densities, flows, speeds
+    def calculate_fundamental_diagram_grid(self, densities, smart_ratios, platoon_sizes):
+        """
+        在(密度, 智能车混入率, 最大车队规模)网格上向量化计算基本图
+        返回形状为(密度数, 混入率数, 车队规模数)的速度与流量数组
+        """
+        density = np.asarray(densities, dtype=float)[:, None, None]
+        p = np.asarray(smart_ratios, dtype=float)[None, :, None]
+        n = np.asarray(platoon_sizes, dtype=float)[None, None, :]
+
+        # 全智能车与混合交通流的平均车头时距
+        full_smart_headway = (1 / n) * self.parameters['acc_headway'] + \
+                             ((n - 1) / n) * self.parameters['cacc_headway']
+        mixed_headway = ((1 - p) * self.parameters['human_driver_headway'] +
+                         p * (1 - p) * self.parameters['acc_headway'] +
+                         p * p * self.parameters['cacc_headway'])
+        avg_headway = np.where(p == 1, full_smart_headway, mixed_headway)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            avg_spacing = 1 / density
+            congested_speed = np.maximum(0, (avg_spacing - self.parameters['vehicle_length'] -
+                                             self.parameters['min_spacing']) / avg_headway * 3.6)
+            free_flow = avg_spacing > avg_headway * 30 + self.parameters['vehicle_length']
+            speeds = np.minimum(np.where(free_flow, 120, congested_speed), 120)
+
+        speeds = np.where(density == 0, 120, speeds)  # 自由流速度
+        flows = density * speeds / 3.6  # 转换为veh/h
+        return speeds, flows
+
+    def get_fundamental_diagram_surface(self, max_density=150, density_steps=301, ratio_steps=101,
+                                        platoon_sizes=tuple(range(1, 11))):
+        """获取（必要时构建）基本图查找曲面，按网格参数缓存"""
+        key = (max_density, density_steps, ratio_steps, tuple(platoon_sizes))
+        surface = self._surface_cache.get(key)
+        if surface is None:
+            surface = FundamentalDiagramSurface(self, max_density, density_steps, ratio_steps,
+                                                platoon_sizes)
+            self._surface_cache[key] = surface
+            # 限制缓存曲面数量，淘汰最久未使用者
+            while len(self._surface_cache) > self.max_cached_surfaces:
+                self._surface_cache.popitem(last=False)
+        else:
+            self._surface_cache.move_to_end(key)
+        return surface
 
     def _calculate_equilibrium_speed(self, density, p, n):
         """
@@ -546,9 +2740,88 @@ class HeterogeneousTrafficFlowModel:
         return min(speed, 120)
 
 
+class FundamentalDiagramSurface:
+    """
+    基本图查找曲面
+    预先在均匀(密度, 混入率)网格及离散车队规模上计算平衡态速度，
+    查询时在密度与混入率方向双线性插值（平衡态速度在自由流/拥挤流切换处不连续，该处存在插值误差）
+    """
+
+    def __init__(self, flow_model, max_density=150, density_steps=301, ratio_steps=101,
+                 platoon_sizes=tuple(range(1, 11))):
+        self.densities = np.linspace(0, max_density, density_steps)
+        self.smart_ratios = np.linspace(0, 1, ratio_steps)
+        self.platoon_sizes = np.asarray(platoon_sizes, dtype=int)
+        self.speeds, _ = flow_model.calculate_fundamental_diagram_grid(
+            self.densities, self.smart_ratios, self.platoon_sizes)
+
+        self._density_step = float(self.densities[1] - self.densities[0])
+        self._ratio_step = float(self.smart_ratios[1] - self.smart_ratios[0])
+        self._size_index = {int(n): j for j, n in enumerate(self.platoon_sizes)}
+        # 标量查询使用嵌套列表，避免numpy标量开销
+        self._speed_table = self.speeds.transpose(2, 0, 1).tolist()
+
+    def _platoon_index(self, platoon_size):
+        """车队规模对应的网格下标，不在网格上时取最接近者"""
+        index = self._size_index.get(platoon_size)
+        if index is None:
+            index = int(np.abs(self.platoon_sizes - platoon_size).argmin())
+        return index
+
+    def query(self, density, smart_ratio, platoon_size):
+        """
+        标量查询平衡态速度与流量
+        超出网格范围的输入截断到边界
+        """
+        table = self._speed_table[self._platoon_index(platoon_size)]
+
+        x = min(max(density / self._density_step, 0.0), len(self.densities) - 1.0)
+        y = min(max(smart_ratio / self._ratio_step, 0.0), len(self.smart_ratios) - 1.0)
+        i = min(int(x), len(self.densities) - 2)
+        j = min(int(y), len(self.smart_ratios) - 2)
+        fx, fy = x - i, y - j
+
+        row, next_row = table[i], table[i + 1]
+        speed = ((row[j] * (1 - fy) + row[j + 1] * fy) * (1 - fx) +
+                 (next_row[j] * (1 - fy) + next_row[j + 1] * fy) * fx)
+        return speed, density * speed / 3.6
+
+    def query_batch(self, densities, smart_ratios, platoon_sizes):
+        """数组查询平衡态速度与流量（输入可广播）"""
+        densities, smart_ratios, platoon_sizes = np.broadcast_arrays(
+            np.asarray(densities, dtype=float), np.asarray(smart_ratios, dtype=float),
+            np.asarray(platoon_sizes))
+        size_index = np.abs(self.platoon_sizes - platoon_sizes[..., None]).argmin(axis=-1)
+
+        x = np.clip(densities / self._density_step, 0, len(self.densities) - 1)
+        y = np.clip(smart_ratios / self._ratio_step, 0, len(self.smart_ratios) - 1)
+        i = np.minimum(x.astype(int), len(self.densities) - 2)
+        j = np.minimum(y.astype(int), len(self.smart_ratios) - 2)
+        fx, fy = x - i, y - j
+
+        s = self.speeds
+        speed = ((s[i, j, size_index] * (1 - fy) + s[i, j + 1, size_index] * fy) * (1 - fx) +
+                 (s[i + 1, j, size_index] * (1 - fy) + s[i + 1, j + 1, size_index] * fy) * fx)
+        return speed, densities * speed / 3.6
+
+
 class TrafficEmissionAnalyzer:
     """交通流碳排放分析器"""
 
+    def __init__(self):
+        self.mixing_model = SmartVehicleMixingModel()
+
+        # CACC车队组成参数（与CruiseSystemDegradationModel一致）
+        self.max_platoon_size = 3  # 最大车队规模，车队已满时后车退化为ACC
+        self.max_platoon_spacing = 30.0  # CACC跟驰的最大间距(米)，超过时退化为ACC
+        self.vehicle_length = 5.0  # 车辆长度(米)
+
+        # 下匝道分流区参数
+        self.ramp_position = None  # 下匝道出口位置(米)，缺省取车辆最大位置
+        self.diverge_length = 500.0  # 出口上游分流区长度(米)
+        self.ramp_speed = 40 / 3.6  # 驶离车辆在出口处的速度(m/s)
+        self.max_deceleration = 3.0  # 驶离车辆的最大减速度(m/s²)
+
     def analyze_smart_vehicle_impact(self, mixing_ratios, traffic_data):
         """
         分析智能车混入率对碳排放的影响
@@ -571,6 +2844,82 @@ class TrafficEmissionAnalyzer:
 
         return emissions_by_ratio
 
+    def _adjust_traffic_composition(self, traffic_data, ratio):
+        """
+        按智能车混入率重新分配车型，返回新的列式交通状态（不修改输入）
+        traffic_data: ColumnarTrafficState或按车型分组的车辆字典
+        混入的智能车沿行序均匀分布，燃油/电动动力类型保持不变
+        """
+        if not isinstance(traffic_data, ColumnarTrafficState):
+            traffic_data = ColumnarTrafficState.from_traffic_data(traffic_data)
+
+        index = np.arange(len(traffic_data))
+        is_smart = np.floor((index + 1) * ratio) > np.floor(index * ratio)
+        is_electric = traffic_data.is_electric
+
+        code = ColumnarTrafficState.class_code
+        vehicle_class = np.where(is_smart,
+                                 np.where(is_electric, code('smart_electric'), code('smart_fuel')),
+                                 np.where(is_electric, code('electric'), code('fuel')))
+        automation_level = np.where(is_smart, np.maximum(traffic_data.automation_level, 2), 0)
+
+        return ColumnarTrafficState(vehicle_class, automation_level, traffic_data.lane,
+                                    traffic_data.position, traffic_data.speed,
+                                    traffic_data.acceleration, traffic_data.spacing,
+                                    traffic_data.frame_interval)
+
+    def _platoon_drag_coefficients(self, traffic_state):
+        """
+        按车道内的实际排列识别CACC车队，返回逐车修正后的风阻系数（公式3.10-3.11）
+        智能车紧跟智能车且间距不超过max_platoon_spacing时为CACC跟随车；
+        前车为人工驾驶车辆、间距过大或前方车队已达max_platoon_size时退化为ACC，成为新车队的头车
+        """
+        code = ColumnarTrafficState.class_code
+        smart_codes = [code(name) for name in ('smart_fuel', 'smart_electric',
+                                               'platoon_fuel', 'platoon_electric')]
+        order = np.lexsort((traffic_state.position, traffic_state.lane))
+        lane = traffic_state.lane[order]
+        position = traffic_state.position[order]
+        is_smart = np.isin(traffic_state.vehicle_class[order], smart_codes)
+
+        # 排序后下一行为同车道前车，净间距扣除车长
+        gap = np.full(len(order), np.inf)
+        same_lane = lane[1:] == lane[:-1]
+        gap[:-1] = np.where(same_lane, position[1:] - position[:-1] - self.vehicle_length, np.inf)
+        linked = is_smart & np.append(is_smart[1:], False) & (gap <= self.max_platoon_spacing)
+
+        # 从车队头车起向后连续CACC跟驰的车辆序号，每满max_platoon_size辆退化一次
+        reversed_linked = linked[::-1]
+        count = np.cumsum(reversed_linked)
+        rank = (count - np.maximum.accumulate(np.where(reversed_linked, 0, count)))[::-1]
+        is_follower = linked & (rank % self.max_platoon_size != 0)
+        is_head = ~is_follower & np.insert(is_follower[:-1], 0, False)
+
+        correction = self.mixing_model.air_resistance_correction
+        correction_factor = np.ones(len(order))
+        correction_factor[is_follower] = correction.calculate_following_vehicle_correction(gap[is_follower])
+        head_index = np.flatnonzero(is_head)
+        correction_factor[head_index] = correction.calculate_head_vehicle_correction(gap[head_index - 1])
+
+        drag_coefficients = np.empty(len(order))
+        drag_coefficients[order] = self.mixing_model.fuel_model.drag_coefficient * correction_factor
+        return drag_coefficients
+
+    def _calculate_vehicle_emissions(self, traffic_state):
+        """考虑CACC车队风阻修正的逐车排放量（一帧内）"""
+        return self.mixing_model.calculate_columnar_emission(
+            traffic_state, self._platoon_drag_coefficients(traffic_state))
+
+    def _calculate_scenario_emission(self, traffic_state):
+        """列式交通状态一帧内的总排放量"""
+        return float(self._calculate_vehicle_emissions(traffic_state).sum())
+
+    def _calculate_lane_emissions(self, traffic_state):
+        """按车道汇总一帧内的排放量"""
+        emission = self._calculate_vehicle_emissions(traffic_state)
+        lanes, lane_index = np.unique(traffic_state.lane, return_inverse=True)
+        return dict(zip(lanes.tolist(), np.bincount(lane_index, weights=emission).tolist()))
+
     def analyze_ramp_vehicle_impact(self, ramp_ratios, base_traffic):
         """
         分析下匝道车辆占比对碳排放的影响
@@ -593,6 +2942,238 @@ class TrafficEmissionAnalyzer:
 
         return emission_results
 
+    def _adjust_ramp_vehicle_ratio(self, base_traffic, ramp_ratio):
+        """
+        按下匝道车辆占比标记驶离车辆（沿行序均匀分布）
+        返回交通状态与驶离车辆掩码，不修改输入
+        """
+        if not isinstance(base_traffic, ColumnarTrafficState):
+            base_traffic = ColumnarTrafficState.from_traffic_data(base_traffic)
+
+        index = np.arange(len(base_traffic))
+        is_ramp = np.floor((index + 1) * ramp_ratio) > np.floor(index * ramp_ratio)
+        return {'traffic': base_traffic, 'is_ramp': is_ramp}
+
+    def _calculate_segment_emissions(self, adjusted_traffic):
+        """
+        分上游、分流区、下游三段计算一帧内的排放量
+        分流区内的驶离车辆换入外侧车道（0号车道），并匀减速至出口处的ramp_speed；
+        下游路段不再包含已驶离的车辆
+        """
+        traffic_state = adjusted_traffic['traffic']
+        is_ramp = adjusted_traffic['is_ramp']
+        position = traffic_state.position
+        if len(traffic_state) == 0:
+            return {'upstream': 0.0, 'diverge': 0.0, 'downstream': 0.0}
+
+        ramp_position = self.ramp_position if self.ramp_position is not None else position.max()
+        upstream = position < ramp_position - self.diverge_length
+        downstream = position >= ramp_position
+        diverge = ~upstream & ~downstream
+
+        lane = traffic_state.lane.copy()
+        acceleration = traffic_state.acceleration.copy()
+        exiting = is_ramp & diverge
+        distance = np.maximum(ramp_position - position[exiting], 1.0)
+        speed = traffic_state.speed[exiting]
+        acceleration[exiting] = np.clip((self.ramp_speed ** 2 - speed ** 2) / (2 * distance),
+                                        -self.max_deceleration, 0)
+        lane[exiting] = 0
+
+        remaining = ~(is_ramp & downstream)
+        segment_state = ColumnarTrafficState(traffic_state.vehicle_class, traffic_state.automation_level,
+                                             lane, position, traffic_state.speed, acceleration,
+                                             traffic_state.spacing, traffic_state.frame_interval)
+        emission = self._calculate_vehicle_emissions(segment_state.select(remaining))
+
+        return {
+            'upstream': float(emission[upstream[remaining]].sum()),
+            'diverge': float(emission[diverge[remaining]].sum()),
+            'downstream': float(emission[downstream[remaining]].sum())
+        }
+
+    def analyze_trajectory_store(self, store, max_rows=1 << 20, default_interval=1.0,
+                                 fuel_model=None, electric_model=None):
+        """
+        按块流式分析列式轨迹存储的碳排放
+        各块为存储的零拷贝视图，内存占用由max_rows决定而与存储规模无关
+        返回总排放、分车道/分车型排放及逐车排放（顺序与store.vehicle_ids一致）
+        """
+        return self._analyze_trajectory_chunks(store.iter_chunks(max_rows), default_interval,
+                                               fuel_model, electric_model)
+
+    def analyze_trajectory_csv(self, path, chunk_rows=1 << 18, frame_interval=0.1, sorted_by='vehicle',
+                               lane_names=None, fuel_model=None, electric_model=None, **reader_options):
+        """
+        分块流式分析轨迹CSV文件的碳排放
+        lane_names: 车道号 -> 车道名称（如{1: 'L1'}），用于分车道排放结果
+        """
+        reader = TrajectoryCsvReader(path, chunk_rows, frame_interval, sorted_by, **reader_options)
+        result = self._analyze_trajectory_chunks(reader.iter_trajectories(), frame_interval,
+                                                 fuel_model, electric_model)
+        if lane_names:
+            result['by_lane'] = {lane_names.get(lane, lane): emission
+                                 for lane, emission in result['by_lane'].items()}
+        return result
+
+    def _analyze_trajectory_chunks(self, chunks, default_interval, fuel_model, electric_model):
+        """逐块计算排放并累加；chunks为(各列数组, 块内逐车偏移)的迭代器"""
+        fuel_model = fuel_model or FuelVehicleEmissionModel()
+        electric_model = electric_model or ElectricVehicleEmissionModel()
+        electric_codes = [ColumnarTrafficState.class_code(name)
+                          for name in ColumnarTrafficState.ELECTRIC_CLASSES]
+
+        vehicle_ids, per_vehicle = [], []
+        by_lane = {}
+        by_class = np.zeros(len(ColumnarTrafficState.VEHICLE_CLASSES))
+        for columns, local_offsets in chunks:
+            if len(local_offsets) < 2:
+                continue
+            dt = TrajectoryStore.sample_intervals(columns['timestamp'], local_offsets, default_interval)
+            emission = _calculate_sample_emission(
+                fuel_model, electric_model, np.isin(columns['vehicle_class'], electric_codes),
+                columns['speed'], columns['acceleration'], dt)
+
+            vehicle_ids.append(np.asarray(columns['vehicle_id'][local_offsets[:-1]]))
+            per_vehicle.append(np.add.reduceat(emission, local_offsets[:-1]))
+
+            by_class += np.bincount(columns['vehicle_class'], weights=emission,
+                                    minlength=len(by_class))
+            lanes, lane_index = np.unique(columns['lane'], return_inverse=True)
+            for lane, lane_emission in zip(lanes.tolist(), np.bincount(lane_index, weights=emission)):
+                by_lane[lane] = by_lane.get(lane, 0.0) + float(lane_emission)
+
+        per_vehicle = np.concatenate(per_vehicle) if per_vehicle else np.zeros(0)
+        return {
+            'total': float(per_vehicle.sum()),
+            'by_lane': by_lane,
+            'by_class': dict(zip(ColumnarTrafficState.VEHICLE_CLASSES, by_class.tolist())),
+            'vehicle_ids': np.concatenate(vehicle_ids) if vehicle_ids else np.zeros(0, dtype=np.int64),
+            'per_vehicle': per_vehicle
+        }
+
+
+_attached_shared_memory = {}  # 工作进程内已挂载的共享内存块
+
+
+class _SharedArrayRef:
+    """共享内存数组描述（名称、形状、类型），随任务传递代替数组本身"""
+
+    def __init__(self, name, shape, dtype):
+        self.name = name
+        self.shape = shape
+        self.dtype = dtype
+
+
+def _pack_shared_arrays(obj, blocks, threshold_bytes):
+    """将大数组复制到共享内存，并以描述替换"""
+    if isinstance(obj, np.ndarray) and obj.nbytes >= threshold_bytes and obj.dtype != object:
+        block = shared_memory.SharedMemory(create=True, size=obj.nbytes)
+        np.ndarray(obj.shape, dtype=obj.dtype, buffer=block.buf)[...] = obj
+        blocks.append(block)
+        return _SharedArrayRef(block.name, obj.shape, obj.dtype.str)
+    if isinstance(obj, dict):
+        return {key: _pack_shared_arrays(value, blocks, threshold_bytes) for key, value in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return type(obj)(_pack_shared_arrays(value, blocks, threshold_bytes) for value in obj)
+    if isinstance(obj, ColumnarTrafficState):
+        packed = copy.copy(obj)
+        packed.__dict__ = _pack_shared_arrays(obj.__dict__, blocks, threshold_bytes)
+        return packed
+    return obj
+
+
+def _unpack_shared_arrays(obj):
+    """在工作进程中挂载共享内存，还原为只读数组视图（不复制）"""
+    if isinstance(obj, _SharedArrayRef):
+        block = _attached_shared_memory.get(obj.name)
+        if block is None:
+            block = shared_memory.SharedMemory(name=obj.name)
+            _attached_shared_memory[obj.name] = block
+        array = np.ndarray(obj.shape, dtype=np.dtype(obj.dtype), buffer=block.buf)
+        array.flags.writeable = False
+        return array
+    if isinstance(obj, dict):
+        return {key: _unpack_shared_arrays(value) for key, value in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return type(obj)(_unpack_shared_arrays(value) for value in obj)
+    if isinstance(obj, ColumnarTrafficState):
+        unpacked = copy.copy(obj)
+        unpacked.__dict__ = _unpack_shared_arrays(obj.__dict__)
+        return unpacked
+    return obj
+
+
+def _run_analyzer_task(analyzer, method_name, ratio, packed_traffic):
+    """工作进程：对单个比例调用分析器方法"""
+    traffic = _unpack_shared_arrays(packed_traffic)
+    return getattr(analyzer, method_name)([ratio], traffic)[ratio]
+
+
+def _run_sweep_task(func, parameters, packed_shared_data):
+    """工作进程：对单组参数调用扫描函数"""
+    return func(_unpack_shared_arrays(packed_shared_data), **parameters)
+
+
+class ParallelSweepExecutor:
+    """
+    参数扫描并行执行器
+    比例网格（及其与车队规模、车头时距等参数的组合）分发到进程池，
+    大数组经共享内存传递，不随每个任务序列化
+    """
+
+    def __init__(self, analyzer=None, max_workers=None, share_threshold_bytes=1 << 20):
+        self.analyzer = analyzer if analyzer is not None else TrafficEmissionAnalyzer()
+        self.max_workers = max_workers
+        self.share_threshold_bytes = share_threshold_bytes  # 超过该大小的数组放入共享内存
+
+    def analyze_smart_vehicle_impact(self, mixing_ratios, traffic_data):
+        """并行版TrafficEmissionAnalyzer.analyze_smart_vehicle_impact，结果结构相同"""
+        return self._map_ratios('analyze_smart_vehicle_impact', mixing_ratios, traffic_data)
+
+    def analyze_ramp_vehicle_impact(self, ramp_ratios, base_traffic):
+        """并行版TrafficEmissionAnalyzer.analyze_ramp_vehicle_impact，结果结构相同"""
+        return self._map_ratios('analyze_ramp_vehicle_impact', ramp_ratios, base_traffic)
+
+    def sweep(self, func, parameter_grid, shared_data=None):
+        """
+        笛卡尔积参数扫描
+        func: 模块级函数，调用形式为func(shared_data, **parameters)
+        parameter_grid: {参数名: 取值列表}，如smart_ratio、platoon_size、headway
+        返回以参数取值元组为键的结果字典，顺序与网格展开顺序一致
+        """
+        names = list(parameter_grid)
+        combinations = list(itertools.product(*(parameter_grid[name] for name in names)))
+
+        blocks = []
+        try:
+            packed = _pack_shared_arrays(shared_data, blocks, self.share_threshold_bytes)
+            with ProcessPoolExecutor(max_workers=self.max_workers) as pool:
+                futures = [pool.submit(_run_sweep_task, func, dict(zip(names, values)), packed)
+                           for values in combinations]
+                return {values: future.result() for values, future in zip(combinations, futures)}
+        finally:
+            self._release(blocks)
+
+    def _map_ratios(self, method_name, ratios, traffic):
+        """将比例列表分发到进程池并按原顺序收集结果"""
+        blocks = []
+        try:
+            packed = _pack_shared_arrays(traffic, blocks, self.share_threshold_bytes)
+            with ProcessPoolExecutor(max_workers=self.max_workers) as pool:
+                futures = [pool.submit(_run_analyzer_task, self.analyzer, method_name, ratio, packed)
+                           for ratio in ratios]
+                return {ratio: future.result() for ratio, future in zip(ratios, futures)}
+        finally:
+            self._release(blocks)
+
+    @staticmethod
+    def _release(blocks):
+        """释放共享内存块"""
+        for block in blocks:
+            block.close()
+            block.unlink()
+
 
 
 
@@ -608,6 +3189,9 @@ class CruiseSystemDegradationModel:
             'human_vehicle_ahead': self._human_vehicle_ahead_degradation,
             'max_platoon_ahead': self._max_platoon_ahead_degradation
         }
+        self.platoons_ahead_terms = 9  # 级数项数：前方最大规模车队个数i=1..9
+        self.max_cache_size = 4096  # 退化比例缓存上限
+        self._degradation_cache = {}  # (p, n) -> 退化比例
 
     def calculate_vehicle_proportions(self, total_vehicles, smart_ratio, max_platoon_size):
         """
@@ -620,10 +3204,10 @@ class CruiseSystemDegradationModel:
             cacc_ratio = (max_platoon_size - 1) / max_platoon_size
         else:
             # 智能车前方为人工驾驶车辆导致的退化
-            acc1_ratio = smart_ratio * (1 - smart_ratio)
+            acc1_ratio = self._human_vehicle_ahead_degradation(smart_ratio)
 
             # 智能车前方为达到最大规模车队导致的退化
-            acc2_ratio = self._calculate_max_platoon_degradation(smart_ratio, max_platoon_size)
+            acc2_ratio = self._max_platoon_ahead_degradation(smart_ratio, max_platoon_size)
 
             # 总ACC车辆比例
             acc_ratio = acc1_ratio + acc2_ratio
@@ -637,6 +3221,42 @@ class CruiseSystemDegradationModel:
             'cacc_vehicles': cacc_ratio
         }
 
+    def calculate_vehicle_proportions_batch(self, smart_ratios, max_platoon_sizes):
+        """
+        批量计算车辆比例
+        smart_ratios与max_platoon_sizes可广播，返回同形状数组
+        """
+        p, n = np.broadcast_arrays(np.asarray(smart_ratios, dtype=float),
+                                   np.asarray(max_platoon_sizes, dtype=float))
+
+        acc_ratio = np.where(p == 1, 1 / n,
+                             p * (1 - p) + self._calculate_max_platoon_degradation_batch(p, n))
+        cacc_ratio = np.where(p == 1, (n - 1) / n, p - acc_ratio)
+
+        return {
+            'human_vehicles': 1 - p,
+            'acc_vehicles': acc_ratio,
+            'cacc_vehicles': cacc_ratio
+        }
+
+    def _human_vehicle_ahead_degradation(self, p):
+        """
+        前方为人工驾驶车辆导致的退化比例
+        公式5.2
+        """
+        return p * (1 - p)
+
+    def _max_platoon_ahead_degradation(self, p, n):
+        """前方为最大规模车队导致的退化比例（带缓存）"""
+        key = (p, n)
+        ratio = self._degradation_cache.get(key)
+        if ratio is None:
+            if len(self._degradation_cache) >= self.max_cache_size:
+                self._degradation_cache.clear()
+            ratio = self._calculate_max_platoon_degradation(p, n)
+            self._degradation_cache[key] = ratio
+        return ratio
+
     def _calculate_max_platoon_degradation(self, p, n):
         """
         计算前方最大规模车队导致的退化比例
@@ -645,14 +3265,34 @@ class CruiseSystemDegradationModel:
         if p == 1:
             return 1 / n
 
-        # 计算前方有i个最大规模车队的退化情况
-        total_acc_ratio = 0
-        for i in range(1, 10):  # 假设最多前方有10个车队
-            acc_ratio_i = (p ** i * (1 - p ** (n * i))) / (1 - p ** n)
-            total_acc_ratio += acc_ratio_i
+        # 前方有i个最大规模车队的退化比例之和：
+        # Σ p^i(1-p^(ni))/(1-p^n) = [S(p) - S(p^(n+1))]/(1-p^n)，S为等比级数部分和
+        p_n = p ** n
+        total_acc_ratio = ((self._geometric_partial_sum(p) - self._geometric_partial_sum(p * p_n))
+                           / (1 - p_n))
 
         return min(total_acc_ratio, p)  # 不能超过智能车总比例
 
+    def _calculate_max_platoon_degradation_batch(self, p, n):
+        """退化比例的数组版本（闭式求和）"""
+        p, n = np.broadcast_arrays(np.asarray(p, dtype=float), np.asarray(n, dtype=float))
+        p_n = p ** n
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            total_acc_ratio = ((self._geometric_partial_sum(p) - self._geometric_partial_sum(p * p_n))
+                               / (1 - p_n))
+
+        return np.where(p == 1, 1 / n, np.minimum(total_acc_ratio, p))
+
+    def _geometric_partial_sum(self, r):
+        """等比级数部分和 Σ_{i=1}^{m} r^i，m为platoons_ahead_terms"""
+        m = self.platoons_ahead_terms
+        if np.ndim(r) == 0:
+            return m if r == 1 else r * (1 - r ** m) / (1 - r)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(r == 1, m, r * (1 - r ** m) / (1 - r))
+
 
 class PlatooningTrafficModel:
     """车辆队列行驶交通流模型"""
@@ -661,4 +3301,202 @@ class PlatooningTrafficModel:
         """
         计算车辆队列行驶的基本图
         公式5.7-5
-        """
\ No newline at end of file
+        """
+
+
+class ModelInstrumentation:
+    """
+    模型层热点耗时统计（按需启用）
+    启用时替换各类公有方法为计时包装，停用时恢复原方法，未启用时无任何额外开销
+    嵌套调用的耗时按包含子调用计
+    """
+
+    def __init__(self, max_samples=4096, max_cycles=1000):
+        """
+        max_samples: 每个方法保留的最近耗时样本数（用于分位数）
+        max_cycles: 缓存的控制周期追踪记录数
+        """
+        self.max_samples = max_samples
+        self.cycles = deque(maxlen=max_cycles)
+        self.enabled = False
+        self._originals = []  # (类, 方法名, 原属性)
+        self._stats = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()  # 当前线程的控制周期
+        self._cycle_count = 0
+
+    def enable(self, classes=None):
+        """
+        启用统计
+        classes: 需统计的类，缺省为本模块定义的全部类
+        """
+        if self.enabled:
+            return
+        if classes is None:
+            module = sys.modules[__name__]
+            classes = [obj for obj in vars(module).values()
+                       if inspect.isclass(obj) and obj.__module__ == __name__
+                       and obj is not ModelInstrumentation]
+
+        for cls in classes:
+            for name, attribute in list(vars(cls).items()):
+                if name.startswith('_'):
+                    continue
+                wrapped = self._wrap_attribute(cls, name, attribute)
+                if wrapped is not None:
+                    self._originals.append((cls, name, attribute))
+                    setattr(cls, name, wrapped)
+        self.enabled = True
+
+    def disable(self):
+        """停用统计并恢复原方法"""
+        for cls, name, attribute in reversed(self._originals):
+            setattr(cls, name, attribute)
+        self._originals.clear()
+        self.enabled = False
+
+    def reset(self):
+        """清空统计与追踪记录"""
+        with self._lock:
+            self._stats.clear()
+            self.cycles.clear()
+
+    def _wrap_attribute(self, cls, name, attribute):
+        """包装普通/静态/类方法；生成器与协程只计创建耗时，不予包装"""
+        if isinstance(attribute, (staticmethod, classmethod)):
+            function = attribute.__func__
+        elif inspect.isfunction(attribute):
+            function = attribute
+        else:
+            return None
+        if inspect.isgeneratorfunction(function) or inspect.iscoroutinefunction(function):
+            return None
+
+        wrapper = self._make_wrapper(function, f'{cls.__name__}.{name}',
+                                     skip_first=not isinstance(attribute, staticmethod))
+        return type(attribute)(wrapper) if isinstance(attribute, (staticmethod, classmethod)) else wrapper
+
+    def _make_wrapper(self, function, key, skip_first):
+        """计时包装；处理量取第一个数据参数的样本数"""
+        record = self._record
+        local = self._local
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            depth = getattr(local, 'depth', 0)
+            local.depth = depth + 1
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - start
+                local.depth = depth
+                data = args[1:] if skip_first else args
+                record(key, start, elapsed, _count_items(data[0]) if data else 1, depth)
+
+        return wrapper
+
+    def _record(self, key, start, elapsed, items, depth):
+        with self._lock:
+            stats = self._stats.get(key)
+            if stats is None:
+                stats = self._stats[key] = {'count': 0, 'total_seconds': 0.0, 'items': 0,
+                                            'samples': np.empty(self.max_samples)}
+            stats['samples'][stats['count'] % self.max_samples] = elapsed
+            stats['count'] += 1
+            stats['total_seconds'] += elapsed
+            stats['items'] += items
+
+        cycle = getattr(self._local, 'cycle', None)
+        if cycle is not None:
+            cycle['calls'].append({'method': key, 'offset': start - cycle['_start'],
+                                   'duration': elapsed, 'items': items, 'depth': depth})
+
+    @contextmanager
+    def cycle(self, name='control'):
+        """
+        控制周期追踪：周期内当前线程的全部被统计调用按顺序记录
+        with instrumentation.cycle(): ...
+        """
+        with self._lock:
+            self._cycle_count += 1
+            number = self._cycle_count
+        record = {'cycle': number, 'name': name, 'timestamp': time.time(), 'calls': [],
+                  '_start': time.perf_counter()}
+        previous = getattr(self._local, 'cycle', None)
+        self._local.cycle = record
+        try:
+            yield record
+        finally:
+            self._local.cycle = previous
+            record['duration'] = time.perf_counter() - record.pop('_start')
+            self.cycles.append(record)
+
+    def snapshot(self, quantiles=(0.5, 0.9, 0.99)):
+        """各方法的调用次数、累计耗时、处理量及耗时分位数"""
+        with self._lock:
+            items = [(key, dict(stats, samples=stats['samples'][:min(stats['count'], self.max_samples)].copy()))
+                     for key, stats in self._stats.items()]
+
+        result = {}
+        for key, stats in sorted(items):
+            latency = np.quantile(stats['samples'], quantiles) if stats['count'] else np.zeros(len(quantiles))
+            result[key] = {
+                'count': stats['count'],
+                'total_seconds': stats['total_seconds'],
+                'items': stats['items'],
+                'quantiles': dict(zip(map(str, quantiles), latency.tolist()))
+            }
+        return result
+
+    def export_prometheus(self, path, prefix='model_method'):
+        """
+        按Prometheus文本格式写出统计快照（适用于node_exporter textfile采集）
+        先写临时文件再替换，避免采集到写了一半的文件
+        """
+        snapshot = self.snapshot()
+        lines = [f'# HELP {prefix}_calls_total 方法调用次数',
+                 f'# TYPE {prefix}_calls_total counter']
+        labels = {key: 'class="{}",method="{}"'.format(*key.split('.', 1)) for key in snapshot}
+        lines += [f'{prefix}_calls_total{{{labels[key]}}} {stats["count"]}' for key, stats in snapshot.items()]
+        lines += [f'# HELP {prefix}_items_total 方法处理的样本数',
+                  f'# TYPE {prefix}_items_total counter']
+        lines += [f'{prefix}_items_total{{{labels[key]}}} {stats["items"]}' for key, stats in snapshot.items()]
+        lines += [f'# HELP {prefix}_latency_seconds 方法耗时',
+                  f'# TYPE {prefix}_latency_seconds summary']
+        for key, stats in snapshot.items():
+            for quantile, value in stats['quantiles'].items():
+                lines.append(f'{prefix}_latency_seconds{{{labels[key]},quantile="{quantile}"}} {value:.9g}')
+            lines.append(f'{prefix}_latency_seconds_sum{{{labels[key]}}} {stats["total_seconds"]:.9g}')
+            lines.append(f'{prefix}_latency_seconds_count{{{labels[key]}}} {stats["count"]}')
+
+        temporary_path = f'{path}.tmp'
+        with open(temporary_path, 'w') as file:
+            file.write('\n'.join(lines) + '\n')
+        os.replace(temporary_path, path)
+
+    def export_trace(self, path):
+        """将缓存的控制周期追踪记录以JSON Lines追加写出，并清空缓存"""
+        with self._lock:
+            cycles = list(self.cycles)
+            self.cycles.clear()
+        with open(path, 'a') as file:
+            for record in cycles:
+                file.write(json.dumps(record, ensure_ascii=False) + '\n')
+        return len(cycles)
+
+
+def _count_items(data):
+    """参数包含的样本数：数组取元素数，序列与列式状态取长度，其余（含字符串）计为1"""
+    size = getattr(data, 'size', None)
+    if isinstance(size, int):
+        return size
+    if isinstance(data, (str, bytes)):
+        return 1
+    try:
+        return len(data)
+    except TypeError:
+        return 1
+
+
+instrumentation = ModelInstrumentation()  # 模块级统计实例，instrumentation.enable()启用
\ No newline at end of file
@@ -0,0 +1,544 @@
+"""code.py 模型回归测试（在仓库根目录运行: python -m pytest -q）"""
+
+import asyncio
+import time
+
+import numpy as np
+import pytest
+
+from code import (ACCModel, CACCModel, CarFollowingSimulator, ColumnarTrafficState,
+                  CooperativeLaneChangePlanner, CruiseSystemDegradationModel,
+                  ElectricVehicleEmissionModel, EmissionLookupTable, FuelVehicleEmissionModel,
+                  HeterogeneousTrafficFlowModel, LaneNeighborIndex, LaneUtilityModel,
+                  ParallelSweepExecutor, SmartVehicleLaneChangeModel, SmartVehicleMixingModel,
+                  StreamingEmissionAccumulator, TrafficEmissionAnalyzer, TrajectoryCsvReader,
+                  TrajectoryStore, TrajectoryStoreWriter, V2XIngestionService, V2X_RECORD_DTYPE,
+                  encode_v2x_message)
+
+
+def _ragged_profiles(rng, lengths):
+    """不等长的速度、加速度与逐步时长序列"""
+    return ([rng.uniform(0, 35, n) for n in lengths], [rng.normal(0, 1.5, n) for n in lengths],
+            [rng.uniform(0.05, 2.0, n) for n in lengths])
+
+
+def test_fuel_batch_emission_matches_scalar_for_ragged_profiles():
+    model = FuelVehicleEmissionModel()
+    velocity, acceleration, duration = _ragged_profiles(np.random.default_rng(0), [1, 7, 30, 12])
+    expected = [model.calculate_co2_emission(v, a, d) for v, a, d in zip(velocity, acceleration, duration)]
+
+    # 不等长轨迹按duration=0补齐后整体批量计算
+    width = max(len(v) for v in velocity)
+    padded = [np.zeros((len(velocity), width)) for _ in range(3)]
+    for i, profiles in enumerate(zip(velocity, acceleration, duration)):
+        for array, profile in zip(padded, profiles):
+            array[i, :len(profile)] = profile
+
+    np.testing.assert_allclose(model.calculate_co2_emission_batch(*padded), expected)
+    assert model.calculate_co2_emission_batch(velocity[2], acceleration[2], duration[2]) == \
+        pytest.approx(expected[2])
+    assert model.calculate_co2_emission_batch(velocity[2], acceleration[2], 0.5) == \
+        pytest.approx(model.calculate_co2_emission(velocity[2], acceleration[2], [0.5] * 30))
+
+
+def test_electric_fleet_emission_matches_scalar_for_ragged_profiles():
+    model = ElectricVehicleEmissionModel()
+    velocity, acceleration, intervals = _ragged_profiles(np.random.default_rng(1), [5, 1, 20])
+    result = model.calculate_fleet_emission(velocity, acceleration, intervals)
+
+    expected = [model.calculate_total_emission(v, a, dt)
+                for v, a, dt in zip(velocity, acceleration, intervals)]
+    np.testing.assert_allclose(result['co2_emission'], expected)
+
+    # 共享时间轴：一维时间间隔广播到所有车辆
+    shared = intervals[2]
+    result = model.calculate_fleet_emission(np.stack([velocity[2]] * 2), np.stack([acceleration[2]] * 2),
+                                            shared)
+    np.testing.assert_allclose(result['co2_emission'],
+                               model.calculate_total_emission(velocity[2], acceleration[2], shared))
+
+
+def test_streaming_accumulator_window_matches_brute_force():
+    rng = np.random.default_rng(2)
+    fuel_model, electric_model = FuelVehicleEmissionModel(), ElectricVehicleEmissionModel()
+    vehicle_ids = ['a', 'b', 'c']
+    vehicle_types = ['fuel', 'smart_electric', 'fuel']
+    accumulator = StreamingEmissionAccumulator(window_seconds=5, bucket_seconds=1.0, initial_capacity=1)
+    accumulator.register_vehicles(vehicle_ids, vehicle_types)
+
+    samples = []  # (时刻, 车辆, 排放量)
+    for step in range(1, 13):
+        timestamp = step * 0.5 if step < 10 else step * 2.0  # 后段跳过多个时间桶
+        velocity, acceleration = rng.uniform(0, 35, 3), rng.normal(0, 1, 3)
+        accumulator.push(vehicle_ids, velocity, acceleration, 0.5, timestamp=timestamp)
+        for vehicle_id, vehicle_type, v, a in zip(vehicle_ids, vehicle_types, velocity, acceleration):
+            if 'electric' in vehicle_type:
+                power_kwh = electric_model.calculate_instant_power_consumption(v, a) * 0.5 / 3600 / 1000
+                emission = electric_model.calculate_co2_equivalent(power_kwh, 0.5 / 3600)
+            else:
+                emission = fuel_model.calculate_co2_emission([v], [a], [0.5])
+            samples.append((timestamp, vehicle_id, emission))
+
+        current_bucket = int(timestamp // 1.0)
+        for vehicle_id in vehicle_ids:
+            in_window = sum(e for t, v, e in samples
+                            if v == vehicle_id and int(t // 1.0) > current_bucket - 5)
+            total = sum(e for t, v, e in samples if v == vehicle_id)
+            assert accumulator.get_window_emission([vehicle_id])[0] == pytest.approx(in_window, abs=1e-9)
+            assert accumulator.get_total_emission([vehicle_id])[0] == pytest.approx(total)
+
+    evicted = accumulator.evict(['b'])
+    assert evicted['b'] == pytest.approx(sum(e for _, v, e in samples if v == 'b'))
+    assert 'b' not in accumulator.slot_of
+
+
+def _platoon(vehicle_class):
+    """单一队列：头车在前，依次为跟随车；与前车间距分别为10、15、20米"""
+    positions = [100.0, 90.0, 75.0, 55.0]
+    spacing_to_leader = [np.nan, 10.0, 15.0, 20.0]
+    speeds = [25.0, 24.5, 25.5, 25.0]
+    accelerations = [0.2, -0.1, 0.3, 0.0]
+    state = ColumnarTrafficState([vehicle_class] * 4, [2] * 4, [0] * 4, positions, speeds,
+                                 accelerations, spacing_to_leader)
+    vehicles = [{'type': vehicle_class, 'speed': speed, 'acceleration': acceleration,
+                 'spacing_to_leader': leader, 'spacing_to_follower': follower}
+                for speed, acceleration, leader, follower in
+                zip(speeds, accelerations, spacing_to_leader, spacing_to_leader[1:] + [np.nan])]
+    return state, {'vehicles': vehicles}
+
+
+@pytest.mark.parametrize('vehicle_class', ['smart_fuel', 'smart_electric'])
+def test_columnar_smart_lane_emission_matches_per_vehicle_path(vehicle_class):
+    model = SmartVehicleMixingModel()
+    state, platoon_data = _platoon(vehicle_class)
+
+    corrected = model.air_resistance_correction.apply_platoon_correction(platoon_data)
+    expected = 0.0
+    for vehicle in corrected['vehicles']:
+        speed, acceleration = np.array([vehicle['speed']]), np.array([vehicle['acceleration']])
+        drag = np.array([vehicle['corrected_drag_coefficient']])
+        if vehicle_class == 'smart_fuel':
+            expected += model.fuel_model.calculate_emission_rate_batch(
+                speed, acceleration, drag_coefficient=drag)[0] * state.frame_interval
+        else:
+            power_kwh = model.electric_model.calculate_instant_power_consumption_batch(
+                speed, acceleration, drag_coefficient=drag) * state.frame_interval / 3600 / 1000
+            expected += model.electric_model.calculate_co2_equivalent(
+                power_kwh, state.frame_interval / 3600)[0]
+
+    result = model.calculate_smart_lane_emission(state)
+    assert np.isfinite(result)
+    assert result == pytest.approx(expected)
+
+
+def test_columnar_smart_lane_emission_leaves_single_vehicle_platoons_uncorrected():
+    model = SmartVehicleMixingModel()
+    state, _ = _platoon('smart_fuel')
+    uncorrected = model.calculate_columnar_emission(state)
+
+    assert model.calculate_smart_lane_emission(state.select([0])) == pytest.approx(uncorrected[0])
+    # 单车队列与多车队列混合：单车不修正，其余队列照常修正
+    mixed = model.calculate_smart_lane_emission(state, platoon_offsets=[0, 1, 4])
+    platoon = model.calculate_smart_lane_emission(state.select([1, 2, 3]))
+    assert mixed == pytest.approx(uncorrected[0] + platoon)
+
+
+def test_platoon_correction_batch_rejects_missing_spacing():
+    model = SmartVehicleMixingModel()
+    with pytest.raises(ValueError):
+        model.air_resistance_correction.apply_platoon_correction_batch([np.nan, 10.0], [0, 2])
+
+
+def _scalar_car_following_step(simulator, position, speed, lane, mode, previous):
+    """逐车标量参考实现：ACCModel/CACCModel的标量接口加相同的限幅规则"""
+    acc_model, cacc_model = ACCModel(), CACCModel()
+    new_speed, errors = list(speed), {}
+    for i in range(len(position)):
+        ahead = [j for j in range(len(position)) if lane[j] == lane[i] and position[j] > position[i]]
+        free_flow = simulator.free_flow_gain * (simulator.desired_speed - speed[i])
+        if not ahead:
+            acceleration = free_flow
+        else:
+            leader = min(ahead, key=lambda j: position[j])
+            spacing = position[leader] - position[i]
+            own_mode = mode[i]
+            if own_mode == CarFollowingSimulator.CACC and mode[leader] == CarFollowingSimulator.HUMAN:
+                own_mode = CarFollowingSimulator.ACC
+            headway = simulator.time_headways[own_mode]
+            error = acc_model.calculate_spacing_error(spacing, speed[i], headway)
+            errors[i] = (leader, error)
+            if own_mode == CarFollowingSimulator.CACC:
+                derivative = 0.0
+                if previous.get(i, (None,))[0] == leader:
+                    derivative = (error - previous[i][1]) / simulator.dt
+                target = cacc_model.calculate_speed(speed[i], error, derivative, headway)
+                acceleration = (target - speed[i]) / simulator.dt
+            else:
+                acceleration = acc_model.calculate_acceleration(spacing, speed[leader] - speed[i], headway,
+                                                                speed=speed[i])
+            acceleration = min(acceleration, free_flow)
+        acceleration = min(max(acceleration, -simulator.max_deceleration), simulator.max_acceleration)
+        new_speed[i] = max(speed[i] + acceleration * simulator.dt, 0)
+    return [p + v * simulator.dt for p, v in zip(position, new_speed)], new_speed, errors
+
+
+def test_car_following_simulator_matches_scalar_models():
+    position, speed = [0.0, 26.1, 61.8, 10.0], [20.0, 20.0, 20.5, 25.0]
+    lane = [0, 0, 0, 1]
+    mode = [CarFollowingSimulator.CACC, CarFollowingSimulator.CACC, CarFollowingSimulator.HUMAN,
+            CarFollowingSimulator.ACC]
+    simulator = CarFollowingSimulator(dt=0.1)
+    simulator.initialize(position, speed, lane, mode)
+
+    errors = {}
+    for _ in range(5):
+        position, speed, errors = _scalar_car_following_step(simulator, position, speed, lane, mode, errors)
+        simulator.step()
+        np.testing.assert_allclose(simulator.speed, speed)
+        np.testing.assert_allclose(simulator.position, position)
+
+
+def test_fundamental_diagram_grid_and_surface_match_scalar_model():
+    model = HeterogeneousTrafficFlowModel()
+    densities = np.linspace(1, 150, 40)
+    ratios, sizes = [0.0, 0.35, 1.0], [1, 3, 8]
+    speeds, flows = model.calculate_fundamental_diagram_grid(densities, ratios, sizes)
+    for i, density in enumerate(densities):
+        for j, ratio in enumerate(ratios):
+            for k, size in enumerate(sizes):
+                expected = model._calculate_equilibrium_speed(density, ratio, size)
+                assert speeds[i, j, k] == pytest.approx(expected)
+                assert flows[i, j, k] == pytest.approx(density * expected / 3.6)
+
+    # 网格节点上曲面查询与标量模型一致，标量与数组查询一致
+    surface = model.get_fundamental_diagram_surface()
+    assert model.get_fundamental_diagram_surface() is surface
+    node_density, node_ratio = surface.densities[37], surface.smart_ratios[42]
+    assert surface.query(node_density, node_ratio, 3)[0] == pytest.approx(
+        model._calculate_equilibrium_speed(node_density, node_ratio, 3))
+
+    rng = np.random.default_rng(3)
+    query = rng.uniform(0, 160, 50), rng.uniform(0, 1, 50), rng.integers(1, 11, 50)
+    batch_speed, batch_flow = surface.query_batch(*query)
+    scalar = np.array([surface.query(d, p, int(n)) for d, p, n in zip(*query)])
+    np.testing.assert_allclose(batch_speed, scalar[:, 0])
+    np.testing.assert_allclose(batch_flow, scalar[:, 1])
+
+
+def _multi_lane_traffic(size=200, seed=0):
+    """三车道交通流，车头间距10-40米，燃油/电动车随机混合"""
+    rng = np.random.default_rng(seed)
+    lane = np.arange(size) % 3
+    position = np.zeros(size)
+    for lane_index in range(3):
+        in_lane = lane == lane_index
+        position[in_lane] = np.cumsum(rng.uniform(10, 40, in_lane.sum()))
+    return ColumnarTrafficState(rng.integers(0, 2, size), np.zeros(size), lane, position,
+                                rng.uniform(15, 33, size), rng.normal(0, 0.5, size))
+
+
+def test_parallel_sweeps_match_serial():
+    state = _multi_lane_traffic()
+    ratios = [0.0, 0.3, 1.0]
+    executor = ParallelSweepExecutor(max_workers=2, share_threshold_bytes=0)
+
+    expected = TrafficEmissionAnalyzer().analyze_smart_vehicle_impact(ratios, state)
+    result = executor.analyze_smart_vehicle_impact(ratios, state)
+    assert list(result) == ratios
+    for ratio in ratios:
+        assert result[ratio]['total'] == pytest.approx(expected[ratio]['total'])
+        assert result[ratio]['by_lane'] == pytest.approx(expected[ratio]['by_lane'])
+
+    expected = TrafficEmissionAnalyzer().analyze_ramp_vehicle_impact(ratios, state)
+    result = executor.analyze_ramp_vehicle_impact(ratios, state)
+    assert list(result) == ratios
+    for ratio in ratios:
+        assert result[ratio]['total'] == pytest.approx(expected[ratio]['total'])
+        assert result[ratio]['segments'] == pytest.approx(expected[ratio]['segments'])
+
+
+def test_smart_vehicle_impact_depends_on_mixing_ratio():
+    state = _multi_lane_traffic()
+    analyzer = TrafficEmissionAnalyzer()
+    adjusted = analyzer._adjust_traffic_composition(state, 0.3)
+    smart = np.isin(adjusted.vehicle_class, [ColumnarTrafficState.class_code('smart_fuel'),
+                                             ColumnarTrafficState.class_code('smart_electric')])
+    assert smart.sum() == 60
+    np.testing.assert_array_equal(adjusted.is_electric, state.is_electric)
+
+    # 混入率越高，CACC车队越多，风阻修正后的排放越低
+    totals = [result['total'] for result in
+              analyzer.analyze_smart_vehicle_impact([0.0, 0.3, 0.6, 1.0], state).values()]
+    assert np.all(np.diff(totals) < 0)
+
+    # 无智能车或全部间距超过CACC跟驰距离时不修正
+    np.testing.assert_allclose(analyzer._platoon_drag_coefficients(adjusted.select(~smart)),
+                               analyzer.mixing_model.fuel_model.drag_coefficient)
+    analyzer.max_platoon_spacing = 0.0
+    assert analyzer.analyze_smart_vehicle_impact([1.0], state)[1.0]['total'] == pytest.approx(totals[0])
+
+
+def test_platoon_drag_degrades_to_acc_at_max_platoon_size():
+    # 单车道五辆智能车，净间距均为10米；最大规模3时分为3+2两个车队
+    state = ColumnarTrafficState(['smart_fuel'] * 5, [2] * 5, [0] * 5, [60.0, 45.0, 30.0, 15.0, 0.0],
+                                 [25.0] * 5, [0.0] * 5)
+    analyzer = TrafficEmissionAnalyzer()
+    correction = analyzer.mixing_model.air_resistance_correction
+    head = correction.calculate_head_vehicle_correction(10.0)
+    follower = correction.calculate_following_vehicle_correction(10.0)
+    np.testing.assert_allclose(analyzer._platoon_drag_coefficients(state) / 0.3,
+                               [head, follower, follower, head, follower])
+
+
+def test_ramp_vehicle_impact_depends_on_ramp_ratio():
+    state = _multi_lane_traffic()
+    analyzer = TrafficEmissionAnalyzer()
+    analyzer.ramp_position = 1500.0
+    results = analyzer.analyze_ramp_vehicle_impact([0.0, 0.2, 0.5], state)
+
+    downstream = [result['segments']['downstream'] for result in results.values()]
+    diverge = [result['segments']['diverge'] for result in results.values()]
+    assert np.all(np.diff(downstream) < 0)  # 驶离车辆不再计入下游
+    assert np.all(np.diff(diverge) < 0)  # 驶离车辆在分流区减速
+    assert len({result['segments']['upstream'] for result in results.values()}) == 1
+    for result in results.values():
+        assert result['total'] == pytest.approx(sum(result['segments'].values()))
+
+
+def test_degradation_closed_form_and_batch_match_series():
+    model = CruiseSystemDegradationModel()
+    ratios, sizes = np.array([0.0, 0.1, 0.45, 0.8, 0.99, 1.0]), np.array([1, 2, 3, 6, 10])
+    batch = model.calculate_vehicle_proportions_batch(ratios[:, None], sizes[None, :])
+
+    for i, p in enumerate(ratios):
+        for j, n in enumerate(sizes):
+            if p == 1:
+                series = 1 / n
+            else:
+                series = min(sum(p ** k * (1 - p ** (n * k)) / (1 - p ** n) for k in range(1, 10)), p)
+            assert model._calculate_max_platoon_degradation(p, n) == pytest.approx(series)
+
+            proportions = model.calculate_vehicle_proportions(100, p, n)
+            for key, value in proportions.items():
+                assert batch[key][i, j] == pytest.approx(value)
+    assert (0.45, 3) in model._degradation_cache
+
+
+def test_lane_change_gap_counts_vehicle_alongside_in_target_lane():
+    state = ColumnarTrafficState(['smart_fuel', 'fuel'], [2, 0], [1, 0], [100.0, 100.0],
+                                 [25.0, 25.0], [0.0, 0.0])
+    result = SmartVehicleLaneChangeModel().frame_dynamic_decision(state, target_lane=0)
+
+    index = LaneNeighborIndex(vehicle_length=5.0)
+    index.insert('ego', 1, 100.0)
+    index.insert('other', 0, 100.0)
+    expected = index.adjacent_gaps('ego', 0)
+
+    assert result['target_front_gap'][0] == pytest.approx(expected['target_front_gap'])
+    assert result['target_front_gap'][0] == pytest.approx(-5.0)
+    assert not result['gap_acceptance'][0]
+    assert not result['decision'][0]
+
+
+def test_lane_neighbor_index_matches_brute_force_over_frames():
+    rng = np.random.default_rng(4)
+    index = LaneNeighborIndex(vehicle_length=5.0)
+    vehicle_ids = np.arange(40)
+    lanes, positions = rng.integers(0, 3, 40), rng.uniform(0, 500, 40)
+
+    def nearest(lane, position, ahead, exclude):
+        gaps = [(p - position if ahead else position - p) for v, (l, p) in state.items()
+                if l == lane and v != exclude and ((p >= position) if ahead else (p < position))]
+        return min(gaps) - 5.0 if gaps else np.inf
+
+    for _ in range(6):
+        present = rng.random(len(vehicle_ids)) < 0.8
+        index.update_frame(vehicle_ids[present].tolist(), lanes[present].tolist(),
+                           positions[present].tolist())
+        state = {v: (l, p) for v, l, p in zip(vehicle_ids[present], lanes[present], positions[present])}
+        assert len(index) == len(state)
+
+        for vehicle_id, (lane, position) in state.items():
+            assert index.leader(vehicle_id)[1] == pytest.approx(nearest(lane, position, True, vehicle_id))
+            assert index.follower(vehicle_id)[1] == pytest.approx(nearest(lane, position, False, vehicle_id))
+            target_lane = (lane + 1) % 3
+            gaps = index.adjacent_gaps(vehicle_id, target_lane)
+            assert gaps['target_front_gap'] == pytest.approx(nearest(target_lane, position, True, vehicle_id))
+            assert gaps['target_rear_gap'] == pytest.approx(nearest(target_lane, position, False, vehicle_id))
+
+            distances = sorted(abs(p - position) for v, (l, p) in state.items() if l == lane and v != vehicle_id)
+            assert [d for _, d in index.k_nearest(vehicle_id, 3)] == pytest.approx(distances[:3])
+
+        # 小幅前移（保持顺序）与少量换道
+        positions = positions + rng.uniform(0, 3, len(positions))
+        changed = rng.random(len(lanes)) < 0.1
+        lanes = np.where(changed, (lanes + 1) % 3, lanes)
+
+
+def test_cooperative_planner_respects_deadline():
+    rng = np.random.default_rng(1)
+    planner = CooperativeLaneChangePlanner()
+    start = time.perf_counter()
+    planner.plan(rng.uniform(0, 200, 7), rng.uniform(20, 30, 7),
+                 np.sort(rng.uniform(-100, 400, 40)), rng.uniform(20, 30, 40), deadline=0.2)
+    assert time.perf_counter() - start < 0.5
+
+
+def test_cooperative_planner_finds_nearest_safe_gaps_before_deadline():
+    # 目标车道为成对的紧密车辆（间距8米），对间留40米宽间隙；
+    # 7辆换道车的匀速预测位置均落在窄间隙中，需各自调整到相邻的宽间隙
+    pairs = np.arange(20) * 48.0 - 200.0
+    target_positions = np.sort(np.concatenate([pairs, pairs + 8.0]))
+    merging_positions = target_positions[10] + 4.0 + 48.0 * np.arange(7)
+
+    start = time.perf_counter()
+    plan = CooperativeLaneChangePlanner().plan(merging_positions, np.full(7, 25.0), target_positions,
+                                               np.full(40, 25.0), deadline=0.2)
+    assert time.perf_counter() - start < 0.5
+    assert plan is not None and plan['safe']
+    assert plan['order'] == tuple(range(7))
+    assert all(gap % 2 == 0 for gap in plan['gaps'])  # 均为宽间隙
+
+
+def test_lane_utility_partial_weights_merge_with_defaults():
+    model = LaneUtilityModel(weights={'speed': 1.0})
+    assert model.weights == {'speed': 1.0, 'freedom': 0.3, 'safety': 0.2}
+    utility = model.calculate_lane_utility_matrix(np.array([100.0]), np.full((1, 3), 50.0),
+                                                  np.full((1, 3), 50.0))
+    assert np.all(np.isfinite(utility['total']))
+
+    with pytest.raises(ValueError):
+        LaneUtilityModel(weights={'comfort': 1.0})
+
+
+@pytest.mark.parametrize('road_angles', [[0.0, 0.01, 0.05], [0.03]])
+def test_lookup_table_rejects_non_uniform_or_single_point_axis(road_angles):
+    with pytest.raises(ValueError):
+        FuelVehicleEmissionModel().build_lookup_table((0, 10), (-1, 1), 1.0, 0.5, road_angles=road_angles)
+
+
+def test_lookup_table_save_load_round_trip_without_suffix(tmp_path):
+    table = FuelVehicleEmissionModel().build_lookup_table((0, 10), (-1, 1), 1.0, 0.5,
+                                                          road_angles=[0.0, 0.02, 0.04])
+    path = tmp_path / 'vsp_table'
+    table.save(path)
+    loaded = EmissionLookupTable.load(path)
+    np.testing.assert_array_equal(loaded.values, table.values)
+    assert loaded.metadata == table.metadata
+
+
+def test_trajectory_store_round_trip_and_chunked_analysis(tmp_path):
+    rng = np.random.default_rng(5)
+    lengths = {7: 5, 3: 1, 11: 9, 5: 4}
+    classes = {7: 'fuel', 3: 'electric', 11: 'smart_fuel', 5: 'smart_electric'}
+    tracks = {vehicle_id: {'timestamp': np.cumsum(rng.uniform(0.1, 0.5, n)), 'lane': rng.integers(0, 3, n),
+                           'position': rng.uniform(0, 500, n), 'speed': rng.uniform(0, 35, n),
+                           'acceleration': rng.normal(0, 1, n)}
+              for vehicle_id, n in lengths.items()}
+
+    with TrajectoryStoreWriter(str(tmp_path / 'store')) as writer:
+        for block in ([7, 3], [11, 5]):
+            rows = {name: np.concatenate([tracks[v][name] for v in block]) for name in tracks[7]}
+            vehicle_id = np.repeat(block, [lengths[v] for v in block])
+            shuffle = rng.permutation(len(vehicle_id))  # 块内乱序写入
+            writer.append_block(vehicle_id[shuffle], vehicle_class=np.repeat(
+                [classes[v] for v in block], [lengths[v] for v in block])[shuffle],
+                **{name: column[shuffle] for name, column in rows.items()})
+
+    store = TrajectoryStore(str(tmp_path / 'store'))
+    assert store.vehicle_ids.tolist() == [3, 7, 5, 11]
+    for vehicle_id, track in tracks.items():
+        trajectory = store.trajectory(vehicle_id)
+        for name, column in track.items():
+            np.testing.assert_array_equal(trajectory[name], column)
+
+    chunks = list(store.iter_chunks(max_rows=6))
+    assert all(len(columns['speed']) <= 6 or len(offsets) == 2 for columns, offsets in chunks)
+    np.testing.assert_array_equal(np.concatenate([columns['vehicle_id'] for columns, _ in chunks]),
+                                  store['vehicle_id'])
+
+    # 逐车标量参考：时长取到下一样本的时间差，末样本沿用前一时长
+    fuel_model, electric_model = FuelVehicleEmissionModel(), ElectricVehicleEmissionModel()
+    expected = []
+    for vehicle_id in store.vehicle_ids.tolist():
+        track = tracks[vehicle_id]
+        dt = np.diff(track['timestamp'], append=np.nan)
+        dt[-1] = dt[-2] if len(dt) > 1 else 0.5
+        if 'electric' in classes[vehicle_id]:
+            expected.append(electric_model.calculate_total_emission(track['speed'], track['acceleration'], dt))
+        else:
+            expected.append(fuel_model.calculate_co2_emission(track['speed'], track['acceleration'], dt))
+
+    result = TrafficEmissionAnalyzer().analyze_trajectory_store(store, max_rows=6, default_interval=0.5)
+    np.testing.assert_allclose(result['per_vehicle'], expected)
+    assert result['total'] == pytest.approx(sum(expected))
+
+
+def test_trajectory_csv_reader_maps_string_vehicle_classes(tmp_path):
+    path = tmp_path / 'tracks.csv'
+    path.write_text('id,frame,lane,x,v,a,class\n'
+                    '1,0,1,0.0,20.0,0.0,smart_electric\n'
+                    '1,1,1,2.0,20.0,0.0,smart_electric\n'
+                    '2,0,2,10.0,25.0,0.1,Car\n'
+                    '3,0,2,30.0,25.0,0.1,1\n')
+    reader = TrajectoryCsvReader(path, chunk_rows=2, class_map={'Car': 'fuel'})
+    columns = {name: np.concatenate([chunk[name] for chunk, _ in reader.iter_trajectories()])
+               for name in ('vehicle_id', 'vehicle_class')}
+
+    code = ColumnarTrafficState.class_code
+    np.testing.assert_array_equal(columns['vehicle_id'], [1, 1, 2, 3])
+    np.testing.assert_array_equal(columns['vehicle_class'], [code('smart_electric'), code('smart_electric'),
+                                                             code('fuel'), code('electric')])
+
+    with pytest.raises(ValueError):
+        list(TrajectoryCsvReader(path).iter_trajectories())
+
+
+def test_frame_sorted_reader_keeps_gapped_vehicle_in_one_trajectory(tmp_path):
+    # 车辆1在第2-4帧缺失，第5帧再次出现
+    path = tmp_path / 'frames.csv'
+    path.write_text('id,frame,lane,x,v,a\n'
+                    '1,0,1,0.0,20.0,0.0\n2,0,2,5.0,20.0,0.0\n'
+                    '1,1,1,2.0,20.0,0.0\n2,1,2,7.0,20.0,0.0\n'
+                    '2,2,2,9.0,20.0,0.0\n2,3,2,11.0,20.0,0.0\n2,4,2,13.0,20.0,0.0\n'
+                    '1,5,1,10.0,20.0,0.0\n2,5,2,15.0,20.0,0.0\n')
+
+    with pytest.raises(ValueError):
+        TrajectoryCsvReader(path, sorted_by='frame')
+    with pytest.raises(ValueError, match='idle_frames'):
+        list(TrajectoryCsvReader(path, chunk_rows=2, sorted_by='frame', idle_frames=1).iter_trajectories())
+
+    reader = TrajectoryCsvReader(path, chunk_rows=2, sorted_by='frame', idle_frames=3)
+    store = reader.write_store(str(tmp_path / 'store'))
+    assert sorted(store.vehicle_ids.tolist()) == [1, 2]
+    np.testing.assert_array_equal(store.trajectory(1)['position'], [0.0, 2.0, 10.0])
+
+    result = TrafficEmissionAnalyzer().analyze_trajectory_csv(path, chunk_rows=2, sorted_by='frame',
+                                                              idle_frames=3)
+    assert sorted(result['vehicle_ids'].tolist()) == [1, 2]
+
+
+def test_v2x_service_prunes_stale_vehicles_when_feed_goes_silent():
+    service = V2XIngestionService(stale_seconds=0.05)
+    records = np.zeros(2, dtype=V2X_RECORD_DTYPE)
+    records['vehicle_id'] = [1, 2]
+    records['timestamp'] = 10.0
+    service.feed(encode_v2x_message(records))
+    np.testing.assert_array_equal(service.process_pending()['vehicle_ids'], [1, 2])
+
+    time.sleep(0.1)
+    assert len(service.process_pending()['vehicle_ids']) == 0
+
+
+def test_v2x_service_binds_loopback_unless_external_is_allowed():
+    async def bind(**options):
+        service = V2XIngestionService()
+        try:
+            return await service.start_udp(port=0, **options)
+        finally:
+            await service.stop()
+
+    assert asyncio.run(bind())[0] == '127.0.0.1'
+    with pytest.raises(ValueError):
+        asyncio.run(bind(host='0.0.0.0'))
+    assert asyncio.run(bind(host='0.0.0.0', allow_external=True))[0] == '0.0.0.0'
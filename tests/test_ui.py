@@ -0,0 +1,88 @@
+"""UI.py 渲染回归测试（Qt offscreen平台，在仓库根目录运行: python -m pytest -q）"""
+
+import os
+import random
+import sys
+import time
+
+import pytest
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+QtWidgets = pytest.importorskip('PyQt5.QtWidgets')
+
+BEFORE_UI_IMPORT = time.perf_counter()
+import UI  # noqa: E402
+
+
+@pytest.fixture(scope='module')
+def qt_app():
+    return QtWidgets.QApplication.instance() or QtWidgets.QApplication([])
+
+
+def _vehicles(count, seed=0):
+    rng = random.Random(seed)
+    return [{'lane': rng.randrange(3), 'position': rng.uniform(0.05, 0.95),
+             'risk_level': rng.choice((0, 0, 1, 2)), 'target_lane': rng.random() < 0.1}
+            for _ in range(count)]
+
+
+def _advance(vehicles, step):
+    return [dict(vehicle, position=0.05 + (vehicle['position'] - 0.05 + step) % 0.9) for vehicle in vehicles]
+
+
+def test_scaled_pixmap_cache_holds_steady_state_working_set(qt_app):
+    view = UI.RoadViewWidget(load_assets_in_background=False)
+    view.resize(800, 800)
+    vehicles = _vehicles(200)
+
+    # 预热：车辆扫过全部纵向位置，各尺寸均已缓存
+    for i in range(450):
+        view.update_frame(('keep', 'left', 'right')[i % 3], _advance(vehicles, 0.002 * i))
+    assert len(view.scaled_pixmap_cache) <= view.max_cached_pixmaps
+
+    view.pixmap_cache_hits = view.pixmap_cache_misses = 0
+    for i in range(450, 480):
+        view.update_frame(('keep', 'left', 'right')[i % 3], _advance(vehicles, 0.002 * i))
+    assert view.pixmap_cache_misses == 0
+    assert view.pixmap_cache_hits >= 30 * 200
+
+
+class _RecordingRoadView(UI.RoadViewWidget):
+    def __init__(self):
+        self.requests = []  # 基类初始化过程中即可能调用update()
+        super().__init__(load_assets_in_background=False)
+
+    def update(self, *args):
+        self.requests.append(args[0] if args else None)
+
+
+def test_refresh_falls_back_to_full_update_above_dirty_threshold(qt_app):
+    view = _RecordingRoadView()
+    view.resize(800, 800)
+    vehicles = _vehicles(200)
+    view.update_frame('keep', vehicles)
+
+    # 少量车辆移动：只请求变化区域
+    moved = list(vehicles)
+    moved[0] = dict(moved[0], position=0.5 if moved[0]['position'] < 0.4 else 0.1)
+    view.requests.clear()
+    view.update_frame('keep', moved)
+    assert len(view.requests) == 1 and view.requests[0] is not None
+    assert 0 < view.requests[0].rectCount() <= view.max_dirty_rects
+
+    # 全部车辆移动：变化元素超过阈值，直接整体重绘
+    view.requests.clear()
+    view.update_frame('keep', _advance(moved, 0.01))
+    assert view.requests == [None]
+
+    # 无变化时不请求重绘
+    view.requests.clear()
+    view.update_frame('keep', _advance(moved, 0.01))
+    assert view.requests == []
+
+
+@pytest.mark.skipif(not sys.platform.startswith('linux'), reason='需要/proc/self/stat')
+def test_startup_time_counts_from_process_start():
+    # 进程启动早于pytest收集本模块，更早于UI模块导入
+    assert UI.STARTUP_TIME < BEFORE_UI_IMPORT
+    assert abs(UI.process_start_time() - UI.STARTUP_TIME) < 0.05
@@ -0,0 +1,201 @@
+"""
+UI.py 无界面渲染基准
+使用Qt offscreen平台驱动RoadViewWidget与RecommendationApp，渲染到QImage，
+在不同车辆数（0 ~ 200）与窗口尺寸下报告逐帧绘制耗时分位数与内存分配，可在无显示器的CI机器上运行
+
+用法:
+    python ui_benchmark.py
+    python ui_benchmark.py --vehicles 0,50 --sizes 800x800 --output after.json --compare before.json
+"""
+
+import argparse
+import json
+import os
+import random
+import resource
+import sys
+import time
+import tracemalloc
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+import numpy as np
+from PyQt5.QtCore import QPoint
+from PyQt5.QtGui import QImage, QRegion
+from PyQt5.QtWidgets import QApplication
+
+import UI
+from benchmark import compare_results, environment_info
+
+DEFAULT_VEHICLE_COUNTS = (0, 10, 50, 200)
+DEFAULT_WINDOW_SIZES = ('480x480', '800x800', '1280x720')
+
+
+def synthetic_vehicles(count, rng):
+    """合成周围车辆列表（车道、纵向位置、风险等级、是否目标车道车辆）"""
+    return [{
+        'lane': rng.randrange(3),
+        'position': rng.uniform(0.05, 0.95),
+        'speed': rng.uniform(20, 120),
+        'risk_level': rng.choice((0, 0, 1, 2)),
+        'target_lane': rng.random() < 0.1,
+    } for _ in range(count)]
+
+
+def advance_vehicles(vehicles, step):
+    """各车纵向位置小幅移动，模拟连续帧"""
+    return [dict(vehicle, position=0.05 + (vehicle['position'] - 0.05 + step) % 0.9) for vehicle in vehicles]
+
+
+class _RecordingRoadView(UI.RoadViewWidget):
+    """记录update()请求的重绘区域，用于模拟增量重绘"""
+
+    def __init__(self):
+        super().__init__()
+        self.requested_region = QRegion()
+
+    def update(self, *args):
+        self.requested_region = self.requested_region.united(args[0] if args else QRegion(self.rect()))
+
+
+def bench_road_view(mode, vehicle_count, window_size, seed):
+    """
+    RoadViewWidget逐帧绘制
+    mode: 'full'每帧整体渲染，'incremental'只渲染update()请求的区域（实时模式下的实际路径）
+    计时包含update_frame（动态元素与重绘区域的计算），两种模式的帧时间可直接比较
+    """
+    rng = random.Random(seed)
+    view = _RecordingRoadView()
+    view.wait_for_assets()
+    view.resize(*window_size)
+    image = QImage(view.size(), QImage.Format_ARGB32_Premultiplied)
+    view.render(image)
+
+    vehicles = synthetic_vehicles(vehicle_count, rng)
+    recommendations = ('keep', 'left', 'right')
+
+    def frame(i):
+        view.requested_region = QRegion()
+        start = time.perf_counter()
+        view.update_frame(recommendations[(i // 30) % 3], advance_vehicles(vehicles, 0.002 * i))
+        if mode == 'full':
+            view.render(image)
+        elif not view.requested_region.isEmpty():
+            region = view.requested_region
+            view.render(image, region.boundingRect().topLeft(), region)
+        return time.perf_counter() - start
+
+    return frame
+
+
+def bench_app_update(vehicle_count, window_size, seed):
+    """RecommendationApp.update_simulation + 整窗渲染"""
+    rng = random.Random(seed)
+    app_window = UI.RecommendationApp()
+    app_window.road_view.wait_for_assets()
+    app_window.resize(*window_size)
+    app_window.scenarios = [dict(scenario, vehicles=synthetic_vehicles(vehicle_count, rng))
+                            for scenario in app_window.scenarios]
+    image = QImage(app_window.size(), QImage.Format_ARGB32_Premultiplied)
+    app_window.render(image)
+
+    def frame(i):
+        app_window.current_scenario_index = i % len(app_window.scenarios)
+        start = time.perf_counter()
+        app_window.update_simulation(update_data=True)
+        app_window.render(image)
+        return time.perf_counter() - start
+
+    return frame
+
+
+def measure(frame, frames):
+    """
+    逐帧计时，并统计Python侧内存分配（tracemalloc只跟踪Python对象，Qt内部的C++分配不计入）
+    """
+    frame(-1)  # 预热：构建缓存与静态图层
+    timings = np.empty(frames)
+    tracemalloc.start()
+    try:
+        baseline = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        for i in range(frames):
+            timings[i] = frame(i)
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return timings, peak - baseline, current - baseline
+
+
+def run_benchmarks(cases, vehicle_counts, window_sizes, frames, seed):
+    results = []
+    for case in cases:
+        for size_text in window_sizes:
+            window_size = tuple(int(value) for value in size_text.split('x'))
+            for vehicle_count in vehicle_counts:
+                if case == 'app.update_simulation':
+                    frame = bench_app_update(vehicle_count, window_size, seed)
+                else:
+                    frame = bench_road_view(case.split('.')[1], vehicle_count, window_size, seed)
+
+                timings, peak_bytes, net_bytes = measure(frame, frames)
+                p50, p90, p99 = np.percentile(timings, [50, 90, 99])
+                name = f'{case}[{size_text}]'
+                results.append({
+                    'name': name,
+                    'size': vehicle_count,
+                    'repeats': frames,
+                    'mean_seconds': float(timings.mean()),
+                    'p50_seconds': float(p50),
+                    'p90_seconds': float(p90),
+                    'p99_seconds': float(p99),
+                    'max_seconds': float(timings.max()),
+                    'throughput': 1 / float(p50),  # 帧/秒
+                    'python_peak_alloc_bytes': peak_bytes,
+                    'python_net_alloc_bytes': net_bytes,
+                    'max_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+                })
+                print(f"{name:40s} {vehicle_count:>4d}辆  p50 {p50 * 1e3:8.3f} ms  p90 {p90 * 1e3:8.3f} ms  "
+                      f"p99 {p99 * 1e3:8.3f} ms  Python峰值分配 {peak_bytes / 1024:8.1f} KiB")
+    return results
+
+
+CASES = ('road_view.full', 'road_view.incremental', 'app.update_simulation')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='UI.py无界面渲染基准')
+    parser.add_argument('--vehicles', default=','.join(map(str, DEFAULT_VEHICLE_COUNTS)),
+                        help='逗号分隔的周围车辆数')
+    parser.add_argument('--sizes', default=','.join(DEFAULT_WINDOW_SIZES), help='逗号分隔的窗口尺寸(宽x高)')
+    parser.add_argument('--frames', type=int, default=200, help='每个用例的帧数')
+    parser.add_argument('--filter', default='', help='仅运行名称包含该字符串的用例')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='结果JSON输出路径')
+    parser.add_argument('--compare', help='用于对比的历史结果JSON')
+    parser.add_argument('--threshold', type=float, default=0.1, help='判定变慢的相对阈值')
+    args = parser.parse_args(argv)
+
+    app = QApplication.instance() or QApplication(sys.argv[:1])
+    app.setStyle('Fusion')
+
+    cases = [case for case in CASES if args.filter in case]
+    vehicle_counts = [int(count) for count in args.vehicles.split(',')]
+    window_sizes = args.sizes.split(',')
+    report = {'environment': dict(environment_info(args.seed), qt_platform=app.platformName()),
+              'results': run_benchmarks(cases, vehicle_counts, window_sizes, args.frames, args.seed)}
+
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(report, file, indent=2, ensure_ascii=False)
+
+    if args.compare:
+        with open(args.compare) as file:
+            baseline = json.load(file)
+        if compare_results(report, baseline, args.threshold):
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())